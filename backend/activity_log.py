@@ -0,0 +1,183 @@
+import datetime
+import json
+import os
+import shutil
+from typing import Dict, Iterator, List, Optional
+
+
+def worker_spill_dir(base: str) -> str:
+    """A spill directory of this worker's own under `base`, for running several workers.
+
+    Each worker numbers its feed itself, so they can't share segment files.
+    Directories left by workers that are gone are removed.
+    """
+    os.makedirs(base, exist_ok=True)
+    for name in os.listdir(base):
+        if not name.startswith("worker-"):
+            continue
+        try:
+            os.kill(int(name[len("worker-"):]), 0)
+        except ValueError:
+            continue
+        except ProcessLookupError:
+            shutil.rmtree(os.path.join(base, name), ignore_errors=True)
+        except PermissionError:
+            pass
+    return os.path.join(base, f"worker-{os.getpid()}")
+
+
+class ActivityLog:
+    """Fixed-capacity ring buffer of activity entries with sequence numbers.
+
+    Every entry gets a monotonically increasing `seq`; the slot for seq `s` is
+    `s % capacity`, so adding and cursor lookups are O(1) and memory is
+    bounded. Entries pushed out of the ring are appended to on-disk segment
+    files when `spill_dir` is set (one JSON-lines file per `capacity` seqs),
+    otherwise they are dropped. A log opened on a spill directory that
+    already holds entries carries on numbering after them.
+    """
+
+    def __init__(self, capacity: int = 1000, spill_dir: Optional[str] = None):
+        self.capacity = capacity
+        self.spill_dir = spill_dir
+        self._slots: List[Optional[Dict]] = [None] * capacity
+        self._first_seq = 1  # oldest seq still in memory
+        self._next_seq = 1
+        self._spill_file = None
+        self._spill_segment = None
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+            self._first_seq = self._next_seq = self._last_spilled_seq() + 1
+
+    def __len__(self):
+        return self._next_seq - self._first_seq
+
+    @property
+    def last_seq(self) -> int:
+        return self._next_seq - 1
+
+    def add(self, entry: Dict) -> Dict:
+        seq = self._next_seq
+        if seq - self._first_seq >= self.capacity:
+            self._spill(self._slots[self._first_seq % self.capacity])
+            self._first_seq += 1
+        entry = {**entry, "seq": seq, "timestamp": datetime.datetime.now().isoformat()}
+        self._slots[seq % self.capacity] = entry
+        self._next_seq += 1
+        return entry
+
+    def latest(self, limit: int = 10) -> List[Dict]:
+        return self.page(limit=limit)
+
+    def page(self, after: Optional[int] = None, before: Optional[int] = None, limit: int = 10) -> List[Dict]:
+        """Entries with after < seq < before, newest first, at most `limit`.
+
+        With only `after`, returns the `limit` entries right after the cursor so
+        a client can keep paging forward; otherwise returns the newest ones
+        below `before` (or overall).
+        """
+        low = max(after + 1 if after is not None else 1, 1)
+        high = min(before - 1 if before is not None else self.last_seq, self.last_seq)
+        if high < low or limit <= 0:
+            return []
+        if after is not None and before is None:
+            high = min(high, low + limit - 1)
+        else:
+            low = max(low, high - limit + 1)
+
+        entries = []
+        if low < self._first_seq:
+            entries.extend(self._read_spilled(low, min(high, self._first_seq - 1)))
+        for seq in range(max(low, self._first_seq), high + 1):
+            entries.append(self._slots[seq % self.capacity])
+        entries.reverse()
+        return entries
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.spill_dir, f"activities-{segment:08d}.jsonl")
+
+    def _last_spilled_seq(self) -> int:
+        segments = sorted(
+            name for name in os.listdir(self.spill_dir)
+            if name.startswith("activities-") and name.endswith(".jsonl")
+        )
+        for name in reversed(segments):
+            path = os.path.join(self.spill_dir, name)
+            with open(path, "rb+") as f:
+                data = f.read()
+                # Drop a line cut short by a crash, so appends start on a fresh line
+                end = data.rfind(b"\n") + 1
+                if end < len(data):
+                    f.truncate(end)
+            lines = data[:end].splitlines()
+            if lines:
+                return max(json.loads(line)["seq"] for line in lines)
+        return 0
+
+    def _spill(self, entry: Dict):
+        if not self.spill_dir:
+            return
+        segment = entry["seq"] // self.capacity
+        if segment != self._spill_segment:
+            if self._spill_file:
+                self._spill_file.close()
+            self._spill_file = open(self._segment_path(segment), "a")
+            self._spill_segment = segment
+        self._spill_file.write(json.dumps(entry) + "\n")
+
+    def export(self) -> Iterator[Dict]:
+        """Every entry up to now, oldest first; spilled entries are streamed from disk"""
+        first = self._first_seq
+        in_memory = [self._slots[seq % self.capacity] for seq in range(first, self._next_seq)]
+        if self._spill_file:
+            self._spill_file.flush()
+        return self._export(first, in_memory)
+
+    def _export(self, first_in_memory: int, in_memory: List[Dict]) -> Iterator[Dict]:
+        if self.spill_dir:
+            last = 0
+            for segment in range(first_in_memory // self.capacity + 1):
+                path = self._segment_path(segment)
+                if not os.path.exists(path):
+                    continue
+                with open(path) as f:
+                    for line in f:
+                        # Stop at anything spilled after the export started
+                        if not line.endswith("\n"):
+                            break
+                        entry = json.loads(line)
+                        if entry["seq"] >= first_in_memory:
+                            break
+                        # Each seq once, even if a segment holds it twice
+                        if entry["seq"] > last:
+                            last = entry["seq"]
+                            yield entry
+        yield from in_memory
+
+    def _read_spilled(self, low: int, high: int) -> List[Dict]:
+        if not self.spill_dir:
+            return []
+        if self._spill_file:
+            self._spill_file.flush()
+        entries: Dict[int, Dict] = {}
+        for segment in range(low // self.capacity, high // self.capacity + 1):
+            path = self._segment_path(segment)
+            if not os.path.exists(path):
+                continue
+            with open(path) as f:
+                for line in f:
+                    entry = json.loads(line)
+                    # Each seq once; the latest line for it wins
+                    if low <= entry["seq"] <= high:
+                        entries[entry["seq"]] = entry
+        return [entries[seq] for seq in sorted(entries)]
+
+    def close(self):
+        """Spills what is still in memory too, so a log reopened on the directory has it all"""
+        if self.spill_dir:
+            for seq in range(self._first_seq, self._next_seq):
+                self._spill(self._slots[seq % self.capacity])
+            self._first_seq = self._next_seq
+        if self._spill_file:
+            self._spill_file.close()
+            self._spill_file = None
@@ -0,0 +1,168 @@
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from eta_engine import EARTH_RADIUS_KM
+
+# Parcels a driver can carry at once, by vehicle type
+VEHICLE_CAPACITY = {'Bike': 5, 'Car': 10, 'Van': 20, 'Truck': 40}
+DEFAULT_CAPACITY = 10
+
+CANDIDATES_PER_PARCEL = 8
+CHUNK_ROWS = 1024
+
+
+def distance_matrix_km(parcels: np.ndarray, drivers: np.ndarray) -> np.ndarray:
+    """Haversine distances between (P, 2) and (D, 2) lat/lng arrays, shape (P, D)"""
+    lat1 = np.radians(parcels[:, 0])[:, None]
+    lng1 = np.radians(parcels[:, 1])[:, None]
+    lat2 = np.radians(drivers[:, 0])[None, :]
+    lng2 = np.radians(drivers[:, 1])[None, :]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def solve_assignment(parcels: np.ndarray, drivers: np.ndarray, capacity: np.ndarray,
+                     time_budget: float = 2.0) -> Tuple[np.ndarray, np.ndarray, Dict]:
+    """Assign parcels to drivers, minimizing total driver-to-parcel distance under capacity limits.
+
+    1. For each parcel keep only its nearest CANDIDATES_PER_PARCEL drivers
+       (cost rows are built in chunks, so memory stays at CHUNK_ROWS x D).
+    2. Greedy: take candidate edges cheapest first while the driver has room;
+       parcels whose candidates all filled up fall back to their full cost row.
+    3. Local improvement until nothing improves or the budget runs out: move
+       a parcel to a cheaper candidate with room, or swap it with a parcel of
+       that candidate when the pair gets cheaper.
+
+    Returns (driver index per parcel, -1 when none had room; its cost in km; stats).
+    """
+    started = time.perf_counter()
+    deadline = started + time_budget
+    parcel_count, driver_count = len(parcels), len(drivers)
+    assigned = np.full(parcel_count, -1, dtype=np.int64)
+    cost = np.full(parcel_count, np.nan)
+    stats = {"moves": 0, "swaps": 0, "improvement_passes": 0, "fallbacks": 0}
+    if parcel_count == 0 or driver_count == 0 or capacity.sum() <= 0:
+        stats["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return assigned, cost, stats
+
+    k = min(CANDIDATES_PER_PARCEL, driver_count)
+    candidates = np.empty((parcel_count, k), dtype=np.int64)
+    candidate_costs = np.empty((parcel_count, k))
+    for start in range(0, parcel_count, CHUNK_ROWS):
+        rows = distance_matrix_km(parcels[start:start + CHUNK_ROWS], drivers)
+        nearest = np.argpartition(rows, k - 1, axis=1)[:, :k] if k < driver_count else np.tile(np.arange(k), (len(rows), 1))
+        candidates[start:start + len(rows)] = nearest
+        candidate_costs[start:start + len(rows)] = np.take_along_axis(rows, nearest, axis=1)
+
+    # Greedy over candidate edges, cheapest first
+    remaining = capacity.astype(np.int64).copy()
+    order = np.argsort(candidate_costs, axis=None, kind='stable')
+    edge_parcels, edge_slots = np.divmod(order, k)
+    for p, slot in zip(edge_parcels.tolist(), edge_slots.tolist()):
+        if assigned[p] >= 0:
+            continue
+        d = candidates[p, slot]
+        if remaining[d] > 0:
+            assigned[p] = d
+            cost[p] = candidate_costs[p, slot]
+            remaining[d] -= 1
+
+    # Parcels whose nearby drivers all filled up take the nearest driver with room
+    for p in np.flatnonzero(assigned < 0).tolist():
+        if remaining.sum() <= 0:
+            break
+        row = distance_matrix_km(parcels[p:p + 1], drivers)[0]
+        row[remaining <= 0] = np.inf
+        d = int(np.argmin(row))
+        assigned[p], cost[p] = d, row[d]
+        remaining[d] -= 1
+        stats["fallbacks"] += 1
+
+    # Local improvement on the candidate graph
+    candidate_cost = [dict(zip(c, w)) for c, w in zip(candidates.tolist(), candidate_costs.tolist())]
+    members: List[set] = [set() for _ in range(driver_count)]
+    current = assigned.tolist()
+    current_cost = cost.tolist()
+    for p, d in enumerate(current):
+        if d >= 0:
+            members[d].add(p)
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        stats["improvement_passes"] += 1
+        for a in range(parcel_count):
+            if a % 256 == 0 and time.perf_counter() >= deadline:
+                break
+            da = current[a]
+            if da < 0:
+                continue
+            for d, cad in candidate_cost[a].items():
+                if d == da or cad >= current_cost[a] - 1e-9:
+                    continue
+                if remaining[d] > 0:
+                    members[da].discard(a)
+                    members[d].add(a)
+                    remaining[da] += 1
+                    remaining[d] -= 1
+                    current[a], current_cost[a] = d, cad
+                    stats["moves"] += 1
+                    improved = True
+                    break
+                swapped = False
+                for b in members[d]:
+                    cbda = candidate_cost[b].get(da)
+                    if cbda is not None and cad + cbda < current_cost[a] + current_cost[b] - 1e-9:
+                        members[d].discard(b)
+                        members[da].discard(a)
+                        members[d].add(a)
+                        members[da].add(b)
+                        current[a], current_cost[a] = d, cad
+                        current[b], current_cost[b] = da, cbda
+                        stats["swaps"] += 1
+                        swapped = improved = True
+                        break
+                if swapped:
+                    break
+
+    assigned = np.array(current, dtype=np.int64)
+    cost = np.array(current_cost)
+    stats["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return assigned, cost, stats
+
+
+def _coordinates(location) -> Optional[Tuple[float, float]]:
+    try:
+        return float(location['lat']), float(location['lng'])
+    except (TypeError, KeyError, ValueError):
+        return None
+
+
+def plan_assignment(parcels: List[Dict], drivers: List[Dict], loads: Dict[str, int],
+                    time_budget: float = 2.0) -> Tuple[List[Tuple[Dict, Dict, float]], Dict]:
+    """Solve for parcel and driver records; `loads` counts parcels each driver already carries.
+
+    Returns ([(parcel, driver, distance_km)], stats); parcels or drivers without
+    a usable position are left out.
+    """
+    parcel_rows = [(p, _coordinates(p.get('location'))) for p in parcels]
+    parcel_rows = [(p, xy) for p, xy in parcel_rows if xy is not None]
+    driver_rows = [(d, _coordinates(d.get('current_location'))) for d in drivers]
+    driver_rows = [(d, xy) for d, xy in driver_rows if xy is not None]
+
+    capacity = np.array([
+        max(0, VEHICLE_CAPACITY.get(d.get('vehicle_type'), DEFAULT_CAPACITY) - loads.get(d['id'], 0))
+        for d, _ in driver_rows
+    ], dtype=np.int64)
+    assigned, cost, stats = solve_assignment(
+        np.array([xy for _, xy in parcel_rows], dtype=float).reshape(-1, 2),
+        np.array([xy for _, xy in driver_rows], dtype=float).reshape(-1, 2),
+        capacity,
+        time_budget
+    )
+    pairs = [
+        (parcel_rows[p][0], driver_rows[d][0], float(cost[p]))
+        for p, d in enumerate(assigned.tolist()) if d >= 0
+    ]
+    return pairs, stats
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the batch assignment optimizer: 10k unassigned parcels x 1k
+available drivers, greedy only vs greedy + local improvement within budget
+
+Run from the backend directory:
+    python -m benchmarks.bench_assignment [parcels] [drivers] [budget seconds]    (default 10,000 1,000 2)
+"""
+
+import random
+import sys
+import time
+import uuid
+
+from assignment import VEHICLE_CAPACITY, plan_assignment
+
+
+def random_location():
+    return {'lat': 40.7 + random.uniform(-0.3, 0.3), 'lng': -74.0 + random.uniform(-0.3, 0.3)}
+
+
+def report(label, parcels, drivers, loads, budget):
+    start = time.perf_counter()
+    pairs, stats = plan_assignment(parcels, drivers, loads, budget)
+    elapsed = time.perf_counter() - start
+    total = sum(distance for _, _, distance in pairs)
+    per_driver = {}
+    for _, driver, _ in pairs:
+        per_driver[driver['id']] = per_driver.get(driver['id'], 0) + 1
+    assert all(per_driver[d['id']] + loads.get(d['id'], 0) <= VEHICLE_CAPACITY[d['vehicle_type']]
+               for d in drivers if d['id'] in per_driver)
+    print(f"{label:<22} {elapsed:>8.2f}s {len(pairs):>9,} {total:>12,.0f} {total / max(len(pairs), 1):>8.2f} "
+          f"({stats['moves']:,} moves, {stats['swaps']:,} swaps)")
+
+
+def run():
+    parcel_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    driver_count = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+    budget = float(sys.argv[3]) if len(sys.argv) > 3 else 2.0
+
+    parcels = [{'id': str(uuid.uuid4()), 'location': random_location()} for _ in range(parcel_count)]
+    drivers = [{'id': f"driver-{i}", 'vehicle_type': random.choice(list(VEHICLE_CAPACITY)),
+                'current_location': random_location()} for i in range(driver_count)]
+    # Drivers are already partly loaded, so capacity actually binds
+    loads = {d['id']: random.randint(0, VEHICLE_CAPACITY[d['vehicle_type']] // 2) for d in drivers}
+
+    print(f"🧭 Assignment benchmark: {parcel_count:,} parcels x {driver_count:,} drivers, budget {budget:.1f}s")
+    print("=" * 60)
+    print(f"{'mode':<22} {'time':>9} {'assigned':>9} {'total km':>12} {'avg km':>8}")
+    report("greedy only", parcels, drivers, loads, 0.0)
+    report("greedy + improvement", parcels, drivers, loads, budget)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for parcel ingestion: one POST /parcels per parcel vs
+POST /parcels/bulk with a JSON array, an NDJSON stream and a CSV upload
+
+Run from the backend directory:
+    python -m benchmarks.bench_bulk_ingest [parcels]    (default 20,000)
+"""
+
+import asyncio
+import contextlib
+import io
+import json
+import sys
+import time
+
+import httpx
+
+import main
+
+SINGLE_LIMIT = 2_000
+STREAM_CHUNK = 64 * 1024
+
+PARCEL = {
+    'status': 'Processing',
+    'location': {'lat': 40.7128, 'lng': -74.0060},
+    'estimated_delivery': '2026-01-01T12:00:00',
+    'sender': 'Tech Corp Inc',
+    'receiver': 'Global Solutions LLC',
+}
+
+
+def csv_body(count):
+    header = "status,lat,lng,estimated_delivery,sender,receiver\n"
+    row = "Processing,40.7128,-74.0060,2026-01-01T12:00:00,Tech Corp Inc,Global Solutions LLC\n"
+    return (header + row * count).encode()
+
+
+async def chunked(body):
+    for start in range(0, len(body), STREAM_CHUNK):
+        yield body[start:start + STREAM_CHUNK]
+
+
+async def single_posts(client, headers, count):
+    # create_parcel prints every parcel; keep that out of the timing output
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(count):
+            await client.post("/parcels", json=PARCEL)
+    return count
+
+
+async def bulk(client, headers, content_type, body):
+    response = await client.post("/parcels/bulk", content=chunked(body), headers={**headers, 'content-type': content_type})
+    result = response.json()
+    assert result['failed'] == 0, result['errors'][:3]
+    return result['created']
+
+
+async def measure(label, upload):
+    start = time.perf_counter()
+    created = await upload
+    elapsed = time.perf_counter() - start
+    print(f"{label:<16} {created:>8,} parcels {elapsed:>8.2f}s {created / elapsed:>12,.0f} parcels/s")
+
+
+async def run():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    print(f"📦 Bulk ingestion benchmark: {count:,} parcels (batches of {main.BULK_BATCH_SIZE:,})")
+    print("=" * 60)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        login = await client.post("/login", json={"email": "admin@rushdelivery.com", "password": "admin123"})
+        headers = {'Authorization': f"Bearer {login.json()['token']}"}
+
+        await measure("single POSTs", single_posts(client, headers, min(count, SINGLE_LIMIT)))
+        await measure("bulk JSON", bulk(client, headers, "application/json", json.dumps([PARCEL] * count).encode()))
+        ndjson = ("\n".join(json.dumps(PARCEL) for _ in range(count)) + "\n").encode()
+        await measure("bulk NDJSON", bulk(client, headers, "application/x-ndjson", ndjson))
+        await measure("bulk CSV", bulk(client, headers, "text/csv", csv_body(count)))
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark for tracking polls: GET /parcels/{tracking_id} requests/sec with the
+response cache off, served from the cache, and answered 304 Not Modified,
+through the whole ASGI app and for the endpoint alone
+
+Run from the backend directory:
+    python -m benchmarks.bench_conditional_get [parcels] [requests]    (default 10,000 20,000)
+"""
+
+import asyncio
+import random
+import sys
+import time
+
+import httpx
+from starlette.requests import Request
+
+import main
+
+
+def seed(count):
+    """Store `count` parcels through the app's own write path; returns their tracking IDs"""
+    driver_ids = [driver['id'] for driver in main.storage.iter_drivers()]
+    parcels = [main.Parcel(
+        tracking_id=f"CG{i:010d}",
+        status='In Transit',
+        location={'lat': 40.7 + random.uniform(-0.3, 0.3), 'lng': -74.0 + random.uniform(-0.3, 0.3)},
+        estimated_delivery='2026-01-01T12:00:00',
+        sender='Tech Corp Inc',
+        receiver='Global Solutions LLC',
+        driver_id=random.choice(driver_ids) if driver_ids else None,
+    ).dict() for i in range(count)]
+    main.store_new_parcels(parcels)
+    return [parcel['tracking_id'] for parcel in parcels]
+
+
+async def poll(client, tracking_ids, requests, etags=None):
+    start = time.perf_counter()
+    for _ in range(requests):
+        tracking_id = random.choice(tracking_ids)
+        headers = {'If-None-Match': etags[tracking_id]} if etags else None
+        response = await client.get(f"/parcels/{tracking_id}", headers=headers)
+        assert response.status_code == (304 if etags else 200), response.status_code
+    return requests / (time.perf_counter() - start)
+
+
+async def call_endpoint(tracking_ids, requests, etags=None):
+    """The same polls without the HTTP client and routing: just get_parcel"""
+    scopes = {
+        tracking_id: {
+            'type': 'http', 'method': 'GET', 'path': f"/parcels/{tracking_id}",
+            'headers': [(b'if-none-match', etags[tracking_id].encode())] if etags else [],
+        }
+        for tracking_id in tracking_ids
+    }
+    start = time.perf_counter()
+    for _ in range(requests):
+        tracking_id = random.choice(tracking_ids)
+        response = await main.get_parcel(tracking_id, Request(scopes[tracking_id]))
+        assert response.status_code == (304 if etags else 200), response.status_code
+    return requests / (time.perf_counter() - start)
+
+
+async def measure(tracking_ids, requests):
+    transport = httpx.ASGITransport(app=main.app)
+    capacity = main.response_cache.max_entries
+    results = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        main.response_cache.max_entries = 0
+        main.response_cache.clear()
+        results.append(("uncached 200", await poll(client, tracking_ids, requests),
+                        await call_endpoint(tracking_ids, requests)))
+
+        main.response_cache.max_entries = max(capacity, len(tracking_ids))
+        etags = {}
+        for tracking_id in tracking_ids:
+            etags[tracking_id] = (await client.get(f"/parcels/{tracking_id}")).headers['etag']
+        results.append(("cached 200", await poll(client, tracking_ids, requests),
+                        await call_endpoint(tracking_ids, requests)))
+        results.append(("304", await poll(client, tracking_ids, requests, etags),
+                        await call_endpoint(tracking_ids, requests, etags)))
+    main.response_cache.max_entries = capacity
+
+    print(f"{'mode':>14} {'app req/s':>12} {'endpoint req/s':>16} {'speedup':>9}")
+    baseline = results[0][2]
+    for name, app_rate, endpoint_rate in results:
+        print(f"{name:>14} {app_rate:>12,.0f} {endpoint_rate:>16,.0f} {endpoint_rate / baseline:>8.1f}x")
+    print(f"cache: {main.response_cache.metrics()}")
+
+
+def run():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+    random.seed(42)
+    tracking_ids = seed(count)
+    print(f"🔁 Conditional GET benchmark: {count:,} parcels, {requests:,} in-process requests per mode")
+    print("=" * 60)
+    asyncio.run(measure(tracking_ids, requests))
+
+
+if __name__ == "__main__":
+    run()
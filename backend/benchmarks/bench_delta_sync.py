@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark for dashboard reconnects: what catching up costs a client that
+refetches /parcels and /dashboard/shipments in full vs one that asks
+GET /changes?since=<cursor> for what changed while it was away
+
+Run from the backend directory:
+    python -m benchmarks.bench_delta_sync [parcels] [changed] [clients]    (default 50,000 500 100)
+"""
+
+import asyncio
+import random
+import sys
+import time
+
+import httpx
+
+import main
+
+
+def seed(count):
+    parcels = [main.Parcel(
+        tracking_id=f"DS{i:010d}",
+        status='In Transit',
+        location={'lat': 40.7 + random.uniform(-0.3, 0.3), 'lng': -74.0 + random.uniform(-0.3, 0.3)},
+        estimated_delivery='2026-01-01T12:00:00',
+        sender='Tech Corp Inc',
+        receiver='Global Solutions LLC',
+    ).dict() for i in range(count)]
+    main.store_new_parcels(parcels)
+    return parcels
+
+
+async def full_refetch(client, headers):
+    """The current reconnect: every /parcels page, then the active shipments"""
+    received = 0
+    cursor = 0
+    while cursor is not None:
+        response = await client.get(f"/parcels?cursor={cursor}&limit=1000", headers=headers)
+        received += len(response.content)
+        cursor = response.headers.get('x-next-cursor')
+    received += len((await client.get("/dashboard/shipments", headers=headers)).content)
+    return received
+
+
+async def delta_sync(client, headers, since):
+    received = 0
+    more = True
+    while more:
+        response = await client.get(f"/changes?since={since}", headers=headers)
+        received += len(response.content)
+        page = response.json()
+        since, more = page['cursor'], page['more']
+    return received
+
+
+async def storm(clients, reconnect):
+    start = time.perf_counter()
+    received = 0
+    for _ in range(clients):
+        received += await reconnect()
+    return time.perf_counter() - start, received
+
+
+async def measure(parcels, changed, clients):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        login = await client.post("/login", json={"email": "admin@rushdelivery.com", "password": "admin123"})
+        headers = {'Authorization': f"Bearer {login.json()['token']}"}
+        since = (await client.get("/changes/metrics", headers=headers)).json()['cursor']
+        for parcel in random.sample(parcels, changed):
+            main.apply_parcel_update(main.storage.get_parcel(parcel['id']), {'status': 'Out for Delivery'})
+
+        full_time, full_bytes = await storm(clients, lambda: full_refetch(client, headers))
+        delta_time, delta_bytes = await storm(clients, lambda: delta_sync(client, headers, since))
+
+    print(f"{'reconnect':>12} {'ms/client':>11} {'KiB/client':>12} {'storm s':>9}")
+    for name, elapsed, received in (("full", full_time, full_bytes), ("delta", delta_time, delta_bytes)):
+        print(f"{name:>12} {elapsed / clients * 1000:>11.1f} {received / clients / 1024:>12,.1f} {elapsed:>9.2f}")
+    print(f"delta sync: {full_time / delta_time:.0f}x faster, {full_bytes / delta_bytes:.0f}x fewer bytes")
+
+
+def run():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    changed = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    clients = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    random.seed(42)
+    parcels = seed(count)
+    print(f"🔄 Delta sync benchmark: {count:,} parcels, {changed:,} changed while {clients} dashboards were away")
+    print("=" * 60)
+    asyncio.run(measure(parcels, changed, clients))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the driver location grid: k-nearest query latency and position
+update rate at 100k drivers, checked against a brute-force haversine scan
+
+Run from the backend directory:
+    python -m benchmarks.bench_driver_index [drivers]    (default 100,000)
+"""
+
+import heapq
+import random
+import statistics
+import sys
+import time
+
+from driver_index import DriverLocationIndex, haversine_km
+
+# Drivers spread over roughly the New York metro area
+LAT_RANGE = (40.45, 41.05)
+LNG_RANGE = (-74.35, -73.55)
+STATUSES = ['available', 'active', 'busy']
+AVAILABLE = ('available', 'active')
+QUERIES = 5_000
+CHECKED = 200
+K = 10
+
+
+def random_point():
+    return random.uniform(*LAT_RANGE), random.uniform(*LNG_RANGE)
+
+
+def brute_force(drivers, lat, lng, k):
+    return heapq.nsmallest(k, (
+        (haversine_km(lat, lng, d_lat, d_lng), driver_id)
+        for driver_id, (d_lat, d_lng, status) in drivers.items() if status in AVAILABLE
+    ))
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    index = DriverLocationIndex()
+    drivers = {}
+    for i in range(count):
+        lat, lng = random_point()
+        drivers[f"driver-{i}"] = (lat, lng, random.choice(STATUSES))
+    print(f"🚚 Driver index benchmark: {count:,} drivers, k={K}")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    for driver_id, (lat, lng, status) in drivers.items():
+        index.update(driver_id, {'lat': lat, 'lng': lng}, status)
+    elapsed = time.perf_counter() - start
+    print(f"position updates: {count / elapsed:>12,.0f} /s")
+
+    points = [random_point() for _ in range(QUERIES)]
+    latencies = []
+    for lat, lng in points:
+        start = time.perf_counter()
+        index.nearest(lat, lng, K, statuses=AVAILABLE)
+        latencies.append((time.perf_counter() - start) * 1e3)
+    print(f"grid query:       p50={statistics.median(latencies):.3f}ms p99={percentile(latencies, 99):.3f}ms")
+
+    start = time.perf_counter()
+    for lat, lng in points[:CHECKED]:
+        expected = brute_force(drivers, lat, lng, K)
+        assert index.nearest(lat, lng, K, statuses=AVAILABLE) == expected
+    elapsed = (time.perf_counter() - start) / CHECKED
+    print(f"brute-force scan: {elapsed * 1e3:>8.2f}ms per query (results match on {CHECKED} queries)")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the streaming exports: rows/s, output size and peak memory of
+the CSV / NDJSON (optionally gzipped) encoders over a storage snapshot
+
+Run from the backend directory:
+    python -m benchmarks.bench_export [parcels] [memory|sqlite]    (default 200,000 memory)
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+import exports
+import main
+from storage import MemoryStorage, SQLiteStorage
+
+
+def populate(store, count):
+    batch = []
+    for i in range(count):
+        batch.append({
+            'id': str(uuid.uuid4()),
+            'tracking_id': f"BENCH{i:011d}",
+            'status': 'In Transit',
+            'location': {'lat': 40.7128, 'lng': -74.0060},
+            'estimated_delivery': '2026-01-01T12:00:00',
+            'sender': 'Tech Corp Inc',
+            'receiver': 'Global Solutions LLC',
+            'driver_id': None,
+            'updates': [],
+            'origin': None,
+            'destination': None,
+            'created_at': '2026-01-01T00:00:00',
+        })
+        if len(batch) == 10_000:
+            store.insert_parcels(batch)
+            batch = []
+    store.insert_parcels(batch)
+
+
+def measure(label, store, output, gzip, count):
+    columns = list(main.Parcel.model_fields)
+    tracemalloc.start()
+    start = time.perf_counter()
+    records = store.export_records('parcels')
+    lines = exports.csv_lines(records, columns) if output == 'csv' else exports.ndjson_lines(records)
+    size = sum(len(chunk) for chunk in exports.encode_chunks(lines, gzip=gzip))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<12} {count / elapsed:>12,.0f} {size / 2**20:>10.1f} {peak / 2**20:>10.1f}")
+
+
+def run():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    backend = sys.argv[2] if len(sys.argv) > 2 else 'memory'
+    directory = tempfile.mkdtemp(prefix="export-bench-")
+    try:
+        store = SQLiteStorage(os.path.join(directory, "bench.db")) if backend == 'sqlite' else MemoryStorage()
+        populate(store, count)
+        print(f"📤 Export benchmark: {count:,} parcels ({backend}, peak memory under tracemalloc)")
+        print("=" * 60)
+        print(f"{'format':<12} {'rows/s':>12} {'out MiB':>10} {'peak MiB':>10}")
+        measure("csv", store, 'csv', False, count)
+        measure("ndjson", store, 'ndjson', False, count)
+        measure("csv.gz", store, 'csv', True, count)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    run()
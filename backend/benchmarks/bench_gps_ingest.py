@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Load generator for driver GPS ingestion: many simulated drivers stream fixes
+over /ws/drivers/locations (or batched POST /drivers/locations) against a
+local uvicorn server; reports fixes/s sustained and how many were applied
+
+Run from the backend directory:
+    python -m benchmarks.bench_gps_ingest [ws|http] [drivers] [seconds]    (default ws 10,000 10)
+"""
+
+import asyncio
+import json
+import random
+import sys
+import threading
+import time
+
+import httpx
+import uvicorn
+import websockets
+
+import main
+
+PORT = 8765
+CONNECTIONS = 20
+FIXES_PER_MESSAGE = 500
+
+
+def start_server():
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=PORT, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+def make_fixes(driver_ids):
+    return [[random.choice(driver_ids), 40.7 + random.uniform(-0.2, 0.2), -74.0 + random.uniform(-0.2, 0.2)]
+            for _ in range(FIXES_PER_MESSAGE)]
+
+
+async def ws_sender(token, driver_ids, deadline, sent):
+    async with websockets.connect(f"ws://127.0.0.1:{PORT}/ws/drivers/locations?token={token}") as ws:
+        while time.monotonic() < deadline:
+            await ws.send(json.dumps(make_fixes(driver_ids)))
+            sent[0] += FIXES_PER_MESSAGE
+
+
+async def http_sender(client, headers, driver_ids, deadline, sent):
+    while time.monotonic() < deadline:
+        response = await client.post("/drivers/locations", json=make_fixes(driver_ids), headers=headers)
+        sent[0] += response.json()['accepted']
+
+
+async def run():
+    mode = sys.argv[1] if len(sys.argv) > 1 else 'ws'
+    drivers = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 10.0
+
+    for i in range(drivers):
+        main.store_driver({
+            'id': f"gps-{i}", 'name': f"Driver {i}", 'phone': '', 'vehicle_type': 'Van',
+            'current_location': {'lat': 40.7, 'lng': -74.0}, 'status': 'available',
+        })
+    driver_ids = [f"gps-{i}" for i in range(drivers)]
+
+    server, thread = start_server()
+    base_url = f"http://127.0.0.1:{PORT}"
+    async with httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+        login = await client.post("/login", json={"email": "admin@rushdelivery.com", "password": "admin123"})
+        token = login.json()['token']
+        headers = {'Authorization': f"Bearer {token}"}
+
+        print(f"🛰️  GPS ingestion load: {mode}, {drivers:,} drivers, {CONNECTIONS} senders, "
+              f"{FIXES_PER_MESSAGE} fixes/message, {seconds:.0f}s")
+        print("=" * 60)
+        sent = [0]
+        deadline = time.monotonic() + seconds
+        start = time.perf_counter()
+        if mode == 'ws':
+            await asyncio.gather(*(ws_sender(token, driver_ids, deadline, sent) for _ in range(CONNECTIONS)))
+        else:
+            await asyncio.gather(*(http_sender(client, headers, driver_ids, deadline, sent) for _ in range(CONNECTIONS)))
+        elapsed = time.perf_counter() - start
+        await asyncio.sleep(main.location_flusher.interval * 2)
+
+        metrics = (await client.get("/drivers/locations/metrics", headers=headers)).json()
+    server.should_exit = True
+    thread.join()
+
+    print(f"fixes sent:       {sent[0]:>12,} ({sent[0] / elapsed:,.0f} fixes/s)")
+    print(f"fixes received:   {metrics['received']:>12,} ({metrics['received'] / elapsed:,.0f} fixes/s)")
+    print(f"coalesced away:   {metrics['coalesced']:>12,}")
+    print(f"positions stored: {metrics['applied']:>12,} in {metrics['flushes']} flushes "
+          f"(avg flush {metrics['flush']['tick_ms']['avg']:.1f}ms, max {metrics['flush']['tick_ms']['max']:.1f}ms)")
+    print(f"activity entries: {main.data_store['activities'].last_seq:>12,}")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Load test: public tracking latency during a login storm
+Polls GET /parcels/{tracking_id} while many clients hit POST /login at once,
+first with bcrypt running inline on the event loop, then through the hashing pool
+
+Run from the backend directory:
+    python -m benchmarks.bench_login_storm
+"""
+
+import asyncio
+import statistics
+import time
+
+import httpx
+
+import main
+
+POLL_INTERVAL = 0.005
+STORM_LOGINS = 40
+STORM_CONCURRENCY = 20
+
+
+class InlineHasher:
+    """The old behaviour: bcrypt called directly from async handlers"""
+
+    def __init__(self, hasher):
+        self._hasher = hasher
+
+    async def hash(self, password):
+        return self._hasher.context.hash(password)
+
+    async def verify(self, password, hashed):
+        return self._hasher.context.verify(password, hashed)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def poll(client, tracking_id, stop, latencies):
+    # Latency is measured from when the poll was due, so time spent waiting
+    # for a blocked event loop counts against the request
+    while not stop.is_set():
+        due = time.perf_counter() + POLL_INTERVAL
+        await asyncio.sleep(POLL_INTERVAL)
+        response = await client.get(f"/parcels/{tracking_id}")
+        latencies.append(time.perf_counter() - due)
+        assert response.status_code == 200
+
+
+async def login_storm(client):
+    semaphore = asyncio.Semaphore(STORM_CONCURRENCY)
+    payload = {"email": "demo@rushdelivery.com", "password": "demo123"}
+
+    async def one_login():
+        async with semaphore:
+            await client.post("/login", json=payload)
+
+    await asyncio.gather(*(one_login() for _ in range(STORM_LOGINS)))
+
+
+async def measure(label, storm):
+    transport = httpx.ASGITransport(app=main.app)
+    tracking_id = next(main.storage.iter_parcels())['tracking_id']
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        latencies = []
+        stop = asyncio.Event()
+        poller = asyncio.create_task(poll(client, tracking_id, stop, latencies))
+        await asyncio.sleep(0.1)  # let the poller settle before the storm starts
+        start = time.perf_counter()
+        if storm:
+            await login_storm(client)
+        else:
+            await asyncio.sleep(1.0)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await poller
+
+    ms = [l * 1000 for l in latencies]
+    print(f"{label:<24} polls={len(ms):>5} p50={statistics.median(ms):>8.2f}ms "
+          f"p99={percentile(ms, 99):>8.2f}ms max={max(ms):>8.2f}ms ({elapsed:.1f}s)")
+
+
+async def run():
+    print("🔐 Login storm vs tracking latency")
+    print("=" * 80)
+    pooled = main.password_hasher
+
+    await measure("idle", storm=False)
+
+    main.password_hasher = InlineHasher(pooled)
+    await measure("storm, inline bcrypt", storm=True)
+
+    main.password_hasher = pooled
+    await measure("storm, hashing pool", storm=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmark for several workers (serve.py) on the socket event bus: seeds
+parcels through one worker, checks every worker can see them, then measures
+GET /parcels/{tracking_id} throughput for each worker count
+
+Run from the backend directory:
+    python -m benchmarks.bench_multiworker [worker counts] [seconds] [client processes]    (default 1,2,4 10 <cpu count>)
+"""
+
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+PORT = 8766
+PARCELS = 20_000
+BATCH = 1_000
+
+
+def start_server(workers, directory):
+    env = {
+        **os.environ,
+        'EVENT_BUS': 'socket' if workers > 1 else 'local',
+        'EVENT_BUS_PATH': os.path.join(directory, 'bus.sock'),
+        'TRACKING_ID_COUNTER_FILE': os.path.join(directory, 'tracking.counter'),
+        'DASHBOARD_TICK_SECONDS': '3600',
+    }
+    server = subprocess.Popen(
+        [sys.executable, 'serve.py', '--port', str(PORT), '--workers', str(workers), '--log-level', 'warning'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    for _ in range(200):
+        try:
+            request('GET', '/parcels/warmup')
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("server did not start")
+
+
+def request(method, path, body=None, headers=None):
+    connection = http.client.HTTPConnection('127.0.0.1', PORT, timeout=30)
+    try:
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+def login():
+    credentials = json.dumps({"email": "admin@rushdelivery.com", "password": "admin123"})
+    return request('POST', '/login', credentials, {'Content-Type': 'application/json'})
+
+
+def seed():
+    """Create the parcels through whichever worker accepts each bulk request; returns their tracking IDs"""
+    # Workers other than the leader only know the admin once they have synced
+    streak = 0
+    while streak < 20:
+        status, body = login()
+        streak = streak + 1 if status == 200 else 0
+        if status != 200:
+            time.sleep(0.1)
+    headers = {'Authorization': f"Bearer {json.loads(body)['token']}", 'Content-Type': 'application/x-ndjson'}
+    tracking_ids = []
+    for start in range(0, PARCELS, BATCH):
+        ids = [f"MW{i:012d}" for i in range(start, start + BATCH)]
+        rows = "\n".join(json.dumps({
+            'tracking_id': t, 'status': 'In Transit', 'location': {'lat': 40.7, 'lng': -74.0},
+            'estimated_delivery': '2026-01-01T12:00:00', 'sender': 'Bench', 'receiver': 'Bench',
+        }) for t in ids)
+        status, _ = request('POST', '/parcels/bulk', rows, headers)
+        assert status == 200, status
+        tracking_ids.extend(ids)
+    return tracking_ids
+
+
+def replicated(tracking_ids, probes=200):
+    """Share of fresh-connection lookups (spread over the workers) that find a parcel"""
+    found = sum(request('GET', f"/parcels/{random.choice(tracking_ids)}")[0] == 200 for _ in range(probes))
+    return found / probes
+
+
+def client(args):
+    tracking_ids, seconds = args
+    connection = http.client.HTTPConnection('127.0.0.1', PORT, timeout=30)
+    done = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        connection.request('GET', f"/parcels/{random.choice(tracking_ids)}")
+        response = connection.getresponse()
+        response.read()
+        done += 1
+        # Reconnect now and then, so connections keep spreading across the workers
+        if done % 200 == 0:
+            connection.close()
+            connection = http.client.HTTPConnection('127.0.0.1', PORT, timeout=30)
+    connection.close()
+    return done
+
+
+def run():
+    counts = [int(n) for n in (sys.argv[1] if len(sys.argv) > 1 else '1,2,4').split(',')]
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0
+    clients = int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count()
+
+    print(f"🧵 Multi-worker tracking benchmark: {PARCELS:,} parcels, {clients} client processes, "
+          f"{seconds:.0f}s per run, {os.cpu_count()} CPUs")
+    print("=" * 60)
+    print(f"{'workers':>8} {'visible':>9} {'req/s':>10} {'per worker':>12} {'scaling':>9}")
+    baseline = None
+    for workers in counts:
+        with tempfile.TemporaryDirectory(prefix="multiworker-bench-") as directory:
+            server = start_server(workers, directory)
+            try:
+                tracking_ids = seed()
+                time.sleep(1)
+                visible = replicated(tracking_ids)
+                with multiprocessing.Pool(clients) as pool:
+                    start = time.perf_counter()
+                    total = sum(pool.map(client, [(tracking_ids, seconds)] * clients))
+                    elapsed = time.perf_counter() - start
+            finally:
+                server.terminate()
+                server.wait()
+        rate = total / elapsed
+        baseline = baseline or rate / workers
+        print(f"{workers:>8} {visible:>9.0%} {rate:>10,.0f} {rate / workers:>12,.0f} {rate / baseline:>8.1f}x")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark for notification inbox operations: the old per-user list (linear
+search to mark one read, every entry rewritten to mark all read, a scan to
+count unread) vs NotificationInbox (ID index, read watermark, kept unread
+count), for inboxes of growing size
+
+Run from the backend directory:
+    python -m benchmarks.bench_notifications [operations]    (default 2,000)
+"""
+
+import random
+import sys
+import time
+import uuid
+
+from notification_inbox import NotificationInbox
+
+SIZES = [100, 1_000, 10_000]
+
+
+def legacy_list(size):
+    return [{'id': str(uuid.uuid4()), 'title': 'Rush Delivery', 'body': f"Shipment {i} is now In Transit", 'read': False}
+            for i in range(size)]
+
+
+def legacy_mark(notifications, notification_id):
+    # What PUT /notifications/{id} did: copy the list, search it, replace the entry
+    notifications = list(notifications)
+    for i, notification in enumerate(notifications):
+        if notification.get('id') == notification_id:
+            notifications[i] = {**notification, 'read': True}
+            break
+    return notifications
+
+
+def legacy_mark_all(notifications):
+    return [{**n, 'read': True} for n in notifications]
+
+
+def legacy_unread(notifications):
+    return sum(1 for n in notifications if not n.get('read'))
+
+
+def timed(operations, op):
+    start = time.perf_counter()
+    for _ in range(operations):
+        op()
+    return (time.perf_counter() - start) / operations * 1e6
+
+
+def measure(size, operations):
+    notifications = legacy_list(size)
+    inbox = NotificationInbox(max_size=size)
+    for n in notifications:
+        inbox.add({'title': n['title'], 'body': n['body']})
+    legacy_ids = [n['id'] for n in notifications]
+    inbox_ids = [n['id'] for n in inbox.page(limit=size)[0]]
+
+    return [
+        ("mark one", timed(operations, lambda: legacy_mark(notifications, random.choice(legacy_ids))),
+         timed(operations, lambda: inbox.mark(random.choice(inbox_ids), True))),
+        # The inbox only does work when something is unread, so each round un-reads one first
+        ("mark all", timed(operations, lambda: legacy_mark_all(notifications)),
+         timed(operations, lambda: (inbox.mark(random.choice(inbox_ids), False), inbox.mark_all_read()))),
+        ("unread", timed(operations, lambda: legacy_unread(notifications)),
+         timed(operations, lambda: inbox.unread)),
+    ]
+
+
+def run():
+    operations = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    random.seed(42)
+    print(f"🔔 Notification inbox benchmark: {operations:,} operations per measurement")
+    print("=" * 60)
+    print(f"{'inbox':>8} {'operation':<10} {'list µs':>10} {'inbox µs':>10} {'speedup':>9}")
+    for size in SIZES:
+        for name, legacy_us, inbox_us in measure(size, operations):
+            print(f"{size:>8,} {name:<10} {legacy_us:>10,.2f} {inbox_us:>10,.2f} {legacy_us / inbox_us:>8,.0f}x")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the admin parcel listing: peak memory and time of the old
+whole-array response vs the NDJSON stream and one cursor page
+
+Run from the backend directory:
+    python -m benchmarks.bench_parcel_listing [parcels]    (default 200,000)
+"""
+
+import sys
+import time
+import tracemalloc
+import uuid
+
+from fastapi.responses import JSONResponse
+
+import main
+from storage import MemoryStorage
+
+
+def populate(count):
+    store = MemoryStorage()
+    for i in range(count):
+        store.put_parcel({
+            'id': str(uuid.uuid4()),
+            'tracking_id': f"BENCH{i:011d}",
+            'status': 'In Transit',
+            'location': {'lat': 40.7128, 'lng': -74.0060},
+            'estimated_delivery': '2026-01-01T12:00:00',
+            'sender': 'Tech Corp Inc',
+            'receiver': 'Global Solutions LLC',
+            'driver_id': None,
+            'updates': [],
+            'created_at': '2026-01-01T00:00:00',
+        })
+    return store
+
+
+def whole_array(store):
+    return len(JSONResponse(list(store.iter_parcels())).body)
+
+
+def ndjson_stream(store):
+    return sum(len(chunk) for chunk in main.stream_parcels_ndjson(store.scan_parcels(), None, None))
+
+
+def first_page(store):
+    page = [parcel for _, parcel in zip(range(main.PARCEL_PAGE_SIZE), store.scan_parcels())]
+    return len(JSONResponse(page).body)
+
+
+def measure(name, produce, store):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = produce(store)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:>12} {elapsed:>10.2f} {peak / 2**20:>12.1f} {size / 2**20:>12.1f}")
+
+
+def run():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    store = populate(count)
+    print(f"📋 Parcel listing benchmark: {count:,} parcels")
+    print("=" * 60)
+    print(f"{'mode':>12} {'seconds':>10} {'peak MiB':>12} {'body MiB':>12}")
+    measure("array", whole_array, store)
+    measure("ndjson", ndjson_stream, store)
+    measure("page", first_page, store)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark for parcel memory: bytes per parcel held by the memory backend,
+plain Parcel.dict() records (before) vs compact ParcelRecords (after)
+
+Run from the backend directory:
+    python -m benchmarks.bench_parcel_memory [parcels]    (default 1,000,000)
+"""
+
+import datetime
+import gc
+import json
+import random
+import sys
+import time
+import uuid
+from types import FunctionType, ModuleType
+
+from storage import MemoryStorage
+
+STATUSES = ['Processing', 'In Transit', 'Out for Delivery', 'Delivered']
+SENDERS = ['Tech Corp Inc', 'Fashion Store', 'Book Depot', 'Electronics Hub']
+RECEIVERS = ['Global Solutions LLC', 'John Smith', 'Sarah Johnson', 'Mike Wilson']
+CITIES = ['New York', 'Brooklyn', 'Jersey City', 'Queens', None]
+
+
+def make_parcel(i):
+    """One parcel as create_parcel stores it; the JSON round trip gives it its own strings, like a parsed request"""
+    created = datetime.datetime(2026, 1, 1) + datetime.timedelta(seconds=i)
+    return json.loads(json.dumps({
+        'id': str(uuid.UUID(int=random.getrandbits(128), version=4)),
+        'tracking_id': f"RD{i:010d}",
+        'status': random.choice(STATUSES),
+        'location': {'lat': 40.7 + random.uniform(-0.3, 0.3), 'lng': -74.0 + random.uniform(-0.3, 0.3)},
+        'estimated_delivery': (created + datetime.timedelta(days=2)).isoformat(),
+        'sender': random.choice(SENDERS),
+        'receiver': random.choice(RECEIVERS),
+        'driver_id': f"driver-{random.randrange(1000)}" if random.random() < 0.7 else None,
+        'updates': [],
+        'origin': random.choice(CITIES),
+        'destination': random.choice(CITIES),
+        'created_at': created.isoformat(),
+        'version': 1,
+        'updated_at': created.isoformat(),
+        'seq': int(created.timestamp() * 1e6),
+    }))
+
+
+class PlainStore:
+    """The previous memory layout: each parcel dict kept as-is, plus the same order list and tracking index"""
+
+    def __init__(self):
+        self.parcels = {}
+        self._parcel_order = []
+        self._tracking_index = {}
+
+    def put_parcel(self, parcel):
+        self.parcels[parcel['id']] = parcel
+        self._parcel_order.append(parcel['id'])
+        self._tracking_index[parcel['tracking_id']] = parcel['id']
+
+
+def deep_size(root):
+    """Bytes of every object reachable from root, each shared object (interned strings, None) counted once"""
+    seen = set()
+    total = 0
+    pending = [root]
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen or isinstance(obj, (type, ModuleType, FunctionType)):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        pending.extend(gc.get_referents(obj))
+    return total
+
+
+def measure(name, store, count):
+    random.seed(42)
+    start = time.perf_counter()
+    for i in range(count):
+        store.put_parcel(make_parcel(i))
+    elapsed = time.perf_counter() - start
+    used = deep_size(store)
+    print(f"{name:<18} {used / 2**20:>10,.0f} MiB {used / count:>10,.0f} B/parcel   (load {elapsed:.1f}s)")
+    return used
+
+
+def run():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f"🧮 Parcel memory benchmark: {count:,} parcels in the memory backend")
+    print("=" * 60)
+    plain = PlainStore()
+    before = measure("dict records", plain, count)
+    sample = plain.parcels[plain._parcel_order[-1]]
+    del plain
+    store = MemoryStorage()
+    after = measure("ParcelRecords", store, count)
+    assert store.get_parcel(sample['id']) == sample
+    print(f"saved: {(before - after) / count:,.0f} B/parcel ({1 - after / before:.0%})")
+
+
+if __name__ == "__main__":
+    run()
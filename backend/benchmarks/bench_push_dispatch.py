@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark for web-push dispatch against a local stub push service: dispatch
+rate, queue latency and connections opened for a serial sender vs the async
+worker pool. Payloads are really encrypted and VAPID-signed; the stub answers
+201, 410 for expired subscriptions and a first 503 for flaky ones.
+
+Run from the backend directory:
+    python -m benchmarks.bench_push_dispatch [pushes] [stub latency ms]    (default 5,000 20)
+"""
+
+import asyncio
+import base64
+import sys
+import time
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+
+from push_dispatch import PushDispatcher
+from web_push import VapidKey, WebPushSender, b64url_encode
+
+# (workers, batch size); the first is the one-at-a-time baseline
+CONFIGS = [(1, 1), (4, 25), (8, 50), (16, 50)]
+EXPIRED_EVERY = 50
+FLAKY_EVERY = 20
+
+
+class StubPushService:
+    """Minimal HTTP/1.1 keep-alive server standing in for a push service"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.requests = 0
+        self._flaky_seen = set()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, '127.0.0.1', 0)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _serve(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                length = 0
+                while (line := await reader.readline()) not in (b"\r\n", b""):
+                    name, _, value = line.decode().partition(":")
+                    if name.lower() == "content-length":
+                        length = int(value)
+                await reader.readexactly(length)
+                self.requests += 1
+                await asyncio.sleep(self.latency)
+                path = request_line.split()[1].decode()
+                status = "201 Created"
+                if path.startswith("/gone/"):
+                    status = "410 Gone"
+                elif path.startswith("/flaky/") and path not in self._flaky_seen:
+                    self._flaky_seen.add(path)
+                    status = "503 Service Unavailable\r\nRetry-After: 0"
+                writer.write(f"HTTP/1.1 {status}\r\nContent-Length: 0\r\n\r\n".encode())
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+
+def make_subscriptions(port, count):
+    """Browser-like subscriptions: one client key pair shared by all, each with its own endpoint"""
+    client_key = ec.generate_private_key(ec.SECP256R1()).public_key().public_bytes(
+        serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint
+    )
+    keys = {'p256dh': b64url_encode(client_key), 'auth': base64.urlsafe_b64encode(b"0123456789abcdef").decode()}
+    subscriptions = []
+    for i in range(count):
+        kind = "gone" if i % EXPIRED_EVERY == 0 else "flaky" if i % FLAKY_EVERY == 0 else "push"
+        subscriptions.append({'endpoint': f"http://127.0.0.1:{port}/{kind}/{i}", 'keys': keys})
+    return subscriptions
+
+
+async def measure(pushes, latency, workers, batch_size):
+    stub = StubPushService(latency)
+    port = await stub.start()
+    # The stub listens on plain-http loopback, which the pool refuses by default
+    sender = WebPushSender(VapidKey.generate("mailto:bench@rushdelivery.com"), max_connections=workers * batch_size,
+                           allow_private_hosts=True)
+    pruned = []
+    dispatcher = PushDispatcher(sender.send, on_expired=lambda uid, endpoint: pruned.append(endpoint),
+                                workers=workers, queue_size=pushes, batch_size=batch_size, backoff=0.01)
+    await dispatcher.start()
+    start = time.perf_counter()
+    for i, subscription in enumerate(make_subscriptions(port, pushes)):
+        dispatcher.submit(f"user-{i}", [subscription], {"title": "Rush Delivery", "body": f"Shipment {i} is now Delivered"})
+    await dispatcher.join()
+    elapsed = time.perf_counter() - start
+    metrics = dispatcher.metrics()
+    await dispatcher.stop()
+    await sender.close()
+    await stub.stop()
+    assert metrics['sent'] + metrics['expired'] == pushes, metrics
+    print(f"{workers:>3}x{batch_size:<4} {pushes / elapsed:>10,.0f} {metrics['queue_latency_ms_p50']:>10,.0f} "
+          f"{metrics['queue_latency_ms_p95']:>10,.0f} {sender.pool.opened:>6} {metrics['retried']:>8} {len(pruned):>7}")
+    return pushes / elapsed
+
+
+def run():
+    pushes = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.02
+    print(f"📣 Push dispatch benchmark: {pushes:,} pushes, stub push service answering in {latency * 1000:.0f}ms")
+    print("=" * 60)
+    print(f"{'pool':<8} {'pushes/s':>10} {'p50 ms':>10} {'p95 ms':>10} {'conns':>6} {'retried':>8} {'pruned':>7}")
+    baseline = None
+    best = 0.0
+    for workers, batch_size in CONFIGS:
+        # The serial baseline only gets a slice of the pushes; it would take minutes otherwise
+        count = max(pushes // 20, 100) if workers == 1 and batch_size == 1 else pushes
+        rate = asyncio.run(measure(count, latency, workers, batch_size))
+        if baseline is None:
+            baseline = rate
+        else:
+            best = max(best, rate)
+    print(f"best pool vs serial: {best / baseline:.0f}x")
+
+
+if __name__ == "__main__":
+    run()
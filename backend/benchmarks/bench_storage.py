@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the storage backends: parcel creates, tracking lookups and the
+dashboard queries (active shipments, per-status counts), memory vs SQLite
+
+Run from the backend directory:
+    python -m benchmarks.bench_storage [parcels]    (default 100,000)
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+
+from storage import MemoryStorage, SQLiteStorage
+
+STATUSES = ['Processing', 'In Transit', 'Out for Delivery', 'Delivered']
+LOOKUPS = 20_000
+DASHBOARD_QUERIES = 2_000
+
+
+def make_parcel(i):
+    return {
+        'id': str(uuid.uuid4()),
+        'tracking_id': f"BENCH{i:011d}",
+        'status': random.choice(STATUSES),
+        'location': {'lat': 40.7128, 'lng': -74.0060},
+        'estimated_delivery': '2026-01-01T12:00:00',
+        'sender': 'Tech Corp Inc',
+        'receiver': 'Global Solutions LLC',
+        'driver_id': None,
+        'updates': [],
+    }
+
+
+def timed(operation, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        operation()
+    return (time.perf_counter() - start) / iterations
+
+
+def measure(name, store, parcels):
+    start = time.perf_counter()
+    for parcel in parcels:
+        store.put_parcel(parcel)
+    create = (time.perf_counter() - start) / len(parcels)
+
+    tracking_ids = [p['tracking_id'] for p in parcels]
+    lookup = timed(lambda: store.find_parcel_by_tracking_id(random.choice(tracking_ids)), LOOKUPS)
+    active = timed(lambda: store.list_parcels(exclude_status='Delivered', limit=10), DASHBOARD_QUERIES)
+    count = timed(lambda: store.count_parcels('Delivered'), DASHBOARD_QUERIES)
+    print(f"{name:>8} {create * 1e6:>12.1f} {lookup * 1e6:>12.1f} {active * 1e6:>12.1f} {count * 1e6:>12.1f}")
+
+
+def run():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    parcels = [make_parcel(i) for i in range(count)]
+    directory = tempfile.mkdtemp(prefix="storage-bench-")
+    print(f"🗃️  Storage benchmark: {count:,} parcels (µs per operation)")
+    print("=" * 60)
+    print(f"{'backend':>8} {'create':>12} {'lookup':>12} {'active10':>12} {'count':>12}")
+    try:
+        measure("memory", MemoryStorage(), parcels)
+        measure("sqlite", SQLiteStorage(os.path.join(directory, "bench.db")), parcels)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    run()
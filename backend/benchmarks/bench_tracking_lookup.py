@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for public parcel tracking lookups
+Compares the tracking_id index against a full scan of the in-memory parcels
+
+Run from the backend directory:
+    python -m benchmarks.bench_tracking_lookup
+"""
+
+import random
+import time
+import uuid
+
+from storage import MemoryStorage
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+INDEX_LOOKUPS = 100_000
+SCAN_LOOKUPS = 20
+
+def populate(count):
+    """Build a store of `count` minimal parcels; returns it and their tracking IDs"""
+    store = MemoryStorage()
+    tracking_ids = []
+    for i in range(count):
+        tracking_id = f"BENCH{i:011d}"
+        store.put_parcel({
+            'id': str(uuid.uuid4()),
+            'tracking_id': tracking_id,
+            'status': 'In Transit',
+            'location': {'lat': 40.7, 'lng': -74.0},
+        })
+        tracking_ids.append(tracking_id)
+    return store, tracking_ids
+
+def scan_lookup(store, tracking_id):
+    """The pre-index lookup: walk every parcel"""
+    for record in store.parcels.values():
+        if record.tracking_id == tracking_id:
+            return record.to_dict()
+    return None
+
+def time_per_lookup(lookup, tracking_ids, iterations):
+    probes = [random.choice(tracking_ids) for _ in range(iterations)]
+    start = time.perf_counter()
+    for tracking_id in probes:
+        lookup(tracking_id)
+    return (time.perf_counter() - start) / iterations
+
+def run():
+    print("📦 Tracking lookup benchmark")
+    print("=" * 60)
+    print(f"{'parcels':>10} {'index (µs)':>14} {'scan (µs)':>14} {'speedup':>10}")
+    for size in SIZES:
+        store, tracking_ids = populate(size)
+        indexed = time_per_lookup(store.find_parcel_by_tracking_id, tracking_ids, INDEX_LOOKUPS)
+        scanned = time_per_lookup(lambda t: scan_lookup(store, t), tracking_ids, SCAN_LOOKUPS)
+        print(f"{size:>10} {indexed * 1e6:>14.3f} {scanned * 1e6:>14.1f} {scanned / indexed:>9.0f}x")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,151 @@
+import asyncio
+import itertools
+import json
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Set
+
+from fastapi import WebSocket
+
+# Topic carrying every parcel event, used by admin dashboards
+DASHBOARD_TOPIC = "parcels"
+# Heartbeat only, for dashboard sockets opened without admin credentials
+HEARTBEAT_TOPIC = "heartbeat"
+
+# WebSocket close code for consumers that cannot keep up (1013: try again later)
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+def parcel_topic(tracking_id: str) -> str:
+    return f"parcel:{tracking_id}"
+
+
+class Subscriber:
+    """One WebSocket with its own bounded outbound queue and writer task"""
+
+    def __init__(self, websocket: WebSocket, topics: Iterable[str]):
+        self.websocket = websocket
+        self.topics: Set[str] = set(topics)
+        # key -> encoded message; coalescing keys overwrite in place
+        self.pending: "OrderedDict[object, str]" = OrderedDict()
+        self.ready = asyncio.Event()
+        self.closed = asyncio.Event()
+        self.dropped = 0
+        self.sent = 0
+        self.task: Optional[asyncio.Task] = None
+
+
+class BroadcastHub:
+    """Routes messages to WebSocket subscribers by topic.
+
+    Each message is JSON-encoded once and queued on every matching subscriber.
+    Writers drain their own queue, so a slow or dead client only ever delays
+    itself. When a queue is full the oldest message is dropped (or the new one,
+    with policy='drop_newest'); a subscriber that keeps dropping, or whose send
+    stalls past `send_timeout`, is closed and evicted.
+    """
+
+    def __init__(self, max_queue: int = 100, policy: str = 'drop_oldest',
+                 max_dropped: int = 500, send_timeout: float = 5.0):
+        if policy not in ('drop_oldest', 'drop_newest'):
+            raise ValueError(f"Unknown queue policy: {policy}")
+        self.max_queue = max_queue
+        self.policy = policy
+        self.max_dropped = max_dropped
+        self.send_timeout = send_timeout
+        self.subscribers: Set[Subscriber] = set()
+        self._topics: Dict[str, Set[Subscriber]] = {}
+        self._keys = itertools.count()
+        self.evicted = 0
+
+    @property
+    def connection_count(self) -> int:
+        return len(self.subscribers)
+
+    def topic_size(self, topic: str) -> int:
+        return len(self._topics.get(topic, ()))
+
+    def subscribe(self, websocket: WebSocket, topics: Iterable[str]) -> Subscriber:
+        subscriber = Subscriber(websocket, topics)
+        self.subscribers.add(subscriber)
+        for topic in subscriber.topics:
+            self._topics.setdefault(topic, set()).add(subscriber)
+        subscriber.task = asyncio.create_task(self._writer(subscriber))
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        if subscriber not in self.subscribers:
+            return
+        self.subscribers.discard(subscriber)
+        for topic in subscriber.topics:
+            members = self._topics.get(topic)
+            if members is not None:
+                members.discard(subscriber)
+                if not members:
+                    del self._topics[topic]
+        subscriber.pending.clear()
+        subscriber.closed.set()
+        if subscriber.task is not None and subscriber.task is not asyncio.current_task():
+            subscriber.task.cancel()
+
+    def publish(self, topics: Iterable[str], message: Dict, coalesce_key=None) -> int:
+        """Queue a message for every subscriber of any of `topics`; returns recipient count.
+
+        Messages sharing a `coalesce_key` replace each other while still queued,
+        so a backed-up client only receives the latest state.
+        """
+        recipients: Set[Subscriber] = set()
+        for topic in topics:
+            recipients.update(self._topics.get(topic, ()))
+        if not recipients:
+            return 0
+        text = json.dumps(message, separators=(",", ":"))
+        for subscriber in recipients:
+            self._enqueue(subscriber, text, coalesce_key)
+        return len(recipients)
+
+    def send(self, subscriber: Subscriber, message: Dict):
+        """Queue a message for a single subscriber"""
+        self._enqueue(subscriber, json.dumps(message, separators=(",", ":")), None)
+
+    def _enqueue(self, subscriber: Subscriber, text: str, coalesce_key):
+        if subscriber.closed.is_set():
+            return
+        key = coalesce_key if coalesce_key is not None else next(self._keys)
+        if key not in subscriber.pending and len(subscriber.pending) >= self.max_queue:
+            subscriber.dropped += 1
+            if subscriber.dropped > self.max_dropped:
+                asyncio.create_task(self._evict(subscriber))
+                return
+            if self.policy == 'drop_newest':
+                return
+            subscriber.pending.popitem(last=False)
+        subscriber.pending[key] = text
+        subscriber.ready.set()
+
+    async def _writer(self, subscriber: Subscriber):
+        try:
+            while True:
+                await subscriber.ready.wait()
+                while subscriber.pending:
+                    _, text = subscriber.pending.popitem(last=False)
+                    await asyncio.wait_for(subscriber.websocket.send_text(text), self.send_timeout)
+                    subscriber.sent += 1
+                    subscriber.dropped = 0
+                subscriber.ready.clear()
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            await self._evict(subscriber)
+        except Exception:
+            # Socket already gone; just forget about it
+            self.unsubscribe(subscriber)
+
+    async def _evict(self, subscriber: Subscriber):
+        if subscriber.closed.is_set():
+            return
+        self.evicted += 1
+        self.unsubscribe(subscriber)
+        try:
+            await subscriber.websocket.close(code=SLOW_CONSUMER_CLOSE_CODE)
+        except Exception:
+            pass
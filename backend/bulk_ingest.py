@@ -0,0 +1,95 @@
+import csv
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+# A parsed upload row: (row index, decoded record or None, parse error or None)
+Row = Tuple[int, Any, Optional[str]]
+
+JSON_TYPES = ("application/json",)
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+CSV_TYPES = ("text/csv", "application/csv")
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a streamed body into lines (endings kept) without buffering the whole body"""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        if b"\n" not in chunk:
+            continue
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8") + "\n"
+    if buffer:
+        yield buffer.decode("utf-8")
+
+
+async def ndjson_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[Row]:
+    index = 0
+    async for line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        try:
+            yield index, json.loads(line), None
+        except ValueError as e:
+            yield index, None, f"Invalid JSON: {e}"
+        index += 1
+
+
+def csv_record(row: Dict[str, str]) -> Dict:
+    """Map a CSV row onto parcel fields; blank cells are left out and lat/lng become location"""
+    record = {key: value for key, value in row.items() if key and value not in (None, "")}
+    if "lat" in record or "lng" in record:
+        record["location"] = {"lat": record.pop("lat", None), "lng": record.pop("lng", None)}
+    return record
+
+
+async def csv_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[Row]:
+    header: Optional[List[str]] = None
+    pending = ""
+    index = 0
+    async for line in iter_lines(chunks):
+        # A quoted field may span lines; a record is complete once its quotes balance
+        pending += line
+        if pending.count('"') % 2:
+            continue
+        record, pending = pending, ""
+        if not record.strip():
+            continue
+        values = next(csv.reader([record]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield index, None, f"Expected {len(header)} columns, got {len(values)}"
+        else:
+            yield index, csv_record(dict(zip(header, values))), None
+        index += 1
+    if pending.strip():
+        yield index, None, "Unterminated quoted field"
+
+
+def json_array_rows(body: bytes) -> AsyncIterator[Row]:
+    """Parse a whole JSON array body up front; raises ValueError if it is not one"""
+    try:
+        records = json.loads(body)
+    except ValueError as e:
+        raise ValueError(f"Invalid JSON: {e}")
+    if not isinstance(records, list):
+        raise ValueError("Expected a JSON array of parcels")
+
+    async def rows():
+        for index, record in enumerate(records):
+            yield index, record, None
+    return rows()
+
+
+async def batched(rows: AsyncIterator[Row], size: int) -> AsyncIterator[List[Row]]:
+    batch: List[Row] = []
+    async for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,106 @@
+import time
+from array import array
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+# (table, key) of one changed record
+RecordKey = Tuple[str, str]
+
+
+class ChangeLog:
+    """Change sequence for delta sync: the latest change per record, in arrival order.
+
+    Sequence numbers come from a hybrid clock: the next one is the larger of
+    the highest seen plus one and the current time in microseconds. Stamped
+    into the record itself, a number survives restarts (journal replay, the
+    SQLite rows) and stays ahead of older writes on any worker of the host,
+    even one that has not synced yet.
+
+    Each change is appended with the clock reached once it arrived; a record
+    changed again leaves its old entry behind as garbage, compacted away once
+    it outnumbers the live ones, so the log stays proportional to the number
+    of records. The clock only grows along the log, so the changes after a
+    sequence number start at a bisect.
+
+    With several workers a change from another one can arrive after changes
+    with higher numbers. `settle` is the longest such delay: cursors handed
+    out only vouch for what had arrived `settle` seconds earlier, so resuming
+    from one may repeat a few changes but never skips any.
+    """
+
+    def __init__(self, settle: float = 0.0):
+        self.settle = settle
+        self.clock = 0
+        self._latest: Dict[RecordKey, int] = {}
+        self._keys: List[RecordKey] = []
+        self._seqs = array('q')
+        self._clocks = array('q')
+        self._times = array('d')
+
+    def __len__(self):
+        return len(self._latest)
+
+    def next_seq(self) -> int:
+        self.clock = max(self.clock + 1, time.time_ns() // 1000)
+        return self.clock
+
+    def record(self, table: str, key: str, seq: Optional[int]):
+        """Note that a record now stands at `seq` (records written before sequencing have none)"""
+        if not seq or self._latest.get((table, key), 0) >= seq:
+            return
+        self.clock = max(self.clock, seq)
+        self._latest[(table, key)] = seq
+        self._keys.append((table, key))
+        self._seqs.append(seq)
+        self._clocks.append(self.clock)
+        self._times.append(time.monotonic())
+        if len(self._keys) > 2 * len(self._latest) + 1024:
+            self._compact()
+
+    def _compact(self):
+        live = [i for i, key in enumerate(self._keys) if self._latest[key] == self._seqs[i]]
+        self._keys = [self._keys[i] for i in live]
+        self._seqs = array('q', (self._seqs[i] for i in live))
+        self._clocks = array('q', (self._clocks[i] for i in live))
+        self._times = array('d', (self._times[i] for i in live))
+
+    def _clock_at(self, moment: float) -> int:
+        """The clock as of `moment` (as far as the kept entries tell; never more)"""
+        index = bisect_right(self._times, moment)
+        return self._clocks[index - 1] if index else 0
+
+    def cursor(self) -> int:
+        """Sequence number up to which this worker has every change"""
+        if self.settle <= 0:
+            return self.clock
+        return self._clock_at(time.monotonic() - self.settle)
+
+    def changes_since(self, since: int, limit: int) -> Tuple[List[Tuple[str, str, int]], int, bool]:
+        """Up to `limit` (table, key, seq) changed after `since`, in sequence order, the cursor to
+        resume from, and whether more are waiting"""
+        changes = []
+        last = None
+        for index in range(bisect_right(self._clocks, since), len(self._keys)):
+            key, seq = self._keys[index], self._seqs[index]
+            if seq > since and self._latest[key] == seq:
+                if len(changes) == limit:
+                    break
+                changes.append((key[0], key[1], seq))
+                last = index
+        else:
+            changes.sort(key=lambda change: change[2])
+            return changes, max(since, self.cursor()), False
+        changes.sort(key=lambda change: change[2])
+        # Anything left arrived after `last`, so it is newer than what had arrived `settle` before it
+        resume = min(self._clocks[last], self._clock_at(self._times[last] - self.settle)) \
+            if self.settle > 0 else self._clocks[last]
+        return changes, max(since, resume), True
+
+    def metrics(self) -> Dict:
+        return {
+            "records": len(self._latest),
+            "entries": len(self._keys),
+            "clock": self.clock,
+            "cursor": self.cursor(),
+            "settle_seconds": self.settle,
+        }
@@ -0,0 +1,77 @@
+from collections import Counter
+from typing import Dict, Iterable, Optional
+
+
+class DashboardCounters:
+    """Dashboard aggregates kept up to date on every parcel and driver write.
+
+    Callers report each change as (old record, new record); either side may be
+    None for inserts and deletes. Rebuilding with `from_records` and comparing
+    with `diff` exposes drift from a write path that forgot to report.
+    """
+
+    def __init__(self):
+        self.parcels_by_status: Counter = Counter()
+        self.drivers_by_status: Counter = Counter()
+        self.total_parcels = 0
+        self.total_drivers = 0
+
+    def parcel_changed(self, old: Optional[Dict], new: Optional[Dict]):
+        if old is not None:
+            self.total_parcels -= 1
+            self.parcels_by_status[old.get('status')] -= 1
+        if new is not None:
+            self.total_parcels += 1
+            self.parcels_by_status[new.get('status')] += 1
+
+    def driver_changed(self, old: Optional[Dict], new: Optional[Dict]):
+        if old is not None:
+            self.total_drivers -= 1
+            self.drivers_by_status[old.get('status')] -= 1
+        if new is not None:
+            self.total_drivers += 1
+            self.drivers_by_status[new.get('status')] += 1
+
+    def snapshot(self) -> Dict:
+        total_shipments = self.total_parcels
+        delivered_shipments = self.parcels_by_status['Delivered']
+        on_time_delivery = round((delivered_shipments / total_shipments) * 100, 1) if total_shipments > 0 else 0
+
+        return {
+            "total_shipments": total_shipments,
+            "active_drivers": self.drivers_by_status['active'],
+            # Revenue (mock calculation)
+            "revenue_today": total_shipments * 25 + delivered_shipments * 10,
+            "on_time_delivery": on_time_delivery
+        }
+
+    @classmethod
+    def from_records(cls, parcels: Iterable[Dict], drivers: Iterable[Dict]) -> "DashboardCounters":
+        counters = cls()
+        for parcel in parcels:
+            counters.parcel_changed(None, parcel)
+        for driver in drivers:
+            counters.driver_changed(None, driver)
+        return counters
+
+    def diff(self, fresh: "DashboardCounters") -> Dict:
+        """Compare against counters rebuilt from the records; returns {counter: (ours, fresh)} per mismatch."""
+        drift = {}
+        if fresh.total_parcels != self.total_parcels:
+            drift['total_parcels'] = (self.total_parcels, fresh.total_parcels)
+        if fresh.total_drivers != self.total_drivers:
+            drift['total_drivers'] = (self.total_drivers, fresh.total_drivers)
+        for name, mine, theirs in (
+            ('parcels_by_status', self.parcels_by_status, fresh.parcels_by_status),
+            ('drivers_by_status', self.drivers_by_status, fresh.drivers_by_status),
+        ):
+            for status in set(mine) | set(theirs):
+                if mine[status] != theirs[status]:
+                    drift[f"{name}[{status}]"] = (mine[status], theirs[status])
+        return drift
+
+    def reset_from(self, other: "DashboardCounters"):
+        self.parcels_by_status = other.parcels_by_status
+        self.drivers_by_status = other.drivers_by_status
+        self.total_parcels = other.total_parcels
+        self.total_drivers = other.total_drivers
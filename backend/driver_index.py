@@ -0,0 +1,126 @@
+import heapq
+import math
+from typing import Container, Dict, List, Optional, Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class DriverLocationIndex:
+    """Uniform lat/lng grid over driver positions for k-nearest queries.
+
+    Each driver sits in exactly one cell (`cell_deg` degrees square), so a
+    position update is two dict operations. A query searches rings of cells
+    outward from the query's cell and stops once the k-th best haversine
+    distance is closer than anything outside the rings searched so far; when
+    the rings would cover more cells than are occupied it scans the occupied
+    cells instead, so sparse data never walks empty grid.
+    """
+
+    def __init__(self, cell_deg: float = 0.01):
+        self.cell_deg = cell_deg
+        self._columns = max(1, round(360 / cell_deg))
+        self._rows = math.ceil(180 / cell_deg)
+        # cell -> {driver_id: (lat, lng, status)}
+        self._cells: Dict[Tuple[int, int], Dict[str, Tuple[float, float, str]]] = {}
+        self._driver_cells: Dict[str, Tuple[int, int]] = {}
+
+    def __len__(self):
+        return len(self._driver_cells)
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        row = min(int((lat + 90) / self.cell_deg), self._rows - 1)
+        column = int((lng + 180) / self.cell_deg) % self._columns
+        return row, column
+
+    def update(self, driver_id: str, location: Optional[Dict], status: Optional[str]):
+        """Move a driver to `location` (dropping it if there is no usable position)"""
+        self.remove(driver_id)
+        try:
+            lat, lng = float(location['lat']), float(location['lng'])
+        except (TypeError, KeyError, ValueError):
+            return
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            return
+        cell = self._cell(lat, lng)
+        self._cells.setdefault(cell, {})[driver_id] = (lat, lng, status)
+        self._driver_cells[driver_id] = cell
+
+    def remove(self, driver_id: str):
+        cell = self._driver_cells.pop(driver_id, None)
+        if cell is None:
+            return
+        bucket = self._cells[cell]
+        del bucket[driver_id]
+        if not bucket:
+            del self._cells[cell]
+
+    def _ring(self, row: int, column: int, radius: int):
+        if radius == 0:
+            yield row, column
+            return
+        for r in range(row - radius, row + radius + 1):
+            if not 0 <= r < self._rows:
+                continue
+            if r in (row - radius, row + radius):
+                columns = range(column - radius, column + radius + 1)
+            else:
+                columns = (column - radius, column + radius)
+            for c in columns:
+                yield r, c % self._columns
+
+    def _outside_bound_km(self, lat: float, radius: int) -> float:
+        """Lower bound on the distance to any point outside the searched block of rings"""
+        span = radius * self.cell_deg
+        widest_lat = min(90.0, abs(lat) + span + self.cell_deg)
+        return span * KM_PER_DEGREE * min(1.0, math.cos(math.radians(widest_lat)))
+
+    def nearest(self, lat: float, lng: float, k: int, statuses: Optional[Container[str]] = None,
+                max_km: Optional[float] = None) -> List[Tuple[float, str]]:
+        """Up to k (distance_km, driver_id) pairs, closest first"""
+        if k <= 0 or not self._cells:
+            return []
+        best: List[Tuple[float, str]] = []  # max-heap via negated distances
+
+        def consider(bucket):
+            for driver_id, (d_lat, d_lng, status) in bucket.items():
+                if statuses is not None and status not in statuses:
+                    continue
+                distance = haversine_km(lat, lng, d_lat, d_lng)
+                if max_km is not None and distance > max_km:
+                    continue
+                if len(best) < k:
+                    heapq.heappush(best, (-distance, driver_id))
+                elif distance < -best[0][0]:
+                    heapq.heapreplace(best, (-distance, driver_id))
+
+        row, column = self._cell(lat, lng)
+        occupied = len(self._cells)
+        radius = 0
+        while True:
+            if (2 * radius + 1) ** 2 > occupied:
+                # Cheaper to look at every occupied cell than keep walking empty ones
+                best.clear()
+                for bucket in self._cells.values():
+                    consider(bucket)
+                break
+            for cell in self._ring(row, column, radius):
+                bucket = self._cells.get(cell)
+                if bucket:
+                    consider(bucket)
+            bound = self._outside_bound_km(lat, radius)
+            if len(best) == k and -best[0][0] <= bound:
+                break
+            if max_km is not None and bound > max_km:
+                break
+            radius += 1
+
+        return sorted((-distance, driver_id) for distance, driver_id in best)
@@ -0,0 +1,176 @@
+import datetime
+import math
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Average road speed by vehicle type, km/h
+VEHICLE_SPEEDS_KMH = {'Bike': 15.0, 'Van': 35.0, 'Truck': 28.0, 'Car': 40.0}
+DEFAULT_SPEED_KMH = 30.0
+
+
+def parse_eta(value) -> float:
+    """An ETA (naive ISO string) as epoch seconds; NaN if unparseable"""
+    try:
+        return datetime.datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def format_eta(epoch: float) -> str:
+    return datetime.datetime.fromtimestamp(epoch).replace(microsecond=0).isoformat()
+
+
+class EtaEngine:
+    """Distance-based ETAs for every active, assigned parcel in one NumPy pass.
+
+    Parcel rows (destination, driver row, current ETA) and driver rows
+    (position, speed) live in growable arrays that `track_parcel` /
+    `track_driver` keep in sync on every store write, so a refresh never walks
+    the dicts. Parcel rows are removed by swapping in the last row; driver
+    rows are never removed, so a parcel's driver row index stays valid.
+
+    ETA = now + great-circle distance from the driver to the parcel's
+    destination / the vehicle's speed. Only parcels whose destination or
+    driver changed, or whose driver moved, since the last refresh are
+    re-estimated: with nothing moving, now + the same distance would creep
+    forward on its own. `refresh` returns only the parcels whose predicted
+    arrival moved by more than `threshold` seconds.
+    """
+
+    def __init__(self, threshold: float = 300.0, capacity: int = 1024):
+        self.threshold = threshold
+        self._p_lat = np.empty(capacity)
+        self._p_lng = np.empty(capacity)
+        self._p_driver = np.empty(capacity, dtype=np.int64)
+        self._p_eta = np.empty(capacity)
+        self._p_dirty = np.empty(capacity, dtype=bool)
+        self._p_ids: List[str] = []
+        self._p_rows: Dict[str, int] = {}
+
+        self._d_lat = np.empty(capacity)
+        self._d_lng = np.empty(capacity)
+        self._d_speed = np.empty(capacity)
+        self._d_moved = np.empty(capacity, dtype=bool)
+        self._d_rows: Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self._p_ids)
+
+    @staticmethod
+    def _grow(array: np.ndarray, needed: int) -> np.ndarray:
+        if needed <= len(array):
+            return array
+        grown = np.empty(max(needed, len(array) * 2), dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    # Drivers
+
+    def _driver_row(self, driver_id: str) -> int:
+        row = self._d_rows.get(driver_id)
+        if row is None:
+            row = len(self._d_rows)
+            self._d_lat = self._grow(self._d_lat, row + 1)
+            self._d_lng = self._grow(self._d_lng, row + 1)
+            self._d_speed = self._grow(self._d_speed, row + 1)
+            self._d_moved = self._grow(self._d_moved, row + 1)
+            # Unknown position until the driver itself is tracked
+            self._d_lat[row] = self._d_lng[row] = math.nan
+            self._d_speed[row] = DEFAULT_SPEED_KMH
+            self._d_moved[row] = False
+            self._d_rows[driver_id] = row
+        return row
+
+    def track_driver(self, driver: Dict):
+        row = self._driver_row(driver['id'])
+        location = driver.get('current_location') or {}
+        try:
+            lat, lng = float(location['lat']), float(location['lng'])
+        except (TypeError, KeyError, ValueError):
+            lat = lng = math.nan
+        speed = VEHICLE_SPEEDS_KMH.get(driver.get('vehicle_type'), DEFAULT_SPEED_KMH)
+        # Status or name changes don't touch the ETAs of the driver's parcels
+        moved = not (lat == self._d_lat[row] and lng == self._d_lng[row]) and \
+            not (math.isnan(lat) and math.isnan(self._d_lat[row]))
+        if moved or speed != self._d_speed[row]:
+            self._d_moved[row] = True
+        self._d_lat[row], self._d_lng[row], self._d_speed[row] = lat, lng, speed
+
+    # Parcels
+
+    def track_parcel(self, parcel: Dict):
+        """Add, update or drop a parcel's row; only undelivered parcels with a driver and a destination are tracked"""
+        destination = parcel.get('destination_location') or {}
+        try:
+            lat, lng = float(destination['lat']), float(destination['lng'])
+        except (TypeError, KeyError, ValueError):
+            lat = None
+        if lat is None or not parcel.get('driver_id') or parcel.get('status') == 'Delivered':
+            self.untrack_parcel(parcel['id'])
+            return
+
+        driver_row = self._driver_row(parcel['driver_id'])
+        row = self._p_rows.get(parcel['id'])
+        if row is None:
+            row = len(self._p_ids)
+            for name in ('_p_lat', '_p_lng', '_p_driver', '_p_eta', '_p_dirty'):
+                setattr(self, name, self._grow(getattr(self, name), row + 1))
+            self._p_ids.append(parcel['id'])
+            self._p_rows[parcel['id']] = row
+            self._p_dirty[row] = True
+        elif (lat, lng, driver_row) != (self._p_lat[row], self._p_lng[row], self._p_driver[row]):
+            self._p_dirty[row] = True
+        self._p_lat[row] = lat
+        self._p_lng[row] = lng
+        self._p_driver[row] = driver_row
+        self._p_eta[row] = parse_eta(parcel.get('eta'))
+
+    def untrack_parcel(self, parcel_id: str):
+        row = self._p_rows.pop(parcel_id, None)
+        if row is None:
+            return
+        last = len(self._p_ids) - 1
+        if row != last:
+            moved = self._p_ids[last]
+            for array in (self._p_lat, self._p_lng, self._p_driver, self._p_eta, self._p_dirty):
+                array[row] = array[last]
+            self._p_ids[row] = moved
+            self._p_rows[moved] = row
+        self._p_ids.pop()
+
+    # Refresh
+
+    def compute(self, now: float) -> np.ndarray:
+        """ETA (epoch seconds) at every tracked parcel's destination; NaN where the driver has no position"""
+        n = len(self._p_ids)
+        drivers = self._p_driver[:n]
+        lat1 = np.radians(self._d_lat[drivers])
+        lng1 = np.radians(self._d_lng[drivers])
+        lat2 = np.radians(self._p_lat[:n])
+        lng2 = np.radians(self._p_lng[:n])
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+        distance_km = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+        return now + distance_km / self._d_speed[drivers] * 3600
+
+    def refresh(self, now: Optional[float] = None) -> List[Tuple[str, str]]:
+        """Re-estimate the parcels whose inputs changed; returns (parcel_id, eta) for those that moved"""
+        if not self._p_ids:
+            return []
+        now = datetime.datetime.now().timestamp() if now is None else now
+        n = len(self._p_ids)
+        etas = self.compute(now)
+        current = self._p_eta[:n]
+        stale = self._p_dirty[:n] | self._d_moved[self._p_driver[:n]]
+        changed = stale & np.isfinite(etas) & ~(np.abs(etas - current) <= self.threshold)
+        # A driver without a position gets one through track_driver, which marks it moved
+        self._p_dirty[:n] = False
+        self._d_moved[:len(self._d_rows)] = False
+        rows = np.flatnonzero(changed)
+        # Whole seconds, exactly what the written-back eta will parse to
+        new_etas = np.floor(etas[rows])
+        current[rows] = new_etas
+        ids = self._p_ids
+        return [(ids[row], format_eta(eta)) for row, eta in zip(rows.tolist(), new_etas.tolist())]
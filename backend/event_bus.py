@@ -0,0 +1,280 @@
+import asyncio
+import fcntl
+import json
+import os
+import uuid
+from collections import deque
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# handler(channel, payload) for messages published by other workers
+Handler = Callable[[str, object], None]
+
+# Largest single message (one line of JSON) a worker will accept
+MAX_MESSAGE_BYTES = 16 * 2**20
+RECONNECT_SECONDS = 0.5
+# Messages a client keeps while it has no leader, to send once it reconnects
+MAX_BACKLOG = 10_000
+
+# First line a client sends the leader: {"sync": true, "joining": <first connection>,
+# "replay": <backlog lines that follow>}
+HELLO_CHANNEL = "_hello"
+
+# sync_source(joining) yields (channel, payload) pairs; joining is False on a reconnect
+SyncSource = Callable[[bool], Iterable[Tuple[str, object]]]
+
+
+class LocalEventBus:
+    """Single-process bus: with one worker there is nobody to relay to.
+
+    Publishing is a no-op and this worker is always the leader, so it runs
+    the once-per-deployment jobs (ETA refresh, simulated activity).
+    """
+
+    is_leader = True
+
+    def __init__(self):
+        self.published = 0
+
+    def subscribe(self, handler: Handler):
+        pass
+
+    def publish(self, channel: str, payload):
+        self.published += 1
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def metrics(self) -> Dict:
+        return {"backend": "local", "leader": True, "peers": 0, "published": self.published}
+
+
+class SocketEventBus:
+    """Pub/sub between uvicorn workers over a Unix domain socket.
+
+    The worker holding an flock on `<path>.lock` is the leader: it listens on
+    `path` and relays every line it receives to all other connected workers,
+    in arrival order. The rest connect as clients. If the leader goes away
+    its lock is released, the survivors re-run the election and reconnect to
+    whoever won. Messages are one JSON line each: [origin, channel, payload].
+
+    The election is first tried when the bus is created, so a worker knows
+    at import time whether it leads (and should seed data) or will be synced.
+    Publishing never blocks; while a client has no connection (starting up,
+    between leaders) its messages are kept, up to MAX_BACKLOG, and sent
+    after the hello when it reconnects. On every connection a client asks
+    for a sync: the leader first takes in the client's backlog, then sends it
+    whatever `sync_source` returns, draining as it goes, while live traffic
+    for it is held back until the sync is out. List payloads too big for one
+    message are split across several during a sync.
+    """
+
+    def __init__(self, path: str, sync_source: Optional[SyncSource] = None):
+        self.path = path
+        self.sync_source = sync_source
+        self.worker_id = uuid.uuid4().hex[:12]
+        self._handlers: List[Handler] = []
+        self._lock_file = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        # Connected peers; a peer still being synced maps to the lines held back for it
+        self._peers: Dict[asyncio.StreamWriter, Optional[List[bytes]]] = {}
+        self._upstream: Optional[asyncio.StreamWriter] = None
+        self._backlog: deque = deque()
+        self._task: Optional[asyncio.Task] = None
+        self._joined = False
+        self.published = 0
+        self.received = 0
+        self.dropped = 0
+        self.handler_errors = 0
+        self.is_leader = self._try_lead()
+
+    def subscribe(self, handler: Handler):
+        self._handlers.append(handler)
+
+    # Publishing
+
+    def _encode(self, channel: str, payload) -> bytes:
+        return json.dumps([self.worker_id, channel, payload], separators=(",", ":")).encode() + b"\n"
+
+    def publish(self, channel: str, payload):
+        if self.is_leader:
+            # Peers that connect later are synced instead
+            if self._peers:
+                self._relay(self._encode(channel, payload))
+                self.published += 1
+            else:
+                self.dropped += 1
+            return
+        line = self._encode(channel, payload)
+        if self._upstream is not None:
+            self._upstream.write(line)
+        elif len(self._backlog) < MAX_BACKLOG:
+            self._backlog.append(line)
+        else:
+            self.dropped += 1
+            return
+        self.published += 1
+
+    def _relay(self, line: bytes, source: Optional[asyncio.StreamWriter] = None):
+        for peer, held in self._peers.items():
+            if peer is source:
+                continue
+            if held is None:
+                peer.write(line)
+            else:
+                held.append(line)
+
+    def _sync_lines(self, channel: str, payload) -> Iterator[bytes]:
+        line = self._encode(channel, payload)
+        if len(line) <= MAX_MESSAGE_BYTES or not isinstance(payload, list) or len(payload) < 2:
+            yield line
+            return
+        half = len(payload) // 2
+        yield from self._sync_lines(channel, payload[:half])
+        yield from self._sync_lines(channel, payload[half:])
+
+    def _dispatch(self, line: bytes):
+        try:
+            origin, channel, payload = json.loads(line)
+        except (ValueError, TypeError):
+            return
+        if origin == self.worker_id:
+            return
+        self.received += 1
+        for handler in self._handlers:
+            try:
+                handler(channel, payload)
+            except Exception as e:
+                self.handler_errors += 1
+                print(f"Event bus handler failed on {channel}: {e}")
+
+    # Lifecycle
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._peers):
+                writer.close()
+            self._peers.clear()
+            self._server = None
+        if self._upstream is not None:
+            self._upstream.close()
+            self._upstream = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+        self.is_leader = False
+
+    def _try_lead(self) -> bool:
+        lock_file = open(self.path + ".lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    async def _run(self):
+        while True:
+            if self._lock_file is not None or self._try_lead():
+                # The lock proves no live leader owns the socket file, so a leftover one is stale
+                try:
+                    os.unlink(self.path)
+                except FileNotFoundError:
+                    pass
+                self._server = await asyncio.start_unix_server(self._serve_peer, path=self.path,
+                                                               limit=MAX_MESSAGE_BYTES)
+                self.is_leader = True
+                # Whatever it missed as a client, the peers now sync from it
+                self._backlog.clear()
+                await asyncio.Event().wait()
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path, limit=MAX_MESSAGE_BYTES)
+            except (FileNotFoundError, ConnectionRefusedError):
+                await asyncio.sleep(RECONNECT_SECONDS)
+                continue
+            # The hello and backlog go out together, ahead of anything published from here on
+            backlog, self._backlog = self._backlog, deque()
+            writer.write(self._encode(HELLO_CHANNEL, {"sync": True, "joining": not self._joined,
+                                                      "replay": len(backlog)}))
+            writer.writelines(backlog)
+            self._joined = True
+            self._upstream = writer
+            try:
+                while line := await reader.readline():
+                    self._dispatch(line)
+            except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+                pass
+            finally:
+                self._upstream = None
+                writer.close()
+            await asyncio.sleep(RECONNECT_SECONDS)
+
+    async def _serve_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            _, _, hello = json.loads(await reader.readline())
+            # The client's backlog first, so the sync below already includes it
+            for _ in range(hello.get("replay", 0)):
+                self._receive(await reader.readline(), writer)
+            # Hold back live traffic until the sync is out; the snapshot is taken after this,
+            # so anything held back is at least as new as what the sync carries
+            self._peers[writer] = []
+            if hello.get("sync") and self.sync_source is not None:
+                for channel, payload in self.sync_source(hello.get("joining", True)):
+                    for line in self._sync_lines(channel, payload):
+                        writer.write(line)
+                        await writer.drain()
+            held = self._peers[writer]
+            while held:
+                writer.writelines(held)
+                held.clear()
+                await writer.drain()
+            self._peers[writer] = None
+            while line := await reader.readline():
+                self._receive(line, writer)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError, TypeError, AttributeError):
+            pass
+        finally:
+            self._peers.pop(writer, None)
+            writer.close()
+
+    def _receive(self, line: bytes, source: asyncio.StreamWriter):
+        # Relay first, so peers see messages in the order the leader received them
+        self._relay(line, source)
+        self._dispatch(line)
+
+    def metrics(self) -> Dict:
+        return {
+            "backend": "socket",
+            "worker": self.worker_id,
+            "leader": self.is_leader,
+            "peers": len(self._peers) if self.is_leader else int(self._upstream is not None),
+            "published": self.published,
+            "received": self.received,
+            "dropped": self.dropped,
+            "backlog": len(self._backlog),
+            "handler_errors": self.handler_errors,
+        }
+
+
+def create_event_bus(sync_source: Optional[SyncSource] = None):
+    """Pick the bus from EVENT_BUS: local (one worker, default) or socket (several uvicorn workers)"""
+    backend = os.getenv('EVENT_BUS', 'local').lower()
+    if backend == 'local':
+        return LocalEventBus()
+    if backend == 'socket':
+        return SocketEventBus(os.getenv('EVENT_BUS_PATH', '/tmp/rush-delivery-bus.sock'), sync_source)
+    raise ValueError(f"Unknown EVENT_BUS: {backend}")
@@ -0,0 +1,52 @@
+import csv
+import io
+import json
+import zlib
+from typing import Dict, Iterable, Iterator, List
+
+CHUNK_SIZE = 64 * 1024
+
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def ndjson_lines(records: Iterable[Dict]) -> Iterator[str]:
+    for record in records:
+        yield json.dumps(record, separators=(",", ":")) + "\n"
+
+
+def csv_lines(records: Iterable[Dict], columns: List[str]) -> Iterator[str]:
+    """Header row, then one row per record; nested values are written as JSON"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for record in records:
+        writer.writerow([
+            json.dumps(value, separators=(",", ":")) if isinstance(value, (dict, list)) else value
+            for value in (record.get(column) for column in columns)
+        ])
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def encode_chunks(lines: Iterable[str], gzip: bool = False) -> Iterator[bytes]:
+    """Group text into ~CHUNK_SIZE byte chunks, optionally as one streamed gzip member"""
+    compressor = zlib.compressobj(wbits=31) if gzip else None
+    pending: List[str] = []
+    size = 0
+    for line in lines:
+        pending.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            data = "".join(pending).encode()
+            pending, size = [], 0
+            data = compressor.compress(data) if compressor else data
+            if data:
+                yield data
+    data = "".join(pending).encode()
+    if compressor:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
@@ -0,0 +1,98 @@
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+def parse_fix(raw) -> Tuple[Optional[Dict], Optional[str]]:
+    """Accept {"driver_id", "lat", "lng", "ts"?} or the compact [driver_id, lat, lng, ts?]"""
+    if isinstance(raw, dict):
+        driver_id, lat, lng, ts = raw.get('driver_id'), raw.get('lat'), raw.get('lng'), raw.get('ts')
+    elif isinstance(raw, (list, tuple)) and 3 <= len(raw) <= 4:
+        driver_id, lat, lng = raw[:3]
+        ts = raw[3] if len(raw) == 4 else None
+    else:
+        return None, "Expected an object or [driver_id, lat, lng, ts]"
+    if not isinstance(driver_id, str) or not driver_id:
+        return None, "driver_id is required"
+    if isinstance(lat, bool) or isinstance(lng, bool) or not isinstance(lat, (int, float)) or not isinstance(lng, (int, float)):
+        return None, "lat and lng must be numbers"
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None, "lat/lng out of range"
+    if ts is not None and (isinstance(ts, bool) or not isinstance(ts, (int, float))):
+        return None, "ts must be a number"
+    return {'driver_id': driver_id, 'lat': float(lat), 'lng': float(lng), 'ts': ts}, None
+
+
+class LocationCoalescer:
+    """Latest-fix-wins buffer for driver GPS fixes, applied once per flush window.
+
+    `submit` only validates and overwrites the pending fix for each driver,
+    so however often a driver reports, each window costs at most one store
+    write and one broadcast entry per driver. A fix with an older `ts` than
+    the pending one, or than the last one applied for that driver, arrived
+    out of order and is ignored. `apply` receives {driver_id: fix} and
+    returns the IDs of the drivers it actually moved.
+    """
+
+    def __init__(self, apply: Callable[[Dict[str, Dict]], List[str]]):
+        self.apply = apply
+        self._pending: Dict[str, Dict] = {}
+        self._applied_ts: Dict[str, float] = {}
+        self.received = 0
+        self.rejected = 0
+        self.coalesced = 0
+        self.stale = 0
+        self.applied = 0
+        self.flushes = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def submit(self, fixes: Iterable) -> Tuple[int, List[Dict]]:
+        """Buffer a batch of raw fixes; returns (accepted count, per-fix errors)"""
+        accepted = 0
+        errors = []
+        pending = self._pending
+        for index, raw in enumerate(fixes):
+            fix, error = parse_fix(raw)
+            if error is not None:
+                errors.append({"index": index, "error": error})
+                continue
+            accepted += 1
+            ts = fix['ts']
+            if ts is not None and ts < self._applied_ts.get(fix['driver_id'], ts):
+                self.stale += 1
+                continue
+            current = pending.get(fix['driver_id'])
+            if current is not None:
+                self.coalesced += 1
+                if ts is not None and current['ts'] is not None and ts < current['ts']:
+                    continue
+            pending[fix['driver_id']] = fix
+        self.received += accepted
+        self.rejected += len(errors)
+        return accepted, errors
+
+    def flush(self) -> int:
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+        moved = self.apply(batch)
+        # Only drivers that exist are remembered, so made-up IDs can't grow this
+        for driver_id in moved:
+            ts = batch[driver_id]['ts']
+            if ts is not None:
+                self._applied_ts[driver_id] = ts
+        self.applied += len(moved)
+        self.flushes += 1
+        return len(moved)
+
+    def metrics(self) -> Dict:
+        return {
+            "received": self.received,
+            "rejected": self.rejected,
+            "coalesced": self.coalesced,
+            "stale": self.stale,
+            "applied": self.applied,
+            "flushes": self.flushes,
+            "pending": self.pending,
+        }
@@ -1,27 +1,50 @@
-from fastapi import FastAPI, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Body, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from passlib.context import CryptContext
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
 from jose import jwt, JWTError
 from dotenv import load_dotenv
 from firebase_config import initialize_firebase, verify_firebase_token
+from tracking_ids import create_allocator
+from password_hashing import create_password_hasher, PasswordHasherBusy
+from token_cache import TokenCache
+from broadcast import BroadcastHub, DASHBOARD_TOPIC, HEARTBEAT_TOPIC, parcel_topic
+from periodic_task import PeriodicTask
+from activity_log import ActivityLog, worker_spill_dir
+from dashboard_stats import DashboardCounters
+from wal import create_journal, JournalFailed, NullJournal
+from storage import create_storage, normalize_email, DuplicateKeyError
+import bulk_ingest
+import exports
+from driver_index import DriverLocationIndex
+from gps_ingest import LocationCoalescer
+from eta_engine import EtaEngine
+from assignment import plan_assignment
+from parcel_history import ParcelHistory
+from event_bus import create_event_bus
+from response_cache import ResponseCache, CachedResponse
+from change_log import ChangeLog
+from user_index import DEFAULT_PREFS, UserIndex
+from notification_inbox import NotificationInbox, NotificationInboxes
+from web_push import PushEndpointRejected, check_subscription, create_web_push_sender
+from push_dispatch import create_push_dispatcher
 import os
 from typing import List, Dict, Optional
-
-# WebSocket connections list - defined early for use in endpoints
-active_connections: List[WebSocket] = []
 import uuid
 import datetime
 import json
 import random
-import string
 from pathlib import Path
+from email.utils import format_datetime, parsedate_to_datetime
 import asyncio
+import zlib
 
 load_dotenv()
 
 JWT_SECRET = os.getenv("JWT_SECRET", "your-super-secret-jwt-key-that-should-be-longer-in-production")
+# Secrets anyone can read in this repo (the fallback above and the .env.example placeholder)
+PUBLIC_JWT_SECRETS = {"your-super-secret-jwt-key-that-should-be-longer-in-production", "your_super_secret_jwt_key_here"}
 JWT_ALGORITHM = "HS256"
 
 # Initialize Firebase
@@ -31,16 +54,76 @@ try:
 except Exception as e:
     print(f"Failed to initialize Firebase: {e}")
 
-# Enhanced in-memory storage for demo purposes
-# In production, this would be replaced with Firebase
+# Users, parcels, drivers and notifications live behind the storage layer
+# (in-memory by default, SQLite with STORAGE_BACKEND=sqlite)
+storage = create_storage()
+
+def activity_spill_dir() -> Optional[str]:
+    """ACTIVITY_SPILL_DIR; with several workers, which number their feeds apart, one directory each under it."""
+    base = os.getenv('ACTIVITY_SPILL_DIR') or None
+    if base is None or os.getenv('EVENT_BUS', 'local').lower() == 'local':
+        return base
+    return worker_spill_dir(base)
+
+# Process-local feeds for the dashboard
 data_store = {
-    'users': {},
-    'parcels': {},
-    'drivers': {},
-    'activities': [],
+    'activities': ActivityLog(
+        capacity=int(os.getenv('ACTIVITY_LOG_CAPACITY', '1000')),
+        spill_dir=activity_spill_dir()
+    ),
     'alerts': []
 }
 
+# Grid index over driver positions for nearest-driver queries
+driver_index = DriverLocationIndex(float(os.getenv('DRIVER_GRID_CELL_DEG', '0.01')))
+
+# Vectorized ETAs for active parcels, refreshed periodically
+eta_engine = EtaEngine(threshold=float(os.getenv('ETA_CHANGE_THRESHOLD_SECONDS', '300')))
+
+# Append-only status/location history per parcel (process-local)
+parcel_history = ParcelHistory(
+    checkpoint_every=int(os.getenv('HISTORY_CHECKPOINT_EVERY', '50')),
+    max_events=int(os.getenv('HISTORY_MAX_EVENTS', '1000'))
+)
+
+# Encoded GET /parcels/{tracking_id} responses, dropped on every parcel write
+response_cache = ResponseCache(max_entries=int(os.getenv('TRACKING_CACHE_SIZE', '10000')))
+
+# Change sequence over parcel and driver writes, for GET /changes and WebSocket resume;
+# with several workers, cursors lag by the longest relay delay between them
+change_log = ChangeLog(settle=float(os.getenv(
+    'CHANGES_SETTLE_SECONDS', '0' if os.getenv('EVENT_BUS', 'local').lower() == 'local' else '1'
+)))
+
+# Users with push subscriptions
+user_index = UserIndex()
+
+# Per-user notification inboxes (capped), cached over the storage layer
+notification_inboxes = NotificationInboxes(
+    storage.get_notifications,
+    max_size=int(os.getenv('NOTIFICATIONS_MAX', '100')),
+    max_users=int(os.getenv('NOTIFICATION_CACHE_USERS', '10000'))
+)
+
+# Driver statuses that can take a new parcel
+AVAILABLE_DRIVER_STATUSES = ('available', 'active')
+
+# Emails claimed by registrations that are still hashing their password
+pending_emails: Dict[str, str] = {}
+
+# Dashboard aggregates, updated by store_parcel / store_driver
+dashboard_counters = DashboardCounters()
+
+# Verified JWT claims, so polling dashboards skip repeated signature checks; store_user drops a user's entries
+token_cache = TokenCache(
+    max_entries=int(os.getenv('TOKEN_CACHE_SIZE', '10000')),
+    max_ttl=float(os.getenv('TOKEN_CACHE_TTL', '300'))
+)
+
+# Write-ahead log of every store_* write (a no-op unless WAL_DIR is set);
+# only the in-memory backend needs one
+journal = create_journal() if storage.volatile else NullJournal()
+
 app = FastAPI(title="Rush Delivery API", version="2.0.0")
 
 # CORS middleware for frontend communication
@@ -67,14 +150,20 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Unread-Count"],
 )
 
 # Static file serving removed for production - frontend deployed separately on Netlify
 
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
-# Password hashing - moved to global scope
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing - bcrypt runs on a bounded pool, off the event loop
+password_hasher = create_password_hasher()
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request, exc):
+    return JSONResponse(status_code=503, content={"detail": "Server busy, please retry"}, headers={"Retry-After": "1"})
 
 class User(BaseModel):
     email: str
@@ -82,25 +171,43 @@ class User(BaseModel):
     role: str = 'client'
 
 class Parcel(BaseModel):
-    id: str = str(uuid.uuid4())
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     tracking_id: Optional[str] = None
     status: str
     location: Dict[str, float]
     estimated_delivery: str
     sender: str
     receiver: str
+    # Accounts linked to the parcel; only they get its notifications
+    sender_uid: Optional[str] = None
+    receiver_uid: Optional[str] = None
     driver_id: Optional[str] = None
     updates: List[Dict] = []
     origin: Optional[str] = None
     destination: Optional[str] = None
+    # Where the parcel is headed, as {'lat', 'lng'}; parcels without it get no live ETA
+    destination_location: Optional[Dict[str, float]] = None
+    # Live arrival estimate kept by the ETA engine; estimated_delivery stays as promised
+    eta: Optional[str] = None
+    created_at: str = Field(default_factory=lambda: datetime.datetime.now().isoformat())
+    # Bumped and stamped by store_parcel on every write; drive ETag / Last-Modified
+    version: int = 0
+    updated_at: Optional[str] = None
+    # Change sequence number of the last write (GET /changes)
+    seq: int = 0
+
+# Parcel fields that link accounts; left out of everything public
+PARCEL_ACCOUNT_FIELDS = ('sender_uid', 'receiver_uid')
 
 class Driver(BaseModel):
-    id: str = str(uuid.uuid4())
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
     phone: str
     vehicle_type: str
     current_location: Dict[str, float]
     status: str = 'available'
+    # Change sequence number of the last write (GET /changes)
+    seq: int = 0
 
 class DashboardStats(BaseModel):
     total_shipments: int
@@ -108,38 +215,326 @@ class DashboardStats(BaseModel):
     revenue_today: float
     on_time_delivery: float
 
+def parcel_stored(previous: Optional[Dict], parcel: Dict, record_history: bool = True):
+    """Bring the derived state (counters, ETAs, history, tracking cache, changes) up to date with a parcel write."""
+    change_log.record('parcels', parcel['id'], parcel.get('seq'))
+    dashboard_counters.parcel_changed(previous, parcel)
+    eta_engine.track_parcel(parcel)
+    if record_history:
+        parcel_history.record(previous, parcel)
+    response_cache.invalidate(parcel.get('tracking_id'))
+    if previous is not None and previous.get('tracking_id') != parcel.get('tracking_id'):
+        response_cache.invalidate(previous.get('tracking_id'))
+
+def driver_stored(previous: Optional[Dict], driver: Dict):
+    """Bring the derived state (counters, spatial index, ETAs, changes) up to date with a driver write."""
+    change_log.record('drivers', driver['id'], driver.get('seq'))
+    dashboard_counters.driver_changed(previous, driver)
+    driver_index.update(driver['id'], driver.get('current_location'), driver.get('status'))
+    eta_engine.track_driver(driver)
+    # Tracking responses embed the driver's name (or leave it out while the driver is unknown)
+    if previous is None or previous.get('name') != driver.get('name'):
+        response_cache.invalidate_driver(driver['id'])
+
+def user_stored(user_id: str, user_data: Dict):
+    """Bring the derived state (push subscription and contact index) up to date with a user write."""
+    user_index.update(user_id, user_data)
+
+def stamp_parcel(parcel: Dict):
+    """Bump the version of a parcel about to be written (built from the current record) and stamp the time."""
+    parcel['version'] = parcel.get('version', 0) + 1
+    parcel['updated_at'] = datetime.datetime.now().isoformat()
+    parcel['seq'] = change_log.next_seq()
+
+def store_parcel(parcel: Dict, replayed: bool = False):
+    """Insert or replace a parcel; raises DuplicateKeyError on a taken tracking ID."""
+    if not replayed:
+        stamp_parcel(parcel)
+    previous = storage.put_parcel(parcel)
+    parcel_stored(previous, parcel, record_history=not replayed)
+    journal.append('parcels', parcel['id'], parcel)
+    replicate([('parcels', parcel['id'], parcel, previous)])
+
+def store_parcels(parcels: List[Dict]):
+    """Replace several parcels atomically: one storage transaction and one journal record."""
+    for parcel in parcels:
+        stamp_parcel(parcel)
+    previous = storage.put_parcels(parcels)
+    for old, parcel in zip(previous, parcels):
+        parcel_stored(old, parcel)
+    journal.append_many([('parcels', parcel['id'], parcel) for parcel in parcels])
+    replicate([('parcels', parcel['id'], parcel, old) for old, parcel in zip(previous, parcels)])
+
+def store_new_parcels(parcels: List[Dict]) -> List[int]:
+    """Insert a batch of new parcels in one storage transaction; returns positions rejected as duplicates."""
+    for parcel in parcels:
+        stamp_parcel(parcel)
+    rejected = storage.insert_parcels(parcels)
+    skipped = set(rejected)
+    inserted = [parcel for position, parcel in enumerate(parcels) if position not in skipped]
+    for parcel in inserted:
+        parcel_stored(None, parcel)
+    # One record, so a crash can't leave half of a batch that was inserted in one transaction
+    journal.append_many([('parcels', parcel['id'], parcel) for parcel in inserted])
+    replicate([('parcels', parcel['id'], parcel, None) for parcel in inserted])
+    return rejected
+
+def store_driver(driver: Dict, replayed: bool = False):
+    """Insert or replace a driver and keep the dashboard counters in sync."""
+    if not replayed:
+        driver['seq'] = change_log.next_seq()
+    previous = storage.put_driver(driver)
+    driver_stored(previous, driver)
+    journal.append('drivers', driver['id'], driver)
+    replicate([('drivers', driver['id'], driver, previous)])
+
+def store_user(user_id: str, user_data: Dict):
+    """Insert or replace a user; raises DuplicateKeyError on a taken email."""
+    storage.put_user(user_id, user_data)
+    user_stored(user_id, user_data)
+    # Cached claims carry the stored role, which this write may have changed
+    token_cache.invalidate_user(user_id)
+    journal.append('users', user_id, user_data)
+    replicate([('users', user_id, user_data, None)])
+
+def store_notifications(user_id: str, inbox: Dict):
+    """Replace a user's notification inbox record and journal it."""
+    storage.put_notifications(user_id, inbox)
+    journal.append('notifications', user_id, inbox)
+    replicate([('notifications', user_id, inbox, None)])
+
+def store_notification_changes(user_id: str, inbox: NotificationInbox):
+    """Store a changed inbox; only its changes are journaled and relayed, not the whole record."""
+    changes = inbox.take_changes()
+    if not changes:
+        return
+    storage.put_notifications(user_id, inbox.to_record())
+    journal.append('notification_changes', user_id, changes)
+    replicate([('notification_changes', user_id, changes, None)])
+
+def apply_notification_changes(user_id: str, changes: List[Dict]):
+    """Apply journaled or relayed inbox changes to this worker's copy of the inbox."""
+    inbox = notification_inboxes.get(user_id)
+    inbox.apply_changes(changes)
+    storage.put_notifications(user_id, inbox.to_record())
+
+def restore_record(table: str, key: str, value):
+    """Apply one replayed journal record to the in-memory store."""
+    if table == 'parcels':
+        # Replayed writes keep their version but have lost their original times,
+        # so history starts over after a restart
+        store_parcel(value, replayed=True)
+    elif table == 'drivers':
+        store_driver(value, replayed=True)
+    elif table == 'users':
+        store_user(key, value)
+    elif table == 'notifications':
+        store_notifications(key, value)
+        notification_inboxes.invalidate(key)
+    elif table == 'notification_changes':
+        apply_notification_changes(key, value)
+
+# Several uvicorn workers (EVENT_BUS=socket) relay every store write, WebSocket
+# broadcast and feed entry to each other, so each worker sees the whole picture
+def replicate(records: List[tuple]):
+    """Relay store writes to the other workers; `previous` only matters to workers sharing durable storage."""
+    if records:
+        event_bus.publish('records', [
+            [table, key, value, None if storage.volatile else previous]
+            for table, key, value, previous in records
+        ])
+
+def apply_replicated(records: List[list]):
+    """Apply another worker's store writes: the records themselves on memory storage, the derived state always."""
+    for table, key, value, previous in records:
+        try:
+            if table == 'parcels':
+                if storage.volatile:
+                    previous = storage.put_parcel(value)
+                parcel_stored(previous, value)
+            elif table == 'drivers':
+                if storage.volatile:
+                    previous = storage.put_driver(value)
+                driver_stored(previous, value)
+            elif table == 'users':
+                if storage.volatile:
+                    storage.put_user(key, value)
+                user_stored(key, value)
+                token_cache.invalidate_user(key)
+            elif table == 'notifications':
+                if storage.volatile:
+                    storage.put_notifications(key, value)
+                notification_inboxes.invalidate(key)
+            elif table == 'notification_changes':
+                if storage.volatile:
+                    apply_notification_changes(key, value)
+                else:
+                    notification_inboxes.invalidate(key)
+        except DuplicateKeyError:
+            # Another worker already claimed this tracking ID or email
+            print(f"Skipped replicated {table} record {key}: duplicate key")
+
+def on_bus_message(channel: str, payload):
+    if channel == 'records':
+        apply_replicated(payload)
+    elif channel == 'broadcast':
+        topics, message, coalesce_key = payload
+        hub.publish(topics, message, tuple(coalesce_key) if isinstance(coalesce_key, list) else coalesce_key)
+    elif channel == 'activity':
+        data_store['activities'].add(payload)
+    elif channel == 'alert':
+        data_store['alerts'].insert(0, payload)
+
+def replication_snapshot(joining: bool = True):
+    """What the leader sends a worker that connects: its records (memory storage only), plus
+    recent feed entries when the worker is joining rather than reconnecting (it has those)."""
+    if storage.volatile:
+        for table, rows in storage.snapshot().items():
+            batch = []
+            for key, value in rows.items():
+                batch.append([table, key, value.to_dict() if hasattr(value, 'to_dict') else value, None])
+                if len(batch) == 500:
+                    yield 'records', batch
+                    batch = []
+            if batch:
+                yield 'records', batch
+    if not joining:
+        return
+    for activity in reversed(data_store['activities'].latest(100)):
+        yield 'activity', activity
+    for alert in reversed(data_store['alerts']):
+        yield 'alert', alert
+
+def publish_event(topics: List[str], message: Dict, coalesce_key=None):
+    """Deliver to this worker's WebSocket subscribers and relay to the other workers'."""
+    hub.publish(topics, message, coalesce_key)
+    event_bus.publish('broadcast', [topics, message, coalesce_key])
+
+def log_activity(activity: Dict):
+    """Add an entry to the activity feed on every worker."""
+    data_store['activities'].add(activity)
+    event_bus.publish('activity', activity)
+
+def add_alert(alert: Dict):
+    """Put an alert at the top of the dashboard list on every worker."""
+    data_store['alerts'].insert(0, alert)
+    event_bus.publish('alert', alert)
+
+event_bus = create_event_bus(sync_source=replication_snapshot)
+event_bus.subscribe(on_bus_message)
+
+def prune_push_subscription(user_id: str, endpoint: str):
+    """Drop a subscription its push service reported as expired."""
+    user_data = storage.get_user(user_id)
+    if user_data is None:
+        return
+    subscriptions = user_data.get('push_subscriptions') or []
+    kept = [s for s in subscriptions if not (isinstance(s, dict) and s.get('endpoint') == endpoint)]
+    if len(kept) != len(subscriptions):
+        store_user(user_id, {**user_data, 'push_subscriptions': kept})
+
+# Web push: one job per subscription on a bounded queue, sent by a pool of async workers
+push_sender = create_web_push_sender()
+push_dispatcher = create_push_dispatcher(push_sender.send, on_expired=prune_push_subscription)
+
+def notify_parcel_accounts(parcel: Dict, body: str) -> int:
+    """Notify the parcel's linked sender and receiver accounts, in their inbox and by push; returns the pushes queued."""
+    return notify_parcels_accounts([(parcel, body)])
+
+def notify_parcels_accounts(events: List[tuple]) -> int:
+    """notify_parcel_accounts for several (parcel, body) pairs; each inbox touched is stored once."""
+    inboxes: Dict[str, Optional[NotificationInbox]] = {}
+    queued = 0
+    for parcel, body in events:
+        message = {
+            "title": "Rush Delivery",
+            "body": body,
+            "url": f"/tracking?trackingId={parcel.get('tracking_id')}"
+        }
+        # Only explicit links count: the free-text sender/receiver names prove nothing about who is who
+        for user_id in {parcel.get('sender_uid'), parcel.get('receiver_uid')} - {None}:
+            if user_id not in inboxes:
+                inboxes[user_id] = notification_inboxes.get(user_id) if storage.get_user(user_id) is not None else None
+            inbox = inboxes[user_id]
+            if inbox is None:
+                continue
+            inbox.add({**message, "tracking_id": parcel.get('tracking_id')})
+            queued += push_dispatcher.submit(user_id, user_index.subscriptions(user_id), message)
+    for user_id, inbox in inboxes.items():
+        if inbox is not None:
+            store_notification_changes(user_id, inbox)
+    return queued
+
+tracking_id_allocator = create_allocator(None if JWT_SECRET in PUBLIC_JWT_SECRETS else JWT_SECRET)
+
+# WebSocket fan-out - defined early for use in endpoints
+hub = BroadcastHub(
+    max_queue=int(os.getenv('WS_QUEUE_SIZE', '100')),
+    policy=os.getenv('WS_QUEUE_POLICY', 'drop_oldest'),
+    send_timeout=float(os.getenv('WS_SEND_TIMEOUT', '5'))
+)
+
+def public_parcel(parcel: Dict) -> Dict:
+    """A parcel as anyone holding its tracking ID may see it: without the linked account IDs."""
+    if not any(parcel.get(field) for field in PARCEL_ACCOUNT_FIELDS):
+        return parcel
+    return {key: value for key, value in parcel.items() if key not in PARCEL_ACCOUNT_FIELDS}
+
+def broadcast_parcel(event_type: str, parcel: Dict):
+    """Publish a parcel event to its tracking subscribers and all dashboards."""
+    # Queued updates for the same parcel collapse into the latest one
+    coalesce_key = ('parcel', parcel['id']) if event_type == 'parcel_update' else None
+    topics = [DASHBOARD_TOPIC]
+    if parcel.get('tracking_id'):
+        public = public_parcel(parcel)
+        if public is parcel:
+            topics.append(parcel_topic(parcel['tracking_id']))
+        else:
+            # Tracking subscribers only need the tracking ID, so they don't see the linked accounts
+            publish_event([parcel_topic(parcel['tracking_id'])], {"type": event_type, "data": public}, coalesce_key)
+    publish_event(topics, {"type": event_type, "data": parcel}, coalesce_key)
+
+def reserve_email(email: str, user_id: str) -> bool:
+    """Claim an email for a user id; False if another user holds or is registering it."""
+    owner = storage.find_user_id_by_email(email)
+    if owner is not None and owner != user_id:
+        return False
+    return pending_emails.setdefault(normalize_email(email), user_id) == user_id
+
+def release_email(email: str, user_id: str):
+    key = normalize_email(email)
+    if pending_emails.get(key) == user_id:
+        del pending_emails[key]
+
 def generate_tracking_id():
     """Generate a unique 16-character base36 tracking ID."""
     while True:
-        # Generate 16-character random string using base36 (0-9, A-Z)
-        chars = string.ascii_uppercase + string.digits
-        tracking_id = ''.join(random.choices(chars, k=16))
-        # Check uniqueness against existing parcels
-        existing_ids = [p.get('tracking_id') for p in data_store['parcels'].values()]
-        if tracking_id not in existing_ids:
+        # Allocator IDs never repeat; only a client-chosen ID can already be taken
+        tracking_id = tracking_id_allocator.allocate()
+        if storage.find_parcel_by_tracking_id(tracking_id) is None:
             return tracking_id
 
 # Initialize with sample data
 def initialize_sample_data():
     # Create sample admin user
     admin_id = str(uuid.uuid4())
-    hashed_password = pwd_context.hash("admin123")
-    data_store['users'][admin_id] = {
+    hashed_password = password_hasher.hash_sync("admin123")
+    store_user(admin_id, {
         'email': 'admin@rushdelivery.com',
         'password': hashed_password,
         'role': 'admin',
         'uid': admin_id
-    }
+    })
 
     # Create sample demo user
     demo_id = str(uuid.uuid4())
-    hashed_demo_password = pwd_context.hash("demo123")
-    data_store['users'][demo_id] = {
+    hashed_demo_password = password_hasher.hash_sync("demo123")
+    store_user(demo_id, {
         'email': 'demo@rushdelivery.com',
         'password': hashed_demo_password,
         'role': 'client',
         'uid': demo_id
-    }
+    })
 
     # Create sample drivers
     drivers = [
@@ -151,10 +546,10 @@ def initialize_sample_data():
     ]
 
     for driver in drivers:
-        data_store['drivers'][driver.id] = driver.dict()
+        store_driver(driver.dict())
 
     # Create sample parcels - only after drivers are added
-    driver_ids = list(data_store['drivers'].keys())
+    driver_ids = [driver.id for driver in drivers]
     if driver_ids:  # Only create parcels if drivers exist
         sample_parcels = [
             Parcel(
@@ -202,16 +597,19 @@ def initialize_sample_data():
         for parcel in sample_parcels:
             # Generate tracking_id for sample parcels
             parcel.tracking_id = generate_tracking_id()
-            data_store['parcels'][parcel.id] = parcel.dict()
+            store_parcel(parcel.dict())
 
     # Initialize sample activities and alerts
-    data_store['activities'] = [
+    sample_activities = [
         {"title": "New shipment RD001238 created", "time": "5 minutes ago", "status": "Success", "type": "success"},
         {"title": "Driver John Smith location updated", "time": "8 minutes ago", "status": "Info", "type": "info"},
         {"title": "Payment processed for RD001237", "time": "12 minutes ago", "status": "Success", "type": "success"},
         {"title": "Customer support ticket resolved", "time": "15 minutes ago", "status": "Success", "type": "success"},
         {"title": "Fleet maintenance reminder", "time": "20 minutes ago", "status": "Warning", "type": "warning"}
     ]
+    # Oldest first, so the newest sample gets the highest seq
+    for activity in reversed(sample_activities):
+        data_store['activities'].add(activity)
 
     data_store['alerts'] = [
         {"type": "info", "message": "All systems operational", "time": "Real-time"},
@@ -219,29 +617,66 @@ def initialize_sample_data():
         {"type": "warning", "message": "2 packages delayed due to traffic", "time": "2 hours ago"}
     ]
 
-# Initialize data on startup
-initialize_sample_data()
+# Replay the write-ahead log, or seed sample data on a fresh start
+recovered = journal.recover(restore_record)
+journal.start()
+if not storage.volatile:
+    # Durable backends already hold their records; just rebuild the derived state
+    dashboard_counters.reset_from(DashboardCounters.from_records(storage.iter_parcels(), storage.iter_drivers()))
+    for driver in storage.iter_drivers():
+        driver_index.update(driver['id'], driver.get('current_location'), driver.get('status'))
+        eta_engine.track_driver(driver)
+    for parcel in storage.iter_parcels():
+        eta_engine.track_parcel(parcel)
+    for user_id, user_data in storage.iter_users():
+        user_stored(user_id, user_data)
+    # Oldest first, so the change log's clock only grows along it
+    stored_changes = [('parcels', p['id'], p.get('seq')) for p in storage.iter_parcels()] + \
+        [('drivers', d['id'], d.get('seq')) for d in storage.iter_drivers()]
+    for table, key, seq in sorted(stored_changes, key=lambda change: change[2] or 0):
+        change_log.record(table, key, seq)
+# With several workers only the leader seeds; the others get its data when they connect
+if not recovered and storage.is_empty() and event_bus.is_leader:
+    initialize_sample_data()
+
+@app.middleware("http")
+async def wait_for_durable_writes(request, call_next):
+    response = await call_next(request)
+    # Don't acknowledge a write before its journal records are on disk
+    if request.method in ("POST", "PUT", "PATCH", "DELETE"):
+        try:
+            await journal.wait_durable(journal.last_lsn)
+        except JournalFailed:
+            return JSONResponse(status_code=503, content={"detail": "Write could not be persisted"})
+    return response
 
 # Auth Endpoints
 @app.post("/register")
 async def register(user: User):
     try:
-        # Check if user already exists
-        for uid, user_data in data_store['users'].items():
-            if user_data['email'] == user.email:
-                raise HTTPException(400, "User already exists")
-
+        # Claim the email before hashing so a concurrent registration for the
+        # same address fails here instead of racing us across the await
         user_id = str(uuid.uuid4())
-        hashed_password = pwd_context.hash(user.password)
-        user_dict = user.dict()
-        user_dict['password'] = hashed_password
-        user_dict['uid'] = user_id
+        if not reserve_email(user.email, user_id):
+            raise HTTPException(400, "User already exists")
+
+        try:
+            hashed_password = await password_hasher.hash(user.password)
+
+            user_dict = user.dict()
+            user_dict['password'] = hashed_password
+            user_dict['uid'] = user_id
 
-        # Store user in memory
-        data_store['users'][user_id] = user_dict
+            # Store user
+            store_user(user_id, user_dict)
+        except DuplicateKeyError:
+            # Another worker registered the same email meanwhile
+            raise HTTPException(400, "User already exists")
+        finally:
+            release_email(user.email, user_id)
 
         # Add to activities
-        data_store['activities'].insert(0, {
+        log_activity({
             "title": f"New user registered: {user.email}",
             "time": "Just now",
             "status": "Success",
@@ -249,7 +684,7 @@ async def register(user: User):
         })
 
         return {"message": "User registered successfully", "uid": user_id}
-    except HTTPException:
+    except (HTTPException, PasswordHasherBusy):
         raise
     except Exception as e:
         raise HTTPException(400, f"Registration failed: {str(e)}")
@@ -258,32 +693,45 @@ async def register(user: User):
 async def login(user: User):
     try:
         # Find user by email
-        for uid, user_data in data_store['users'].items():
-            if user_data['email'] == user.email:
-                if pwd_context.verify(user.password, user_data['password']):
-                    token = jwt.encode({
-                        "uid": uid,
-                        "email": user.email,
-                        "role": user_data['role']
-                    }, JWT_SECRET, algorithm=JWT_ALGORITHM)
-
-                    # Add to activities
-                    data_store['activities'].insert(0, {
-                        "title": f"User {user.email} logged in",
-                        "time": "Just now",
-                        "status": "Info",
-                        "type": "info"
-                    })
-
-                    return {"token": token, "user": {"email": user.email, "role": user_data['role']}}
-                break
+        uid = storage.find_user_id_by_email(user.email)
+        user_data = storage.get_user(uid) if uid else None
+        if user_data and await password_hasher.verify(user.password, user_data['password']):
+            token = jwt.encode({
+                "uid": uid,
+                "email": user.email,
+                "role": user_data['role']
+            }, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+            # Add to activities
+            log_activity({
+                "title": f"User {user.email} logged in",
+                "time": "Just now",
+                "status": "Info",
+                "type": "info"
+            })
+
+            return {"token": token, "user": {"email": user.email, "role": user_data['role']}}
         raise HTTPException(401, "Invalid credentials")
+    except (HTTPException, PasswordHasherBusy):
+        raise
     except Exception as e:
         raise HTTPException(401, f"Login failed: {str(e)}")
 
+def decode_token(token: str) -> Dict:
+    """Decode and verify a JWT, serving repeat tokens from the claims cache."""
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        # The stored role wins over the one baked into the token
+        user_data = storage.get_user(payload['uid']) if payload.get('uid') else None
+        if user_data:
+            payload['role'] = user_data['role']
+        token_cache.put(token, payload)
+    return payload
+
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        payload = decode_token(credentials.credentials)
         return payload  # Contains 'uid', 'email', 'role'
     except JWTError:
         raise HTTPException(401, "Invalid token")
@@ -294,13 +742,31 @@ def get_admin_user(credentials: HTTPAuthorizationCredentials = Depends(security)
         if credentials.credentials == "985d638bafbb39fb":
             return {"role": "admin", "key": credentials.credentials}
         # Otherwise, try JWT token
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        payload = decode_token(credentials.credentials)
         if payload.get('role') != 'admin':
             raise HTTPException(403, "Admin access required")
         return payload  # Contains 'uid', 'email', 'role'
     except JWTError:
         raise HTTPException(401, "Invalid token")
 
+def get_optional_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)):
+    """The caller on endpoints open to anyone; None when anonymous or the token doesn't check out."""
+    if credentials is None:
+        return None
+    if credentials.credentials == "985d638bafbb39fb":
+        return {"role": "admin", "key": credentials.credentials}
+    try:
+        return decode_token(credentials.credentials)
+    except JWTError:
+        return None
+
+def link_parcel_accounts(parcel: Dict, user: Optional[Dict]):
+    """Admins may link any accounts to a new parcel; anyone else is linked as its sender, or not at all."""
+    if user is not None and user.get('role') == 'admin':
+        return
+    parcel['sender_uid'] = user.get('uid') if user else None
+    parcel['receiver_uid'] = None
+
 from pydantic import BaseModel
 
 class KeyRequest(BaseModel):
@@ -318,31 +784,20 @@ async def get_dashboard_stats(user: Dict = Depends(get_current_user)):
     if user['role'] != 'admin':
         raise HTTPException(403, "Admin access required")
 
-    parcels = list(data_store['parcels'].values())
-    drivers = list(data_store['drivers'].values())
-
-    # Calculate stats
-    total_shipments = len(parcels)
-    active_drivers = len([d for d in drivers if d['status'] == 'active'])
-    delivered_shipments = len([p for p in parcels if p['status'] == 'Delivered'])
-    on_time_delivery = round((delivered_shipments / total_shipments) * 100, 1) if total_shipments > 0 else 0
-
-    # Calculate revenue (mock calculation)
-    revenue_today = total_shipments * 25 + delivered_shipments * 10
-
-    return {
-        "total_shipments": total_shipments,
-        "active_drivers": active_drivers,
-        "revenue_today": revenue_today,
-        "on_time_delivery": on_time_delivery
-    }
+    return dashboard_counters.snapshot()
 
 @app.get("/dashboard/activities")
-async def get_recent_activities(user: Dict = Depends(get_current_user)):
+async def get_recent_activities(
+    after: Optional[int] = None,
+    before: Optional[int] = None,
+    limit: int = Query(10, ge=1, le=100),
+    user: Dict = Depends(get_current_user)
+):
     if user['role'] != 'admin':
         raise HTTPException(403, "Admin access required")
 
-    return data_store['activities'][:10]  # Return last 10 activities
+    # Newest first; page with ?before=<oldest seq seen> or poll with ?after=<newest seq seen>
+    return data_store['activities'].page(after=after, before=before, limit=limit)
 
 @app.get("/dashboard/alerts")
 async def get_alerts(user: Dict = Depends(get_current_user)):
@@ -356,16 +811,36 @@ async def get_active_shipments(user: Dict = Depends(get_current_user)):
     if user['role'] != 'admin':
         raise HTTPException(403, "Admin access required")
 
-    parcels = list(data_store['parcels'].values())
-    active_shipments = [p for p in parcels if p['status'] != 'Delivered']
-
-    # Add driver information
-    for shipment in active_shipments:
-        if shipment.get('driver_id') and shipment['driver_id'] in data_store['drivers']:
-            driver = data_store['drivers'][shipment['driver_id']]
-            shipment['driver'] = driver['name']
-
-    return active_shipments[:10]  # Return first 10 active shipments
+    active_shipments = storage.list_parcels(exclude_status='Delivered', limit=10)  # Return first 10 active shipments
+
+    # Add driver information (on copies; stored records are never mutated in place)
+    for i, shipment in enumerate(active_shipments):
+        driver = storage.get_driver(shipment['driver_id']) if shipment.get('driver_id') else None
+        if driver:
+            active_shipments[i] = {**shipment, 'driver': driver['name']}
+
+    return active_shipments
+
+CHANGES_PAGE_SIZE = int(os.getenv('CHANGES_PAGE_SIZE', '1000'))
+
+def change_page(since: int, limit: int) -> Dict:
+    """Current state of the parcels and drivers changed after `since`, plus the cursor to resume from."""
+    changes, cursor, more = change_log.changes_since(since, limit)
+    data = []
+    for table, key, seq in changes:
+        record = storage.get_parcel(key) if table == 'parcels' else storage.get_driver(key)
+        if record is not None:
+            data.append({"seq": seq, "table": table, "id": key, "record": record})
+    return {"changes": data, "cursor": cursor, "more": more}
+
+@app.get("/changes")
+async def get_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(CHANGES_PAGE_SIZE, ge=1, le=10000),
+    user: Dict = Depends(get_admin_user)
+):
+    # Delta sync: call again with ?since=<cursor> until more is false; since=0 is everything sequenced
+    return change_page(since, limit)
 
 # Test endpoint for CORS
 @app.get("/test")
@@ -374,7 +849,7 @@ async def test_cors():
 
 # Parcel Endpoints
 @app.post("/parcels")
-async def create_parcel(parcel: Parcel):
+async def create_parcel(parcel: Parcel, user: Optional[Dict] = Depends(get_optional_user)):
     try:
         print(f"Received parcel data: {parcel.dict()}")
         # Allow anyone to create parcels (no authentication required)
@@ -382,106 +857,492 @@ async def create_parcel(parcel: Parcel):
         # Generate tracking_id if not provided
         if not parcel.tracking_id:
             parcel.tracking_id = generate_tracking_id()
-
-        # Store parcel in memory
-        data_store['parcels'][parcel.id] = parcel.dict()
+        # Store parcel
+        record = parcel.dict()
+        link_parcel_accounts(record, user)
+        try:
+            store_parcel(record)
+        except DuplicateKeyError:
+            raise HTTPException(400, "Tracking ID already exists")
 
         # Add to activities
-        data_store['activities'].insert(0, {
+        log_activity({
             "title": f"New shipment {parcel.tracking_id} created",
             "time": "Just now",
             "status": "Success",
             "type": "success"
         })
 
-        # Broadcast update to all connected WebSocket clients
-        for conn in active_connections:
-            await conn.send_json({
-                "type": "new_parcel",
-                "data": parcel.dict()
-            })
+        notify_parcel_accounts(record, f"Shipment {record['tracking_id']} has been created")
+
+        # Broadcast update to subscribed WebSocket clients
+        broadcast_parcel("new_parcel", record)
 
         print(f"Parcel created successfully: {parcel.tracking_id}")
-        return parcel
+        return record
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error creating parcel: {str(e)}")
         raise HTTPException(500, f"Internal server error: {str(e)}")
 
+BULK_BATCH_SIZE = int(os.getenv('BULK_BATCH_SIZE', '1000'))
+parcel_batch_adapter = TypeAdapter(List[Parcel])
+
+def describe_validation_error(errors: List[Dict]) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in e['loc']) or 'parcel'}: {e['msg']}" for e in errors)
+
+def validate_parcel_batch(records: List) -> List[tuple]:
+    """Validate a batch in one pass; returns (Parcel or None, error or None) per record."""
+    try:
+        return [(parcel, None) for parcel in parcel_batch_adapter.validate_python(records)]
+    except ValidationError as e:
+        failed: Dict[int, List[Dict]] = {}
+        for error in e.errors():
+            failed.setdefault(error['loc'][0], []).append({**error, 'loc': error['loc'][1:]})
+    # Only the failing rows are reported; the rest are validated one by one
+    return [
+        (None, describe_validation_error(failed[position])) if position in failed
+        else (Parcel.model_validate(record), None)
+        for position, record in enumerate(records)
+    ]
+
+def ingest_parcel_batch(rows: List[bulk_ingest.Row], created: List[Dict], errors: List[Dict], user: Dict):
+    """Validate, assign tracking IDs, insert and announce one batch of uploaded rows."""
+    candidates = []
+    for index, record, error in rows:
+        if error is not None:
+            errors.append({"index": index, "error": error})
+        else:
+            candidates.append((index, record))
+
+    parcels = []
+    for (index, _), (parcel, error) in zip(candidates, validate_parcel_batch([record for _, record in candidates])):
+        if error is not None:
+            errors.append({"index": index, "error": error})
+        else:
+            parcels.append((index, parcel))
+
+    # Allocate every missing tracking ID in one call
+    unassigned = [parcel for _, parcel in parcels if not parcel.tracking_id]
+    for parcel, tracking_id in zip(unassigned, tracking_id_allocator.allocate_many(len(unassigned))):
+        if storage.find_parcel_by_tracking_id(tracking_id) is not None:
+            tracking_id = generate_tracking_id()
+        parcel.tracking_id = tracking_id
+
+    records = [parcel.dict() for _, parcel in parcels]
+    for record in records:
+        link_parcel_accounts(record, user)
+    rejected = set(store_new_parcels(records))
+    batch_created = []
+    for position, ((index, _), record) in enumerate(zip(parcels, records)):
+        if position in rejected:
+            errors.append({"index": index, "error": "Parcel ID or tracking ID already exists"})
+        else:
+            batch_created.append({"index": index, "id": record['id'], "tracking_id": record['tracking_id']})
+    if not batch_created:
+        return
+    created.extend(batch_created)
+    notify_parcels_accounts([
+        (record, f"Shipment {record['tracking_id']} has been created")
+        for position, record in enumerate(records) if position not in rejected
+    ])
+
+    # One activity and one dashboard broadcast for the whole batch
+    log_activity({
+        "title": f"{len(batch_created)} shipments created by bulk import",
+        "time": "Just now",
+        "status": "Success",
+        "type": "success"
+    })
+    publish_event([DASHBOARD_TOPIC], {
+        "type": "parcels_created",
+        "data": {"count": len(batch_created), "tracking_ids": [p['tracking_id'] for p in batch_created]}
+    })
+
+@app.post("/parcels/bulk")
+async def create_parcels_bulk(request: Request, user: Dict = Depends(get_current_user)):
+    # Accepts a JSON array, or a streamed NDJSON or CSV (header row first) upload
+    content_type = request.headers.get('content-type', '').split(';')[0].strip().lower()
+    if content_type in bulk_ingest.NDJSON_TYPES:
+        rows = bulk_ingest.ndjson_rows(request.stream())
+    elif content_type in bulk_ingest.CSV_TYPES:
+        rows = bulk_ingest.csv_rows(request.stream())
+    elif content_type in bulk_ingest.JSON_TYPES:
+        try:
+            rows = bulk_ingest.json_array_rows(await request.body())
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+    else:
+        raise HTTPException(415, "Upload a JSON array, NDJSON or CSV")
+
+    created: List[Dict] = []
+    errors: List[Dict] = []
+    read = 0
+    try:
+        async for batch in bulk_ingest.batched(rows, BULK_BATCH_SIZE):
+            ingest_parcel_batch(batch, created, errors, user)
+            read += len(batch)
+    except UnicodeDecodeError:
+        if not created:
+            raise HTTPException(400, "Upload must be UTF-8")
+        # Earlier batches are already stored, so report them; the rest of the upload was not read
+        errors.append({"index": read, "error": "Upload must be UTF-8; this row and the rest were not imported"})
+
+    errors.sort(key=lambda e: e['index'])
+    return {"created": len(created), "failed": len(errors), "parcels": created, "errors": errors}
+
+PARCEL_PAGE_SIZE = 100
+NDJSON_CHUNK = 200
+
+def project_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Parse a ?fields=a,b,c projection, rejecting unknown parcel fields."""
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(',') if name.strip()]
+    unknown = [name for name in names if name not in Parcel.model_fields]
+    if unknown:
+        raise HTTPException(400, f"Unknown parcel fields: {', '.join(unknown)}")
+    return names
+
+def stream_parcels_ndjson(scan, fields: Optional[List[str]], limit: Optional[int]):
+    """Encode scanned parcels as NDJSON, a chunk of lines at a time."""
+    lines = []
+    for count, (_, parcel) in enumerate(scan, 1):
+        if fields:
+            parcel = {name: parcel.get(name) for name in fields}
+        lines.append(json.dumps(parcel, separators=(",", ":")))
+        if len(lines) >= NDJSON_CHUNK:
+            yield "\n".join(lines) + "\n"
+            lines = []
+        if limit is not None and count >= limit:
+            break
+    if lines:
+        yield "\n".join(lines) + "\n"
+
 @app.get("/parcels")
-async def get_all_parcels(user: Dict = Depends(get_admin_user)):
-    return list(data_store['parcels'].values())
+async def get_all_parcels(
+    cursor: Optional[int] = Query(None, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    status: Optional[str] = None,
+    driver_id: Optional[str] = None,
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+    fields: Optional[str] = None,
+    output: str = Query('json', alias='format', pattern='^(json|ndjson)$'),
+    user: Dict = Depends(get_admin_user)
+):
+    # Parcels in creation order; resume with ?cursor=<X-Next-Cursor of the previous page>.
+    # Without cursor or limit it is the whole list, as the admin pages expect
+    projection = project_fields(fields)
+    scan = storage.scan_parcels(
+        after=cursor or 0, status=status, driver_id=driver_id,
+        created_after=created_after, created_before=created_before
+    )
+
+    if output == 'ndjson':
+        # Streams every match (or up to limit) without building the response in memory
+        return StreamingResponse(stream_parcels_ndjson(scan, projection, limit), media_type="application/x-ndjson")
+
+    page_size = limit or (PARCEL_PAGE_SIZE if cursor is not None else None)
+    page = []
+    headers = {}
+    for position, parcel in scan:
+        if page_size is not None and len(page) == page_size:
+            headers['X-Next-Cursor'] = str(last_position)
+            break
+        page.append({name: parcel.get(name) for name in projection} if projection else parcel)
+        last_position = position
+    return JSONResponse(page, headers=headers)
+
+def http_date(timestamp: Optional[str]) -> str:
+    """A stored ISO timestamp (local time unless it says otherwise) as an HTTP date."""
+    try:
+        moment = datetime.datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        moment = datetime.datetime.now()
+    return format_datetime(moment.astimezone(datetime.timezone.utc).replace(microsecond=0), usegmt=True)
+
+def encode_tracking_response(parcel: Dict) -> CachedResponse:
+    # Add driver information if available
+    driver = storage.get_driver(parcel['driver_id']) if parcel.get('driver_id') else None
+    parcel = public_parcel(parcel)
+    payload = {**parcel, 'driver': driver['name']} if driver else parcel
+    # The driver's name is part of the body but not of the parcel's version
+    etag = f'"{parcel.get("version", 0)}"'
+    if driver:
+        etag = f'"{parcel.get("version", 0)}-{zlib.crc32(str(driver["name"]).encode()):08x}"'
+    last_modified = http_date(parcel.get('updated_at') or parcel.get('created_at'))
+    return CachedResponse(JSONResponse(payload).body, etag, last_modified, parcel.get('driver_id'))
+
+def not_modified(request: Request, entry: CachedResponse) -> bool:
+    """Conditional GET: If-None-Match when sent, otherwise If-Modified-Since."""
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        if if_none_match == entry.etag or if_none_match.strip() == '*':
+            return True
+        return entry.etag in (tag.strip().removeprefix('W/') for tag in if_none_match.split(','))
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since is None:
+        return False
+    if if_modified_since == entry.last_modified:
+        return True
+    try:
+        return parsedate_to_datetime(entry.last_modified) <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
 
 @app.get("/parcels/{tracking_id}")
-async def get_parcel(tracking_id: str):
+async def get_parcel(tracking_id: str, request: Request):
     # Public endpoint - no authentication required for tracking
-    for parcel_id, parcel_data in data_store['parcels'].items():
-        if parcel_data['tracking_id'] == tracking_id:
-            # Add driver information if available
-            if parcel_data.get('driver_id') and parcel_data['driver_id'] in data_store['drivers']:
-                parcel_data['driver'] = data_store['drivers'][parcel_data['driver_id']]['name']
-            return parcel_data
-    raise HTTPException(404, "Parcel not found")
+    entry = response_cache.get(tracking_id)
+    if entry is None:
+        parcel_data = storage.find_parcel_by_tracking_id(tracking_id)
+        if parcel_data is None:
+            raise HTTPException(404, "Parcel not found")
+        entry = encode_tracking_response(parcel_data)
+        response_cache.put(tracking_id, entry)
+
+    # Clients may keep the response but must revalidate it before use
+    headers = {'ETag': entry.etag, 'Last-Modified': entry.last_modified, 'Cache-Control': 'no-cache'}
+    if not_modified(request, entry):
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
+
+def parse_time_param(value: Optional[str], name: str) -> Optional[float]:
+    """ISO timestamp query parameter as epoch seconds; 400 if malformed."""
+    if value is None:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise HTTPException(400, f"Invalid {name} timestamp")
+
+@app.get("/parcels/{tracking_id}/history")
+async def get_parcel_history(
+    tracking_id: str,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000)
+):
+    # Public like tracking; since/until are inclusive ISO timestamps
+    parcel = storage.find_parcel_by_tracking_id(tracking_id)
+    if parcel is None:
+        raise HTTPException(404, "Parcel not found")
+    events = parcel_history.events(
+        parcel['id'], since=parse_time_param(since, 'since'), until=parse_time_param(until, 'until'),
+        status=status, limit=limit
+    )
+    return {
+        "tracking_id": tracking_id,
+        "events": events,
+        "compacted": parcel_history.is_compacted(parcel['id'])
+    }
 
-@app.put("/parcels/{parcel_id}")
-async def update_parcel(parcel_id: str, update: Dict, user: Dict = Depends(get_admin_user)):
-    if parcel_id not in data_store['parcels']:
+@app.get("/parcels/{tracking_id}/state")
+async def get_parcel_state(tracking_id: str, at: str):
+    # The parcel as it stood at `at`, rebuilt from its history checkpoints
+    parcel = storage.find_parcel_by_tracking_id(tracking_id)
+    if parcel is None:
         raise HTTPException(404, "Parcel not found")
+    state = parcel_history.state_at(parcel['id'], parse_time_param(at, 'at'))
+    if state is None:
+        raise HTTPException(404, "No history for this parcel at that time")
+    return public_parcel(state)
 
-    # Update parcel data
-    data_store['parcels'][parcel_id].update(update)
-    updated = data_store['parcels'][parcel_id]
+def apply_parcel_update(parcel: Dict, update: Dict) -> Dict:
+    """Merge an update into a stored parcel, log status changes and broadcast it."""
+    # The version is the store's to bump, never the caller's to set
+    updated = {**parcel, **update, 'id': parcel['id'], 'version': parcel.get('version', 0)}
+    store_parcel(updated)
 
     # Add to activities if status changed
     if 'status' in update:
-        data_store['activities'].insert(0, {
+        log_activity({
             "title": f"Shipment {updated['tracking_id']} status updated to {update['status']}",
             "time": "Just now",
             "status": "Info",
             "type": "info"
         })
+    if updated.get('status') != parcel.get('status'):
+        notify_parcel_accounts(updated, f"Shipment {updated.get('tracking_id')} is now {updated.get('status')}")
 
-    # Broadcast update to all connected WebSocket clients
-    for conn in active_connections:
-        await conn.send_json({
-            "type": "parcel_update",
-            "data": updated
-        })
+    # Broadcast update to subscribed WebSocket clients
+    broadcast_parcel("parcel_update", updated)
 
     return updated
 
+@app.put("/parcels/{parcel_id}")
+async def update_parcel(parcel_id: str, update: Dict, user: Dict = Depends(get_admin_user)):
+    parcel = storage.get_parcel(parcel_id)
+    if parcel is None:
+        raise HTTPException(404, "Parcel not found")
+
+    try:
+        return apply_parcel_update(parcel, update)
+    except DuplicateKeyError:
+        raise HTTPException(400, "Tracking ID already exists")
+
 # Driver Endpoints
 @app.get("/drivers")
 async def get_drivers(user: Dict = Depends(get_current_user)):
     if user['role'] != 'admin':
         raise HTTPException(403, "Admin only")
-    return list(data_store['drivers'].values())
+    return list(storage.iter_drivers())
+
+@app.get("/drivers/nearest")
+async def get_nearest_drivers(
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lng: Optional[float] = Query(None, ge=-180, le=180),
+    tracking_id: Optional[str] = None,
+    k: int = Query(5, ge=1, le=100),
+    max_km: Optional[float] = Query(None, gt=0),
+    include_busy: bool = False,
+    user: Dict = Depends(get_current_user)
+):
+    if user['role'] != 'admin':
+        raise HTTPException(403, "Admin only")
+
+    # Search around a point, or around a parcel's current location
+    if tracking_id is not None:
+        parcel = storage.find_parcel_by_tracking_id(tracking_id)
+        if parcel is None:
+            raise HTTPException(404, "Parcel not found")
+        try:
+            lat, lng = float(parcel['location']['lat']), float(parcel['location']['lng'])
+        except (TypeError, KeyError, ValueError):
+            raise HTTPException(400, "Parcel has no location")
+    elif lat is None or lng is None:
+        raise HTTPException(400, "Provide lat and lng, or tracking_id")
+
+    statuses = None if include_busy else AVAILABLE_DRIVER_STATUSES
+    nearest = []
+    for distance, driver_id in driver_index.nearest(lat, lng, k, statuses=statuses, max_km=max_km):
+        driver = storage.get_driver(driver_id)
+        if driver:
+            nearest.append({**driver, 'distance_km': round(distance, 3)})
+    return nearest
 
 @app.put("/drivers/{driver_id}")
 async def update_driver(driver_id: str, update: Dict, user: Dict = Depends(get_current_user)):
     if user['role'] != 'admin':
         raise HTTPException(403, "Admin only")
-    if driver_id not in data_store['drivers']:
+    driver = storage.get_driver(driver_id)
+    if driver is None:
         raise HTTPException(404, "Driver not found")
 
     # Update driver data
-    data_store['drivers'][driver_id].update(update)
-    updated = data_store['drivers'][driver_id]
+    updated = {**driver, **update, 'id': driver_id}
+    store_driver(updated)
 
-    # Add to activities
-    data_store['activities'].insert(0, {
-        "title": f"Driver {updated['name']} status updated to {update.get('status', 'unknown')}",
-        "time": "Just now",
-        "status": "Info",
-        "type": "info"
-    })
+    # Add to activities (status changes only; position updates would flood the feed)
+    if 'status' in update:
+        log_activity({
+            "title": f"Driver {updated['name']} status updated to {update['status']}",
+            "time": "Just now",
+            "status": "Info",
+            "type": "info"
+        })
 
     return updated
 
+@app.post("/dispatch/assign")
+async def assign_parcels(
+    dry_run: bool = False,
+    time_budget: float = Query(float(os.getenv('ASSIGNMENT_TIME_BUDGET_SECONDS', '2')), gt=0, le=30),
+    user: Dict = Depends(get_admin_user)
+):
+    # Unassigned, undelivered parcels vs available drivers, minus what each driver already carries
+    unassigned, loads = [], {}
+    for parcel in storage.iter_parcels():
+        if parcel.get('status') == 'Delivered':
+            continue
+        if parcel.get('driver_id'):
+            loads[parcel['driver_id']] = loads.get(parcel['driver_id'], 0) + 1
+        else:
+            unassigned.append(parcel)
+    drivers = [d for d in storage.iter_drivers() if d.get('status') in AVAILABLE_DRIVER_STATUSES]
+
+    # The solver is pure CPU work on copies, so run it off the event loop
+    pairs, stats = await asyncio.to_thread(plan_assignment, unassigned, drivers, loads, time_budget)
+
+    # Parcels may have been assigned or delivered meanwhile; those are skipped
+    updates, shipments, stale = [], [], 0
+    for parcel, driver, distance in pairs:
+        current = storage.get_parcel(parcel['id'])
+        if current is None or current.get('driver_id') or current.get('status') == 'Delivered':
+            stale += 1
+            continue
+        updated = {**current, 'driver_id': driver['id']}
+        updates.append(updated)
+        # Same shape as /dashboard/shipments entries
+        shipments.append({**updated, 'driver': driver['name'], 'distance_km': round(distance, 3)})
+
+    if updates and not dry_run:
+        store_parcels(updates)
+        log_activity({
+            "title": f"{len(updates)} shipments assigned to drivers",
+            "time": "Just now",
+            "status": "Info",
+            "type": "info"
+        })
+        publish_event([DASHBOARD_TOPIC], {
+            "type": "parcels_assigned",
+            "data": [{'id': p['id'], 'tracking_id': p['tracking_id'], 'driver_id': p['driver_id']} for p in updates]
+        })
+        for parcel in updates:
+            publish_event([parcel_topic(parcel['tracking_id'])], {"type": "parcel_update", "data": parcel}, ('parcel', parcel['id']))
+
+    return {
+        "assigned": len(updates),
+        "unassigned": len(unassigned) - len(updates),
+        "stale": stale,
+        "dry_run": dry_run,
+        "total_distance_km": round(sum(s['distance_km'] for s in shipments), 3),
+        "stats": stats,
+        "shipments": shipments
+    }
+
+@app.post("/drivers/locations")
+async def ingest_driver_locations(fixes: List = Body(...), user: Dict = Depends(get_admin_user)):
+    # Many fixes per request; applied on the next flush, latest fix per driver wins
+    accepted, errors = location_coalescer.submit(fixes)
+    return {"accepted": accepted, "errors": errors}
+
+ACTIVITY_EXPORT_COLUMNS = ["seq", "timestamp", "title", "time", "status", "type"]
+
+@app.get("/export/{table}")
+async def export_table(
+    table: str,
+    output: str = Query('csv', alias='format', pattern='^(csv|ndjson)$'),
+    gzip: bool = False,
+    user: Dict = Depends(get_admin_user)
+):
+    # Full dumps for reconciliation, streamed from a snapshot taken when the request starts
+    if table == 'parcels':
+        records, columns = storage.export_records('parcels'), list(Parcel.model_fields)
+    elif table == 'drivers':
+        records, columns = storage.export_records('drivers'), list(Driver.model_fields)
+    elif table == 'activities':
+        records, columns = data_store['activities'].export(), ACTIVITY_EXPORT_COLUMNS
+    else:
+        raise HTTPException(404, "Unknown export")
+
+    lines = exports.csv_lines(records, columns) if output == 'csv' else exports.ndjson_lines(records)
+    filename = f"{table}.{output}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        exports.encode_chunks(lines, gzip=gzip),
+        media_type="application/gzip" if gzip else exports.MEDIA_TYPES[output],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 # Push notifications - admin-only test endpoint
 class PushRequest(BaseModel):
     title: Optional[str] = None
     body: Optional[str] = None
     url: Optional[str] = None
+    uid: Optional[str] = None
 
 @app.post("/push/test")
 async def push_test(req: PushRequest, user: Dict = Depends(get_current_user)):
@@ -489,129 +1350,330 @@ async def push_test(req: PushRequest, user: Dict = Depends(get_current_user)):
         raise HTTPException(403, "Admin only")
 
     # Add to alerts
-    data_store['alerts'].insert(0, {
+    add_alert({
         "type": "info",
         "message": req.body or "Test notification sent",
         "time": "Just now"
     })
 
-    return {
-        "message": "Push notification test sent",
+    message = {
         "title": req.title or "Rush Delivery",
         "body": req.body or "This is a test notification.",
         "url": req.url or "/notifications"
     }
+    # One user, or every subscribed user straight from the index
+    tokens = queued = 0
+    for user_id in [req.uid] if req.uid else user_index.subscribed_users():
+        subscriptions = user_index.subscriptions(user_id)
+        tokens += len(subscriptions)
+        queued += push_dispatcher.submit(user_id, subscriptions, message)
 
-# WebSocket connections list - defined early for use in endpoints
-from typing import List
-active_connections: List[WebSocket] = []
+    return {"message": "Push notification test sent", **message, "sent": queued, "tokens": tokens}
 
-@app.websocket("/ws/dashboard")
-async def websocket_dashboard(websocket: WebSocket):
-    await websocket.accept()
-    active_connections.append(websocket)
+@app.get("/push/metrics")
+async def get_push_metrics(user: Dict = Depends(get_admin_user)):
+    return {**push_dispatcher.metrics(), "subscribed_users": len(user_index),
+            "subscriptions": user_index.subscription_count()}
 
+async def wait_for_disconnect(websocket: WebSocket):
     try:
         while True:
-            # Send periodic updates to connected clients
-            await websocket.send_json({
-                "type": "heartbeat",
-                "timestamp": datetime.datetime.now().isoformat(),
-                "active_connections": len(active_connections)
-            })
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
 
-            # Send random parcel status updates to simulate real-time activity
-            if random.random() < 0.3:  # 30% chance every 10 seconds
-                parcels = list(data_store['parcels'].values())
-                if parcels:
-                    random_parcel = random.choice(parcels)
-                    if random_parcel['status'] != 'Delivered':
-                        old_status = random_parcel['status']
-                        new_status = random.choice(['Processing', 'In Transit', 'Out for Delivery'])
-                        if old_status != new_status:
-                            random_parcel['status'] = new_status
-                            data_store['activities'].insert(0, {
-                                "title": f"Shipment {random_parcel['tracking_id']} status updated to {new_status}",
-                                "time": "Just now",
-                                "status": "Info",
-                                "type": "info"
-                            })
-
-                            await websocket.send_json({
-                                "type": "parcel_update",
-                                "data": random_parcel
-                            })
-
-            await asyncio.sleep(10)  # Send updates every 10 seconds
+def dashboard_heartbeat() -> Dict:
+    return {
+        "type": "heartbeat",
+        "timestamp": datetime.datetime.now().isoformat(),
+        "active_connections": hub.connection_count,
+        # Reconnect with /ws/dashboard?since=<cursor> to receive only what changed meanwhile
+        "cursor": change_log.cursor()
+    }
 
-    except WebSocketDisconnect:
-        if websocket in active_connections:
-            active_connections.remove(websocket)
+def dashboard_tick() -> int:
+    """One shared tick for all dashboards: heartbeat plus simulated activity."""
+    if hub.topic_size(DASHBOARD_TOPIC) == 0 and hub.topic_size(HEARTBEAT_TOPIC) == 0:
+        return 0
+
+    recipients = hub.publish([DASHBOARD_TOPIC, HEARTBEAT_TOPIC], dashboard_heartbeat())
+
+    # Send random parcel status updates to simulate real-time activity
+    if random.random() < 0.3:  # 30% chance every tick
+        random_parcel = storage.random_parcel()
+        if random_parcel and random_parcel['status'] != 'Delivered':
+            new_status = random.choice(['Processing', 'In Transit', 'Out for Delivery'])
+            if random_parcel['status'] != new_status:
+                apply_parcel_update(random_parcel, {'status': new_status})
+
+    return recipients
+
+dashboard_ticker = PeriodicTask("Dashboard", dashboard_tick, interval=float(os.getenv('DASHBOARD_TICK_SECONDS', '10')))
+
+def snapshot_journal() -> int:
+    return 1 if journal.maybe_snapshot(storage.snapshot) else 0
+
+snapshot_scheduler = PeriodicTask("Journal snapshot", snapshot_journal,
+                                  interval=float(os.getenv('WAL_SNAPSHOT_CHECK_SECONDS', '30')))
+
+def check_dashboard_counters() -> int:
+    """Recompute dashboard counters from scratch and repair any drift."""
+    fresh = DashboardCounters.from_records(storage.iter_parcels(), storage.iter_drivers())
+    drift = dashboard_counters.diff(fresh)
+    if drift:
+        print(f"Dashboard counter drift detected: {drift}")
+        data_store['alerts'].insert(0, {
+            "type": "warning",
+            "message": f"Dashboard counters drifted and were rebuilt ({len(drift)} mismatches)",
+            "time": "Just now"
+        })
+        dashboard_counters.reset_from(fresh)
+    return len(drift)
+
+counter_checker = PeriodicTask("Dashboard counter check", check_dashboard_counters,
+                               interval=float(os.getenv('STATS_CHECK_SECONDS', '300')))
+
+def apply_driver_locations(fixes: Dict[str, Dict]) -> List[str]:
+    """Store one coalesced position per driver and broadcast them as a single message; returns the drivers moved."""
+    moved = []
+    for driver_id, fix in fixes.items():
+        driver = storage.get_driver(driver_id)
+        if driver is None:
+            continue
+        location = {'lat': fix['lat'], 'lng': fix['lng']}
+        updated = {**driver, 'current_location': location}
+        store_driver(updated)
+        moved.append({'id': driver_id, 'current_location': location, 'seq': updated['seq']})
+    if moved:
+        publish_event([DASHBOARD_TOPIC], {"type": "driver_locations", "data": moved})
+    return [entry['id'] for entry in moved]
+
+def refresh_etas() -> int:
+    """Re-estimate active ETAs in one pass and publish the ones that moved."""
+    # Every worker tracks every ETA, so only the leader writes the refreshed ones
+    if not event_bus.is_leader:
+        return 0
+    changed = eta_engine.refresh()
+    for parcel_id, eta in changed:
+        parcel = storage.get_parcel(parcel_id)
+        if parcel:
+            apply_parcel_update(parcel, {'eta': eta})
+    return len(changed)
+
+eta_refresher = PeriodicTask("ETA refresh", refresh_etas, interval=float(os.getenv('ETA_REFRESH_SECONDS', '60')))
+
+location_coalescer = LocationCoalescer(apply_driver_locations)
+location_flusher = PeriodicTask("GPS flush", location_coalescer.flush, interval=float(os.getenv('GPS_FLUSH_SECONDS', '1')))
+
+@app.on_event("startup")
+async def start_background_tasks():
+    await event_bus.start()
+    dashboard_ticker.start()
+    counter_checker.start()
+    snapshot_scheduler.start()
+    location_flusher.start()
+    eta_refresher.start()
+    await push_dispatcher.start()
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    await dashboard_ticker.stop()
+    await counter_checker.stop()
+    await snapshot_scheduler.stop()
+    await location_flusher.stop()
+    await eta_refresher.stop()
+    # Apply whatever fixes arrived since the last flush
+    location_coalescer.flush()
+    await push_dispatcher.stop()
+    await push_sender.close()
+    await event_bus.stop()
+    journal.close()
+    data_store['activities'].close()
+
+@app.get("/dashboard/ticker")
+async def get_ticker_metrics(user: Dict = Depends(get_admin_user)):
+    return {**dashboard_ticker.metrics(), "dashboards": hub.topic_size(DASHBOARD_TOPIC) + hub.topic_size(HEARTBEAT_TOPIC)}
+
+def is_admin_token(token: str) -> bool:
+    """The admin key or an admin JWT, for WebSockets (browsers can't set headers, so it comes as ?token=)"""
+    if token == "985d638bafbb39fb":
+        return True
+    try:
+        return bool(token) and decode_token(token).get('role') == 'admin'
+    except JWTError:
+        return False
 
-@app.websocket("/ws/{tracking_id}")
-async def websocket_endpoint(websocket: WebSocket, tracking_id: str):
+@app.websocket("/ws/dashboard")
+async def websocket_dashboard(websocket: WebSocket, since: Optional[int] = None, token: str = ''):
+    await websocket.accept()
+    # Parcel events and change pages carry full records; without admin credentials only the heartbeat
+    if not is_admin_token(token):
+        subscriber = hub.subscribe(websocket, [HEARTBEAT_TOPIC])
+        hub.send(subscriber, dashboard_heartbeat())
+        try:
+            await wait_for_disconnect(websocket)
+        finally:
+            hub.unsubscribe(subscriber)
+        return
+    # A resuming client first gets what it missed, sent page by page past the bounded queue
+    while since is not None:
+        page = change_page(since, CHANGES_PAGE_SIZE)
+        if not page['more']:
+            break
+        await websocket.send_text(json.dumps({"type": "changes", **page}, separators=(",", ":")))
+        since = page['cursor']
+    subscriber = hub.subscribe(websocket, [DASHBOARD_TOPIC])
+    if since is not None:
+        # Taken right after subscribing, so every later write arrives live
+        hub.send(subscriber, {"type": "changes", **change_page(since, CHANGES_PAGE_SIZE)})
+    # Greet right away; after that the shared ticker drives updates
+    hub.send(subscriber, dashboard_heartbeat())
+    try:
+        await wait_for_disconnect(websocket)
+    finally:
+        hub.unsubscribe(subscriber)
+
+@app.get("/drivers/locations/metrics")
+async def get_location_metrics(user: Dict = Depends(get_admin_user)):
+    return {**location_coalescer.metrics(), "flush": location_flusher.metrics()}
+
+@app.get("/parcels/eta/metrics")
+async def get_eta_metrics(user: Dict = Depends(get_admin_user)):
+    return {"tracked_parcels": len(eta_engine), "refresh": eta_refresher.metrics()}
+
+@app.get("/workers/bus")
+async def get_event_bus_metrics(user: Dict = Depends(get_admin_user)):
+    return {**event_bus.metrics(), "pid": os.getpid()}
+
+@app.get("/parcels/history/metrics")
+async def get_history_metrics(user: Dict = Depends(get_admin_user)):
+    return parcel_history.metrics()
+
+@app.get("/changes/metrics")
+async def get_change_log_metrics(user: Dict = Depends(get_admin_user)):
+    return change_log.metrics()
+
+@app.get("/parcels/cache/metrics")
+async def get_tracking_cache_metrics(user: Dict = Depends(get_admin_user)):
+    return response_cache.metrics()
+
+@app.websocket("/ws/drivers/locations")
+async def websocket_driver_locations(websocket: WebSocket, token: str = ''):
+    # Browsers can't set headers on a WebSocket, so the JWT comes as ?token=
+    try:
+        user = decode_token(token)
+    except JWTError:
+        user = None
+    if not user or user.get('role') != 'admin':
+        await websocket.close(code=1008)
+        return
     await websocket.accept()
-    active_connections.append(websocket)
     try:
         while True:
-            data = await websocket.receive_text()
-            # Handle incoming if needed
+            # Each message is a JSON array of fixes; only rejected fixes are answered
+            try:
+                fixes = json.loads(await websocket.receive_text())
+            except ValueError:
+                await websocket.send_json({"error": "Invalid JSON"})
+                continue
+            if not isinstance(fixes, list):
+                await websocket.send_json({"error": "Expected a JSON array of fixes"})
+                continue
+            _, errors = location_coalescer.submit(fixes)
+            if errors:
+                await websocket.send_json({"errors": errors})
     except WebSocketDisconnect:
-        active_connections.remove(websocket)
+        pass
+
+@app.websocket("/ws/{tracking_id}")
+async def websocket_endpoint(websocket: WebSocket, tracking_id: str, since: Optional[int] = None):
+    await websocket.accept()
+    subscriber = hub.subscribe(websocket, [parcel_topic(tracking_id)])
+    if since is not None:
+        # Resuming: send the parcel if it changed after the last seq this client saw
+        parcel = storage.find_parcel_by_tracking_id(tracking_id)
+        if parcel is not None and parcel.get('seq', 0) > since:
+            hub.send(subscriber, {"type": "parcel_update", "data": public_parcel(parcel)})
+    try:
+        # Incoming messages are ignored; this just waits for the client to leave
+        await wait_for_disconnect(websocket)
+    finally:
+        hub.unsubscribe(subscriber)
 
 # Profile Endpoints
 @app.get("/profile")
 async def get_profile(user: Dict = Depends(get_current_user)):
     user_id = user['uid']
-    if user_id not in data_store['users']:
+    user_data = storage.get_user(user_id)
+    if user_data is None:
         raise HTTPException(404, "User not found")
 
-    user_data = data_store['users'][user_id]
     return {
         'name': user_data.get('name', ''),
         'addresses': user_data.get('addresses', []),
         'default_address_index': user_data.get('default_address_index', 0),
-        'prefs': user_data.get('prefs', {'email': True, 'push': False, 'sms': False})
+        'prefs': {**DEFAULT_PREFS, **(user_data.get('prefs') or {})}
     }
 
+# What a user may change about themselves; role, password and push subscriptions have their own endpoints
+PROFILE_FIELDS = ('name', 'email', 'addresses', 'default_address_index', 'prefs')
+
 @app.put("/profile")
 async def update_profile(update: Dict, user: Dict = Depends(get_current_user)):
     user_id = user['uid']
-    if user_id not in data_store['users']:
+    user_data = storage.get_user(user_id)
+    if user_data is None:
         raise HTTPException(404, "User not found")
+    update = {key: value for key, value in update.items() if key in PROFILE_FIELDS}
+
+    # Claim the new email before touching the record
+    new_email = update.get('email')
+    if new_email is not None and not isinstance(new_email, str):
+        raise HTTPException(400, "Email must be a string")
+    changes_email = new_email is not None and normalize_email(new_email) != normalize_email(user_data['email'])
+    if changes_email and not reserve_email(new_email, user_id):
+        raise HTTPException(400, "Email already in use")
 
     # Update user data
-    data_store['users'][user_id].update(update)
-    updated = data_store['users'][user_id]
+    updated = {**user_data, **update}
+    try:
+        store_user(user_id, updated)
+    except DuplicateKeyError:
+        raise HTTPException(400, "Email already in use")
+    finally:
+        if changes_email:
+            release_email(new_email, user_id)
 
-    return updated
+    return {key: value for key, value in updated.items() if key != 'password'}
 
 @app.put("/profile/password")
 async def update_password(password_data: Dict, user: Dict = Depends(get_current_user)):
     user_id = user['uid']
-    if user_id not in data_store['users']:
+    user_data = storage.get_user(user_id)
+    if user_data is None:
         raise HTTPException(404, "User not found")
 
     if 'password' not in password_data:
         raise HTTPException(400, "Password is required")
 
     # Hash the new password
-    hashed_password = pwd_context.hash(password_data['password'])
-    data_store['users'][user_id]['password'] = hashed_password
+    hashed_password = await password_hasher.hash(password_data['password'])
+    store_user(user_id, {**user_data, 'password': hashed_password})
 
     return {"message": "Password updated successfully"}
 
 @app.put("/profile/preferences")
 async def update_preferences(prefs_data: Dict, user: Dict = Depends(get_current_user)):
     user_id = user['uid']
-    if user_id not in data_store['users']:
+    user_data = storage.get_user(user_id)
+    if user_data is None:
         raise HTTPException(404, "User not found")
 
     if 'prefs' not in prefs_data:
         raise HTTPException(400, "Preferences are required")
 
     # Update user preferences
-    data_store['users'][user_id]['prefs'] = prefs_data['prefs']
+    store_user(user_id, {**user_data, 'prefs': prefs_data['prefs']})
 
     return {"message": "Preferences updated successfully"}
 
@@ -619,76 +1681,104 @@ async def update_preferences(prefs_data: Dict, user: Dict = Depends(get_current_
 @app.post("/notifications/subscribe")
 async def subscribe_notifications(subscription_data: Dict, user: Dict = Depends(get_current_user)):
     user_id = user['uid']
-    if user_id not in data_store['users']:
+    user_data = storage.get_user(user_id)
+    if user_data is None:
         raise HTTPException(404, "User not found")
 
     subscription = subscription_data.get('subscription')
     if not subscription:
         raise HTTPException(400, "Subscription data is required")
 
-    # Store the push subscription
-    if 'push_subscriptions' not in data_store['users'][user_id]:
-        data_store['users'][user_id]['push_subscriptions'] = []
-
-    data_store['users'][user_id]['push_subscriptions'].append(subscription)
+    # The server POSTs to the endpoint, so only public https push services are accepted
+    try:
+        await check_subscription(subscription)
+    except PushEndpointRejected as e:
+        raise HTTPException(400, str(e))
+    except ConnectionError:
+        raise HTTPException(400, "Push endpoint host does not resolve")
+
+    # Store the push subscription; subscribing the same endpoint again replaces it
+    endpoint = subscription['endpoint']
+    subscriptions = [
+        s for s in user_data.get('push_subscriptions', [])
+        if not isinstance(s, dict) or s.get('endpoint') != endpoint
+    ] + [subscription]
+    # Subscribing a device is how a user turns push on
+    prefs = {**DEFAULT_PREFS, **(user_data.get('prefs') or {}), 'push': True}
+    store_user(user_id, {**user_data, 'push_subscriptions': subscriptions, 'prefs': prefs})
 
     return {"message": "Successfully subscribed to notifications"}
 
+NOTIFICATIONS_PAGE_SIZE = 50
+
 @app.get("/notifications")
-async def get_notifications(user: Dict = Depends(get_current_user)):
+async def get_notifications(
+    cursor: Optional[int] = Query(None, ge=1),
+    limit: int = Query(NOTIFICATIONS_PAGE_SIZE, ge=1, le=1000),
+    user: Dict = Depends(get_current_user)
+):
     user_id = user['uid']
-    if user_id not in data_store['users']:
+    user_data = storage.get_user(user_id)
+    if user_data is None:
         raise HTTPException(404, "User not found")
 
-    # Get user's notifications
-    user_notifications = data_store.get('notifications', {}).get(user_id, [])
+    # Newest first; resume with ?cursor=<X-Next-Cursor of the previous page>
+    inbox = notification_inboxes.get(user_id)
+    page, next_cursor = inbox.page(before=cursor, limit=limit)
+    headers = {'X-Unread-Count': str(inbox.unread)}
+    if next_cursor is not None:
+        headers['X-Next-Cursor'] = str(next_cursor)
+    return JSONResponse(page, headers=headers)
 
-    return user_notifications
+@app.get("/notifications/unread-count")
+async def get_unread_count(user: Dict = Depends(get_current_user)):
+    inbox = notification_inboxes.get(user['uid'])
+    return {"unread": inbox.unread, "total": len(inbox)}
 
-@app.put("/notifications/{notification_id}")
-async def update_notification(notification_id: str, update_data: Dict, user: Dict = Depends(get_current_user)):
+# Declared before /notifications/{notification_id}, which would otherwise match it
+@app.put("/notifications/mark-all-read")
+async def mark_all_notifications_read(user: Dict = Depends(get_current_user)):
     user_id = user['uid']
-    if user_id not in data_store['users']:
+    user_data = storage.get_user(user_id)
+    if user_data is None:
         raise HTTPException(404, "User not found")
 
-    # Find and update the notification
-    if 'notifications' not in data_store:
-        data_store['notifications'] = {}
-
-    if user_id not in data_store['notifications']:
-        data_store['notifications'][user_id] = []
-
-    for notification in data_store['notifications'][user_id]:
-        if notification.get('id') == notification_id:
-            notification.update(update_data)
-            break
+    # Moves the read watermark; the notifications themselves are untouched
+    inbox = notification_inboxes.get(user_id)
+    inbox.mark_all_read()
+    store_notification_changes(user_id, inbox)
 
-    return {"message": "Notification updated successfully"}
+    return {"message": "All notifications marked as read"}
 
-@app.put("/notifications/mark-all-read")
-async def mark_all_notifications_read(user: Dict = Depends(get_current_user)):
+@app.put("/notifications/{notification_id}")
+async def update_notification(notification_id: str, update_data: Dict, user: Dict = Depends(get_current_user)):
     user_id = user['uid']
-    if user_id not in data_store['users']:
+    user_data = storage.get_user(user_id)
+    if user_data is None:
         raise HTTPException(404, "User not found")
 
-    # Mark all user's notifications as read
-    if 'notifications' not in data_store:
-        data_store['notifications'] = {}
+    unknown = [name for name in update_data if name != 'read']
+    if unknown:
+        raise HTTPException(400, f"Unknown notification fields: {', '.join(unknown)}")
 
-    if user_id not in data_store['notifications']:
-        data_store['notifications'][user_id] = []
+    inbox = notification_inboxes.get(user_id)
+    if 'read' in update_data:
+        notification = inbox.mark(notification_id, bool(update_data['read']))
+    else:
+        notification = inbox.get(notification_id)
+    if notification is None:
+        raise HTTPException(404, "Notification not found")
+    # Nothing is written when the notification already had that state
+    store_notification_changes(user_id, inbox)
 
-    for notification in data_store['notifications'][user_id]:
-        notification['read'] = True
-
-    return {"message": "All notifications marked as read"}
+    return {"message": "Notification updated successfully", "notification": notification}
 
 # Admin Endpoints
 @app.get("/admin/users")
 async def get_all_users(user: Dict = Depends(get_admin_user)):
     # Return all users with their roles and push subscription counts
     users = []
-    for user_id, user_data in data_store['users'].items():
+    for user_id, user_data in storage.iter_users():
         users.append({
             'id': user_id,
             'email': user_data.get('email', ''),
@@ -700,45 +1790,13 @@ async def get_all_users(user: Dict = Depends(get_admin_user)):
 
 @app.put("/admin/users/{user_id}/role")
 async def update_user_role(user_id: str, role_data: Dict, user: Dict = Depends(get_admin_user)):
-    if user_id not in data_store['users']:
+    user_data = storage.get_user(user_id)
+    if user_data is None:
         raise HTTPException(404, "User not found")
 
     if 'role' not in role_data:
         raise HTTPException(400, "Role is required")
 
-    data_store['users'][user_id]['role'] = role_data['role']
+    store_user(user_id, {**user_data, 'role': role_data['role']})
 
     return {"message": "User role updated successfully"}
-
-@app.post("/push/test")
-async def send_test_push(push_data: Dict, user: Dict = Depends(get_admin_user)):
-    # Send test push notification to specified user or all users
-    target_uid = push_data.get('uid')
-    title = push_data.get('title', 'Test Notification')
-    body = push_data.get('body', 'This is a test notification')
-    url = push_data.get('url', '/notifications')
-
-    sent_count = 0
-    total_tokens = 0
-
-    if target_uid:
-        # Send to specific user
-        if target_uid in data_store['users']:
-            user_data = data_store['users'][target_uid]
-            subscriptions = user_data.get('push_subscriptions', [])
-            total_tokens = len(subscriptions)
-            # In a real implementation, you would send push notifications here
-            sent_count = total_tokens
-    else:
-        # Send to all users
-        for user_id, user_data in data_store['users'].items():
-            subscriptions = user_data.get('push_subscriptions', [])
-            total_tokens += len(subscriptions)
-            # In a real implementation, you would send push notifications here
-            sent_count += len(subscriptions)
-
-    return {
-        "message": "Test push notification sent",
-        "sent": sent_count,
-        "tokens": total_tokens
-    }
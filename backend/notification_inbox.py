@@ -0,0 +1,197 @@
+import datetime
+import uuid
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class NotificationInbox:
+    """One user's notifications, oldest first, capped at `max_size`.
+
+    Read state is a watermark plus per-notification overrides: everything at
+    or below `read_through` is read unless it was toggled individually since
+    the last mark-all-read (overrides carry the `epoch` they were made in, and
+    mark-all-read bumps the epoch). So mark-all-read is O(1), lookups by ID go
+    through an index, and the unread count is kept as notifications come, go
+    and change.
+
+    Every change is also queued as a small delta ({"add": item}, {"mark":
+    item} or {"read_through", "epoch"}); `take_changes` hands them over so
+    they can be journaled and relayed instead of the whole inbox, and
+    `apply_changes` replays them on another copy.
+    """
+
+    def __init__(self, max_size: int = 100, record=None):
+        self.max_size = max_size
+        self._items: List[Dict] = []
+        self._seqs: List[int] = []
+        self._by_id: Dict[str, Dict] = {}
+        self.read_through = 0
+        self.epoch = 0
+        self.next_seq = 1
+        self.unread = 0
+        self._changes: List[Dict] = []
+        if isinstance(record, dict):
+            self.read_through = record.get('read_through', 0)
+            self.epoch = record.get('epoch', 0)
+            self.next_seq = record.get('next_seq', 1)
+            items = record.get('items') or []
+        else:
+            # Lists of plain notifications stored before there was an inbox
+            items = [
+                {'id': str(uuid.uuid4()), **n, 'seq': self.next_seq + i, 'read': bool(n.get('read')), 'epoch': 0}
+                for i, n in enumerate(n for n in record or () if isinstance(n, dict))
+            ]
+            self.next_seq += len(items)
+        for item in items:
+            self._append(item)
+        self._trim()
+
+    def is_read(self, item: Dict) -> bool:
+        if 'read' in item and item.get('epoch') == self.epoch:
+            return item['read']
+        return item['seq'] <= self.read_through
+
+    def add(self, notification: Dict) -> Dict:
+        item = {
+            'id': str(uuid.uuid4()),
+            'created_at': datetime.datetime.now().isoformat(),
+            **notification,
+            'seq': self.next_seq,
+        }
+        self.next_seq += 1
+        self._append(item)
+        self._trim()
+        self._changes.append({'add': item})
+        return self.view(item)
+
+    def get(self, notification_id: str) -> Optional[Dict]:
+        item = self._by_id.get(notification_id)
+        return self.view(item) if item is not None else None
+
+    def mark(self, notification_id: str, read: bool) -> Optional[Dict]:
+        """Set one notification's read state; None if there is no such notification"""
+        item = self._by_id.get(notification_id)
+        if item is None:
+            return None
+        if self.is_read(item) == read:
+            return self.view(item)
+        # Replaced, not mutated: stored records share their item dicts
+        updated = {**item, 'read': read, 'epoch': self.epoch}
+        self._replace(updated)
+        self._changes.append({'mark': updated})
+        return self.view(updated)
+
+    def mark_all_read(self) -> bool:
+        """Returns whether anything was unread"""
+        if not self.unread:
+            return False
+        self.read_through = self.next_seq - 1
+        self.epoch += 1
+        self.unread = 0
+        self._changes.append({'read_through': self.read_through, 'epoch': self.epoch})
+        return True
+
+    def take_changes(self) -> List[Dict]:
+        """The changes made since the last call, oldest first"""
+        changes, self._changes = self._changes, []
+        return changes
+
+    def apply_changes(self, changes: List[Dict]):
+        """Replay another copy's changes; ones this copy already has are skipped"""
+        for change in changes:
+            if 'add' in change:
+                item = change['add']
+                if item['seq'] >= self.next_seq:
+                    self.next_seq = item['seq'] + 1
+                    self._append(item)
+                    self._trim()
+            elif 'mark' in change:
+                if change['mark']['id'] in self._by_id:
+                    self._replace(change['mark'])
+            elif change.get('epoch', 0) > self.epoch:
+                self.read_through = change['read_through']
+                self.epoch = change['epoch']
+                self.unread = sum(1 for item in self._items if not self.is_read(item))
+
+    def page(self, before: Optional[int] = None, limit: int = 50) -> Tuple[List[Dict], Optional[int]]:
+        """Newest first, older than seq `before`; returns the page and the cursor for the next one"""
+        end = len(self._items) if before is None else bisect_left(self._seqs, before)
+        start = max(end - limit, 0)
+        page = [self.view(item) for item in reversed(self._items[start:end])]
+        return page, self._seqs[start] if start > 0 else None
+
+    def view(self, item: Dict) -> Dict:
+        view = {key: value for key, value in item.items() if key != 'epoch'}
+        view['read'] = self.is_read(item)
+        return view
+
+    def to_record(self) -> Dict:
+        return {
+            'read_through': self.read_through,
+            'epoch': self.epoch,
+            'next_seq': self.next_seq,
+            'items': list(self._items),
+        }
+
+    def __len__(self):
+        return len(self._items)
+
+    def _append(self, item: Dict):
+        self._items.append(item)
+        self._seqs.append(item['seq'])
+        self._by_id[item['id']] = item
+        if not self.is_read(item):
+            self.unread += 1
+
+    def _replace(self, updated: Dict):
+        item = self._by_id[updated['id']]
+        self._items[bisect_left(self._seqs, item['seq'])] = updated
+        self._by_id[updated['id']] = updated
+        self.unread += self.is_read(item) - self.is_read(updated)
+
+    def _trim(self):
+        excess = len(self._items) - self.max_size
+        if excess <= 0:
+            return
+        for item in self._items[:excess]:
+            del self._by_id[item['id']]
+            if not self.is_read(item):
+                self.unread -= 1
+        del self._items[:excess]
+        del self._seqs[:excess]
+
+
+class NotificationInboxes:
+    """Bounded LRU of users' inboxes over the storage layer.
+
+    An inbox is loaded on first use and kept until evicted; every change is
+    written back by the caller, so eviction loses nothing. Changes made by
+    other workers (or replayed at startup) are applied to the cached inbox,
+    and whole-record writes invalidate it.
+    Only touched from the event loop, so there is no lock.
+    """
+
+    def __init__(self, load: Callable[[str], object], max_size: int = 100, max_users: int = 10000):
+        self.load = load
+        self.max_size = max_size
+        self.max_users = max_users
+        self._inboxes: "OrderedDict[str, NotificationInbox]" = OrderedDict()
+
+    def get(self, user_id: str) -> NotificationInbox:
+        inbox = self._inboxes.get(user_id)
+        if inbox is not None:
+            self._inboxes.move_to_end(user_id)
+            return inbox
+        inbox = NotificationInbox(self.max_size, self.load(user_id))
+        if self.max_users > 0:
+            self._inboxes[user_id] = inbox
+            while len(self._inboxes) > self.max_users:
+                self._inboxes.popitem(last=False)
+        return inbox
+
+    def invalidate(self, user_id: str):
+        self._inboxes.pop(user_id, None)
+
+    def __len__(self):
+        return len(self._inboxes)
@@ -0,0 +1,200 @@
+import datetime
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional
+
+from parcel_records import ParcelRecord
+
+# Fields that live in the event rows themselves; a change to any other field
+# (except the live ETA, which moves constantly, and the write stamps) takes a checkpoint
+EVENT_FIELDS = ('status', 'location')
+UNCHECKPOINTED_FIELDS = EVENT_FIELDS + ('eta', 'updates', 'version', 'updated_at', 'seq')
+
+# One event row: time (epoch seconds), lat, lng, status code
+ROW = 4
+
+
+def _coordinates(location):
+    try:
+        return float(location['lat']), float(location['lng'])
+    except (TypeError, KeyError, ValueError):
+        return math.nan, math.nan
+
+
+def _isoformat(epoch: float) -> str:
+    return datetime.datetime.fromtimestamp(epoch).isoformat()
+
+
+class _Timeline:
+    __slots__ = ('events', 'checkpoints', 'checkpoint_times', 'since_checkpoint', 'compacted')
+
+    def __init__(self):
+        self.events = array('d')
+        self.checkpoints: List[ParcelRecord] = []
+        self.checkpoint_times: List[float] = []
+        self.since_checkpoint = 0
+        self.compacted = False
+
+    def __len__(self):
+        return len(self.events) // ROW
+
+    def time(self, index: int) -> float:
+        return self.events[index * ROW]
+
+
+class ParcelHistory:
+    """Append-only status/location history per parcel, kept in memory.
+
+    Every write that changes a parcel's status or location appends one
+    fixed-size row (time, lat, lng, status code) to that parcel's array.
+    Full-record checkpoints (compact ParcelRecords) are taken when the parcel
+    is created, when any field other than status, location or ETA changes,
+    with an event whose ETA differs from the last checkpoint's, and every
+    `checkpoint_every` events; the state as of time T is the last checkpoint
+    at or before T with the last event at or before T applied.
+
+    Once a parcel is delivered its history is compacted to the status
+    transitions plus the final event, and its checkpoints to the first one and
+    those from the final event on. A live parcel that reaches `max_events` is
+    compacted the same way, keeping its most recent half in full.
+    """
+
+    def __init__(self, checkpoint_every: int = 50, max_events: int = 1000):
+        self.checkpoint_every = checkpoint_every
+        self.max_events = max_events
+        self._timelines: Dict[str, _Timeline] = {}
+        self._status_codes: Dict[str, int] = {}
+        self._statuses: List[Optional[str]] = []
+        self._event_count = 0
+        self._checkpoint_count = 0
+        self._compacted_count = 0
+
+    def __len__(self):
+        return len(self._timelines)
+
+    def _status_code(self, status: Optional[str]) -> int:
+        code = self._status_codes.get(status)
+        if code is None:
+            code = self._status_codes[status] = len(self._statuses)
+            self._statuses.append(status)
+        return code
+
+    # Recording
+
+    def record(self, previous: Optional[Dict], parcel: Dict, now: Optional[float] = None):
+        """Append an event for this write if it changed status or location; `previous` is None for a new parcel"""
+        timeline = self._timelines.get(parcel['id'])
+        if timeline is None:
+            timeline = self._timelines[parcel['id']] = _Timeline()
+            previous = None
+        moved = previous is None or any(previous.get(f) != parcel.get(f) for f in EVENT_FIELDS)
+        changed = previous is None or any(
+            previous.get(k) != v for k, v in parcel.items() if k not in UNCHECKPOINTED_FIELDS
+        ) or any(k not in parcel for k in previous if k not in UNCHECKPOINTED_FIELDS)
+        if not moved and not changed:
+            return
+        now = datetime.datetime.now().timestamp() if now is None else now
+        if moved:
+            lat, lng = _coordinates(parcel.get('location'))
+            timeline.events.extend((now, lat, lng, self._status_code(parcel.get('status'))))
+            timeline.since_checkpoint += 1
+            self._event_count += 1
+        # The ETA alone never takes a checkpoint, but one that drifted rides along with the next event
+        eta_moved = moved and timeline.checkpoints and timeline.checkpoints[-1].get('eta') != parcel.get('eta')
+        if changed or eta_moved or timeline.since_checkpoint >= self.checkpoint_every:
+            timeline.checkpoints.append(ParcelRecord.from_dict(parcel))
+            timeline.checkpoint_times.append(now)
+            timeline.since_checkpoint = 0
+            self._checkpoint_count += 1
+
+        delivered = previous is not None and parcel.get('status') == 'Delivered' and previous.get('status') != 'Delivered'
+        if delivered:
+            self._compact(timeline, keep_recent=0)
+        elif len(timeline) > self.max_events:
+            self._compact(timeline, keep_recent=self.max_events // 2)
+
+    def _compact(self, timeline: _Timeline, keep_recent: int):
+        """Keep the status transitions plus the last `keep_recent` events (at least the final one)"""
+        events = timeline.events
+        count = len(timeline)
+        cutoff = count - max(keep_recent, 1)
+        # Checkpoints: the first, plus those covering the events kept in full
+        first_full = bisect_right(timeline.checkpoint_times, timeline.time(cutoff)) - 1
+        if first_full > 1:
+            del timeline.checkpoints[1:first_full]
+            del timeline.checkpoint_times[1:first_full]
+            self._checkpoint_count -= first_full - 1
+        kept = array('d')
+        last_status = None
+        for index in range(count):
+            row = events[index * ROW:(index + 1) * ROW]
+            if index >= cutoff or row[3] != last_status:
+                kept.extend(row)
+            last_status = row[3]
+        self._event_count -= count - len(kept) // ROW
+        timeline.events = kept
+        if not timeline.compacted:
+            timeline.compacted = True
+            self._compacted_count += 1
+
+    # Queries
+
+    def _event(self, timeline: _Timeline, index: int) -> Dict:
+        time, lat, lng, code = timeline.events[index * ROW:(index + 1) * ROW]
+        return {
+            'time': _isoformat(time),
+            'status': self._statuses[int(code)],
+            'location': {'lat': lat, 'lng': lng} if not math.isnan(lat) else None,
+        }
+
+    def events(self, parcel_id: str, since: Optional[float] = None, until: Optional[float] = None,
+               status: Optional[str] = None, limit: Optional[int] = None) -> List[Dict]:
+        """Events in time order, optionally within [since, until] and with one status"""
+        timeline = self._timelines.get(parcel_id)
+        if timeline is None:
+            return []
+        count = len(timeline)
+        start = 0 if since is None else bisect_left(range(count), since, key=timeline.time)
+        end = count if until is None else bisect_right(range(count), until, key=timeline.time)
+        code = self._status_codes.get(status) if status is not None else None
+        if status is not None and code is None:
+            return []
+        results = []
+        for index in range(start, end):
+            if code is not None and timeline.events[index * ROW + 3] != code:
+                continue
+            results.append(self._event(timeline, index))
+            if limit is not None and len(results) >= limit:
+                break
+        return results
+
+    def state_at(self, parcel_id: str, at: float) -> Optional[Dict]:
+        """The parcel as it stood at `at`, or None if it had no history by then"""
+        timeline = self._timelines.get(parcel_id)
+        if timeline is None:
+            return None
+        index = bisect_right(range(len(timeline)), at, key=timeline.time) - 1
+        if index < 0:
+            return None
+        checkpoint = bisect_right(timeline.checkpoint_times, at) - 1
+        # After compaction the earliest kept checkpoint stands in for any dropped ones before it
+        state = timeline.checkpoints[max(checkpoint, 0)].to_dict()
+        event = self._event(timeline, index)
+        state['status'] = event['status']
+        if event['location'] is not None:
+            state['location'] = event['location']
+        return state
+
+    def is_compacted(self, parcel_id: str) -> bool:
+        timeline = self._timelines.get(parcel_id)
+        return timeline is not None and timeline.compacted
+
+    def metrics(self) -> Dict:
+        return {
+            "parcels": len(self._timelines),
+            "events": self._event_count,
+            "checkpoints": self._checkpoint_count,
+            "compacted_parcels": self._compacted_count,
+            "event_bytes": self._event_count * ROW * 8,
+        }
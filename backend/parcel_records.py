@@ -0,0 +1,94 @@
+import sys
+from typing import Any, Dict, Optional
+
+# Fields a Parcel record normally carries, in the order Parcel.dict() emits them
+PARCEL_FIELDS = ('id', 'tracking_id', 'status', 'location', 'estimated_delivery', 'sender', 'receiver',
+                 'sender_uid', 'receiver_uid', 'driver_id', 'updates', 'origin', 'destination', 'destination_location', 'eta', 'created_at',
+                 'version', 'updated_at', 'seq')
+
+# Low-cardinality string fields; one shared copy per distinct value
+INTERNED_FIELDS = ('status', 'sender', 'receiver', 'driver_id', 'origin', 'destination')
+
+_KNOWN_FIELDS = frozenset(PARCEL_FIELDS)
+_STORED_FIELDS = ('id', 'tracking_id', 'status', 'estimated_delivery', 'sender', 'receiver',
+                  'sender_uid', 'receiver_uid', 'driver_id', 'origin', 'destination', 'destination_location', 'eta', 'created_at',
+                  'version', 'updated_at', 'seq')
+
+
+class _Missing:
+    __slots__ = ()
+
+    def __repr__(self):
+        return "MISSING"
+
+
+# Marks a field the original dict did not have, so it is left out again on the way back
+MISSING = _Missing()
+
+
+class ParcelRecord:
+    """Compact in-memory form of a parcel dict.
+
+    Plain fields live in slots instead of a per-parcel dict, repeated strings
+    are interned, the location is two floats instead of a nested dict, and
+    `updates` is a tuple (the shared empty tuple when there are none). Keys
+    outside PARCEL_FIELDS, or values that don't fit the compact layout, are
+    kept as-is in `extra`. `to_dict` rebuilds exactly the dict that was stored.
+    """
+
+    __slots__ = _STORED_FIELDS + ('lat', 'lng', 'updates', 'extra')
+
+    @classmethod
+    def from_dict(cls, parcel: Dict) -> 'ParcelRecord':
+        record = cls.__new__(cls)
+        extra: Optional[Dict[str, Any]] = None
+        for name in _STORED_FIELDS:
+            value = parcel.get(name, MISSING)
+            if type(value) is str and name in INTERNED_FIELDS:
+                value = sys.intern(value)
+            setattr(record, name, value)
+
+        location = parcel.get('location', MISSING)
+        if type(location) is dict and len(location) == 2 and \
+                type(location.get('lat')) is float and type(location.get('lng')) is float:
+            record.lat, record.lng = location['lat'], location['lng']
+        else:
+            record.lat = record.lng = None
+            extra = {'location': location} if location is not MISSING else None
+
+        updates = parcel.get('updates', MISSING)
+        if type(updates) is list:
+            record.updates = tuple(updates)
+        else:
+            record.updates = None
+            if updates is not MISSING:
+                extra = {**(extra or {}), 'updates': updates}
+
+        if not _KNOWN_FIELDS.issuperset(parcel):
+            extra = {**(extra or {}), **{k: v for k, v in parcel.items() if k not in _KNOWN_FIELDS}}
+        record.extra = extra
+        return record
+
+    def to_dict(self) -> Dict:
+        extra = self.extra or {}
+        parcel = {}
+        for name in PARCEL_FIELDS:
+            if name == 'location':
+                value = {'lat': self.lat, 'lng': self.lng} if self.lat is not None else extra.get(name, MISSING)
+            elif name == 'updates':
+                value = list(self.updates) if self.updates is not None else extra.get(name, MISSING)
+            else:
+                value = getattr(self, name)
+            if value is not MISSING:
+                parcel[name] = value
+        for key, value in extra.items():
+            if key not in parcel and key not in ('location', 'updates'):
+                parcel[key] = value
+        return parcel
+
+    def get(self, key: str, default=None):
+        """Read one field without rebuilding the dict (used by the scan filters)"""
+        if key in _STORED_FIELDS:
+            value = getattr(self, key)
+            return default if value is MISSING else value
+        return self.to_dict().get(key, default)
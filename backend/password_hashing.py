@@ -0,0 +1,56 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many hash/verify jobs are already queued"""
+
+
+class PasswordHasher:
+    """Runs bcrypt on a bounded thread pool so it never blocks the event loop.
+
+    bcrypt releases the GIL while it works, so threads give real parallelism.
+    `max_pending` caps running + queued jobs; callers past the cap are rejected
+    straight away instead of piling up behind a login storm.
+    """
+
+    def __init__(self, rounds: int = 12, max_workers: int = 4, max_pending: int = 64):
+        self.context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+
+    async def _run(self, func, *args):
+        if self.pending >= self.max_pending:
+            raise PasswordHasherBusy("Password hashing queue is full")
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(self.context.verify, password, hashed)
+
+    def hash_sync(self, password: str) -> str:
+        """Blocking hash for startup code that runs before the event loop"""
+        return self.context.hash(password)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+def create_password_hasher() -> PasswordHasher:
+    """Build the hasher from environment settings"""
+    return PasswordHasher(
+        rounds=int(os.getenv('BCRYPT_ROUNDS', '12')),
+        max_workers=int(os.getenv('PASSWORD_HASH_WORKERS', str(min(4, os.cpu_count() or 1)))),
+        max_pending=int(os.getenv('PASSWORD_HASH_MAX_PENDING', '64')),
+    )
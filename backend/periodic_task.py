@@ -0,0 +1,94 @@
+import asyncio
+import time
+from typing import Callable, Dict, Optional
+
+
+class PeriodicTask:
+    """Background task that runs `on_tick` every `interval` seconds.
+
+    One runs each periodic job (the dashboard tick, ETA refresh, GPS flush,
+    ...); `name` says which in failure logs. Each tick records scheduler lag
+    (how late it started), how long the tick took, and what `on_tick`
+    returned (for the dashboard tick, how many sockets it reached).
+    """
+
+    def __init__(self, name: str, on_tick: Callable[[], int], interval: float = 10.0):
+        self.name = name
+        self.on_tick = on_tick
+        self.interval = interval
+        self.ticks = 0
+        self.skipped = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.avg_lag = 0.0
+        self.last_duration = 0.0
+        self.max_duration = 0.0
+        self.avg_duration = 0.0
+        self.last_recipients = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        next_tick = time.monotonic() + self.interval
+        while True:
+            await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+            started = time.monotonic()
+            lag = started - next_tick
+
+            try:
+                recipients = self.on_tick()
+            except Exception as e:
+                print(f"{self.name} tick failed: {e}")
+                recipients = 0
+
+            self._record(lag, time.monotonic() - started, recipients)
+
+            next_tick += self.interval
+            # Fell more than a whole interval behind: skip ahead instead of bursting
+            if next_tick < time.monotonic():
+                missed = int((time.monotonic() - next_tick) // self.interval) + 1
+                self.skipped += missed
+                next_tick += missed * self.interval
+
+    def _record(self, lag: float, duration: float, recipients: int):
+        self.ticks += 1
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        self.last_duration = duration
+        self.max_duration = max(self.max_duration, duration)
+        # Exponentially weighted averages keep the metrics O(1)
+        weight = 1.0 if self.ticks == 1 else 0.1
+        self.avg_lag += weight * (lag - self.avg_lag)
+        self.avg_duration += weight * (duration - self.avg_duration)
+        self.last_recipients = recipients
+
+    def metrics(self) -> Dict:
+        return {
+            "interval_seconds": self.interval,
+            "running": self._task is not None and not self._task.done(),
+            "ticks": self.ticks,
+            "skipped_ticks": self.skipped,
+            "lag_ms": {
+                "last": round(self.last_lag * 1000, 3),
+                "avg": round(self.avg_lag * 1000, 3),
+                "max": round(self.max_lag * 1000, 3),
+            },
+            "tick_ms": {
+                "last": round(self.last_duration * 1000, 3),
+                "avg": round(self.avg_duration * 1000, 3),
+                "max": round(self.max_duration * 1000, 3),
+            },
+            "last_recipients": self.last_recipients,
+        }
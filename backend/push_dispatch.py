@@ -0,0 +1,189 @@
+import asyncio
+import json
+import os
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+# send(subscription, payload) -> (HTTP status, Retry-After seconds or None)
+Send = Callable[[Dict, bytes], Awaitable[Tuple[int, Optional[float]]]]
+# on_expired(uid, endpoint) once a push service says the subscription is gone
+OnExpired = Callable[[str, str], None]
+
+# Push service answers that retire a subscription, and those worth retrying
+EXPIRED_STATUSES = (404, 410)
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+
+# Deliveries kept for the rate and queue latency figures
+SAMPLE_SIZE = 1000
+
+
+class PushJob:
+    __slots__ = ('uid', 'subscription', 'payload', 'enqueued_at', 'attempts')
+
+    def __init__(self, uid: str, subscription: Dict, payload: bytes):
+        self.uid = uid
+        self.subscription = subscription
+        self.payload = payload
+        self.enqueued_at = time.monotonic()
+        self.attempts = 0
+
+
+class PushDispatcher:
+    """Delivers web pushes from a bounded queue on a pool of async workers.
+
+    `submit` never waits: one job per subscription goes on the queue, or is
+    dropped and counted when the queue is full. Each worker takes whatever
+    is queued, up to `batch_size` jobs, and sends them concurrently over the
+    sender's pooled connections. Timeouts, 429s and 5xx are retried with
+    exponential backoff and jitter (or the service's Retry-After) up to
+    `max_attempts`; a 404/410 means the subscription expired, and
+    `on_expired` gets to prune it.
+    """
+
+    def __init__(self, send: Send, on_expired: Optional[OnExpired] = None, workers: int = 8,
+                 queue_size: int = 10000, batch_size: int = 50, max_attempts: int = 4,
+                 backoff: float = 0.5, max_backoff: float = 60.0):
+        self.send = send
+        self.on_expired = on_expired
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._queue: "asyncio.Queue[PushJob]" = asyncio.Queue(maxsize=queue_size)
+        self._tasks: List[asyncio.Task] = []
+        self._retry_handles: Dict[PushJob, asyncio.TimerHandle] = {}
+        self._latencies: deque = deque(maxlen=SAMPLE_SIZE)
+        self._delivered_at: deque = deque(maxlen=SAMPLE_SIZE)
+        self.queued = 0
+        self.sent = 0
+        self.retried = 0
+        self.expired = 0
+        self.failed = 0
+        self.dropped = 0
+        self.batches = 0
+
+    def submit(self, uid: str, subscriptions: Iterable[Dict], message: Dict) -> int:
+        """Queue `message` for each of a user's subscriptions; returns how many were queued"""
+        payload = json.dumps(message, separators=(",", ":")).encode()
+        queued = 0
+        for subscription in subscriptions:
+            if subscription.get('endpoint') and self._enqueue(PushJob(uid, subscription, payload)):
+                queued += 1
+        self.queued += queued
+        return queued
+
+    def _enqueue(self, job: PushJob) -> bool:
+        try:
+            self._queue.put_nowait(job)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+    # Lifecycle
+
+    async def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for handle in self._retry_handles.values():
+            handle.cancel()
+        self._retry_handles.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def join(self):
+        """Wait until everything queued, retries included, has been dealt with"""
+        while True:
+            await self._queue.join()
+            if not self._retry_handles:
+                return
+            await asyncio.sleep(0.01)
+
+    # Delivery
+
+    async def _worker(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            self.batches += 1
+            try:
+                await asyncio.gather(*(self._deliver(job) for job in batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _deliver(self, job: PushJob):
+        if job.attempts == 0:
+            self._latencies.append(time.monotonic() - job.enqueued_at)
+        job.attempts += 1
+        try:
+            status, retry_after = await self.send(job.subscription, job.payload)
+        except Exception:
+            status, retry_after = None, None
+
+        if status is not None and 200 <= status < 300:
+            self.sent += 1
+            self._delivered_at.append(time.monotonic())
+        elif status in EXPIRED_STATUSES:
+            self.expired += 1
+            if self.on_expired is not None:
+                try:
+                    self.on_expired(job.uid, job.subscription['endpoint'])
+                except Exception as e:
+                    print(f"Pruning expired push subscription failed: {e}")
+        elif (status is None or status in RETRY_STATUSES) and job.attempts < self.max_attempts:
+            self._retry(job, retry_after)
+        else:
+            self.failed += 1
+
+    def _retry(self, job: PushJob, retry_after: Optional[float]):
+        delay = retry_after if retry_after is not None else \
+            self.backoff * 2 ** (job.attempts - 1) * random.uniform(0.5, 1.0)
+        self.retried += 1
+        self._retry_handles[job] = asyncio.get_running_loop().call_later(
+            min(delay, self.max_backoff), self._requeue, job
+        )
+
+    def _requeue(self, job: PushJob):
+        self._retry_handles.pop(job, None)
+        self._enqueue(job)
+
+    def metrics(self) -> Dict:
+        latencies = sorted(self._latencies)
+        delivered = self._delivered_at
+        window = delivered[-1] - delivered[0] if len(delivered) > 1 else 0.0
+        return {
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize(),
+            "retrying": len(self._retry_handles),
+            "queued": self.queued,
+            "sent": self.sent,
+            "retried": self.retried,
+            "expired": self.expired,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "dispatch_rate": round((len(delivered) - 1) / window, 1) if window else 0.0,
+            "queue_latency_ms_p50": round(latencies[len(latencies) // 2] * 1000, 2) if latencies else 0.0,
+            "queue_latency_ms_p95": round(latencies[int(len(latencies) * 0.95)] * 1000, 2) if latencies else 0.0,
+        }
+
+
+def create_push_dispatcher(send: Send, on_expired: Optional[OnExpired] = None) -> PushDispatcher:
+    """Build the dispatcher from environment settings"""
+    return PushDispatcher(
+        send,
+        on_expired,
+        workers=int(os.getenv('PUSH_WORKERS', '8')),
+        queue_size=int(os.getenv('PUSH_QUEUE_SIZE', '10000')),
+        batch_size=int(os.getenv('PUSH_BATCH_SIZE', '50')),
+        max_attempts=int(os.getenv('PUSH_MAX_ATTEMPTS', '4')),
+        backoff=float(os.getenv('PUSH_RETRY_BACKOFF_SECONDS', '0.5')),
+    )
@@ -0,0 +1,78 @@
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Set
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    last_modified: str
+    driver_id: Optional[str]
+
+
+class ResponseCache:
+    """Bounded LRU of encoded tracking responses, keyed by tracking ID.
+
+    Every parcel write invalidates its tracking ID, and a driver rename
+    invalidates the parcels that driver carries (their body embeds the name).
+    Only touched from the event loop, so there is no lock.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._by_driver: Dict[str, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, tracking_id: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(tracking_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(tracking_id)
+        self.hits += 1
+        return entry
+
+    def put(self, tracking_id: str, entry: CachedResponse):
+        if self.max_entries <= 0:
+            return
+        if tracking_id in self._entries:
+            self._remove(tracking_id)
+        self._entries[tracking_id] = entry
+        if entry.driver_id:
+            self._by_driver.setdefault(entry.driver_id, set()).add(tracking_id)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate(self, tracking_id: Optional[str]):
+        if tracking_id in self._entries:
+            self._remove(tracking_id)
+
+    def invalidate_driver(self, driver_id: str):
+        for tracking_id in list(self._by_driver.get(driver_id, ())):
+            self._remove(tracking_id)
+
+    def clear(self):
+        self._entries.clear()
+        self._by_driver.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def metrics(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _remove(self, tracking_id: str):
+        entry = self._entries.pop(tracking_id)
+        tracking_ids = self._by_driver.get(entry.driver_id)
+        if tracking_ids is not None:
+            tracking_ids.discard(tracking_id)
+            if not tracking_ids:
+                del self._by_driver[entry.driver_id]
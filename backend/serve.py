@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Multi-worker launcher: forks N uvicorn workers that share one listening socket
+and relay state to each other over the event bus (EVENT_BUS=socket).
+
+    python serve.py --workers 4 --host 0.0.0.0 --port 8000
+
+Prefer this to `uvicorn --workers`: uvicorn 0.24 hands its workers a socket
+created without IPPROTO_TCP, so asyncio skips TCP_NODELAY on every accepted
+connection and keep-alive clients stall ~40ms per response on delayed ACKs.
+Workers that exit are restarted; a restarted worker syncs from the leader.
+"""
+
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+import uvicorn
+
+
+def serve(sock: socket.socket, log_level: str):
+    server = uvicorn.Server(uvicorn.Config("main:app", log_level=log_level))
+    server.run(sockets=[sock])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--log-level', default='info')
+    args = parser.parse_args()
+    if args.workers > 1:
+        if os.getenv('WAL_DIR'):
+            parser.error("WAL_DIR needs a single worker; run with --workers 1")
+        os.environ.setdefault('EVENT_BUS', 'socket')
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    # Fork, so every worker inherits the socket as-is; main is only imported in the workers
+    context = multiprocessing.get_context('fork')
+    workers = []
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} workers")
+    while not stopping:
+        workers = [w for w in workers if w.is_alive()]
+        while len(workers) < args.workers:
+            worker = context.Process(target=serve, args=(sock, args.log_level), daemon=True)
+            worker.start()
+            workers.append(worker)
+        time.sleep(0.5)
+    for worker in workers:
+        worker.terminate()
+    for worker in workers:
+        worker.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,517 @@
+import json
+import os
+import random
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from parcel_records import ParcelRecord
+
+
+class DuplicateKeyError(Exception):
+    """Raised when a write would break a unique index (tracking_id or email)"""
+
+
+def normalize_email(email: str) -> str:
+    return email.strip().lower()
+
+
+def parcel_matches(parcel: Dict, status: Optional[str] = None, driver_id: Optional[str] = None,
+                   created_after: Optional[str] = None, created_before: Optional[str] = None) -> bool:
+    """Filter shared by the parcel scans; created_* bounds are exclusive ISO timestamps"""
+    if status is not None and parcel.get('status') != status:
+        return False
+    if driver_id is not None and parcel.get('driver_id') != driver_id:
+        return False
+    if created_after is not None or created_before is not None:
+        created_at = parcel.get('created_at')
+        if created_at is None:
+            return False
+        if created_after is not None and created_at <= created_after:
+            return False
+        if created_before is not None and created_at >= created_before:
+            return False
+    return True
+
+
+class MemoryStorage:
+    """Process-local dict storage with secondary indexes.
+
+    Records handed in are stored as-is and handed back as-is, so callers must
+    replace records (put_*) rather than mutate them in place. Parcels are the
+    exception: they are kept as compact ParcelRecords and every read returns a
+    fresh dict of the same shape.
+    """
+
+    volatile = True
+
+    def __init__(self):
+        self.parcels: Dict[str, ParcelRecord] = {}
+        self.drivers: Dict[str, Dict] = {}
+        self.users: Dict[str, Dict] = {}
+        self.notifications: Dict[str, Dict] = {}
+        # Parcel ids in insertion order; a scan cursor is a position in this list
+        self._parcel_order: List[str] = []
+        # Secondary indexes: tracking_id -> parcel id, normalized email -> user id
+        self._tracking_index: Dict[str, str] = {}
+        self._email_index: Dict[str, str] = {}
+
+    def is_empty(self) -> bool:
+        return not (self.parcels or self.drivers or self.users)
+
+    # Parcels
+
+    def get_parcel(self, parcel_id: str) -> Optional[Dict]:
+        record = self.parcels.get(parcel_id)
+        return record.to_dict() if record is not None else None
+
+    def find_parcel_by_tracking_id(self, tracking_id: str) -> Optional[Dict]:
+        parcel_id = self._tracking_index.get(tracking_id)
+        if parcel_id is None:
+            return None
+        return self.get_parcel(parcel_id)
+
+    def put_parcel(self, parcel: Dict) -> Optional[Dict]:
+        """Insert or replace a parcel; returns the record it replaced"""
+        parcel_id = parcel['id']
+        tracking_id = parcel.get('tracking_id')
+        if tracking_id and self._tracking_index.get(tracking_id, parcel_id) != parcel_id:
+            raise DuplicateKeyError("Tracking ID already exists")
+        previous = self.parcels.get(parcel_id)
+        if previous is None:
+            self._parcel_order.append(parcel_id)
+        elif previous.get('tracking_id') != tracking_id:
+            self._tracking_index.pop(previous.get('tracking_id'), None)
+        self.parcels[parcel_id] = ParcelRecord.from_dict(parcel)
+        if tracking_id:
+            self._tracking_index[tracking_id] = parcel_id
+        return previous.to_dict() if previous is not None else None
+
+    def put_parcels(self, parcels: List[Dict]) -> List[Optional[Dict]]:
+        """Insert or replace several parcels, all or nothing; returns the records they replaced"""
+        claimed: Dict[str, str] = {}
+        for parcel in parcels:
+            tracking_id = parcel.get('tracking_id')
+            if not tracking_id:
+                continue
+            if claimed.setdefault(tracking_id, parcel['id']) != parcel['id'] or \
+                    self._tracking_index.get(tracking_id, parcel['id']) != parcel['id']:
+                raise DuplicateKeyError("Tracking ID already exists")
+        return [self.put_parcel(parcel) for parcel in parcels]
+
+    def insert_parcels(self, parcels: List[Dict]) -> List[int]:
+        """Insert new parcels; returns the positions skipped because their id or tracking_id exists"""
+        rejected = []
+        for position, parcel in enumerate(parcels):
+            tracking_id = parcel.get('tracking_id')
+            if parcel['id'] in self.parcels or (tracking_id and tracking_id in self._tracking_index):
+                rejected.append(position)
+                continue
+            self.parcels[parcel['id']] = ParcelRecord.from_dict(parcel)
+            self._parcel_order.append(parcel['id'])
+            if tracking_id:
+                self._tracking_index[tracking_id] = parcel['id']
+        return rejected
+
+    def list_parcels(self, status: Optional[str] = None, exclude_status: Optional[str] = None,
+                     driver_id: Optional[str] = None, limit: Optional[int] = None) -> List[Dict]:
+        results = []
+        for record in self.parcels.values():
+            if status is not None and record.get('status') != status:
+                continue
+            if exclude_status is not None and record.get('status') == exclude_status:
+                continue
+            if driver_id is not None and record.get('driver_id') != driver_id:
+                continue
+            results.append(record.to_dict())
+            if limit is not None and len(results) >= limit:
+                break
+        return results
+
+    def iter_parcels(self) -> Iterator[Dict]:
+        return (record.to_dict() for record in list(self.parcels.values()))
+
+    def scan_parcels(self, after: int = 0, status: Optional[str] = None, driver_id: Optional[str] = None,
+                     created_after: Optional[str] = None, created_before: Optional[str] = None) -> Iterator[Tuple[int, Dict]]:
+        """Yield (cursor, parcel) in insertion order, starting after `after`; resume with the last cursor seen"""
+        order = self._parcel_order
+        position = max(after, 0)
+        while position < len(order):
+            record = self.parcels[order[position]]
+            position += 1
+            if parcel_matches(record, status, driver_id, created_after, created_before):
+                yield position, record.to_dict()
+
+    def count_parcels(self, status: Optional[str] = None) -> int:
+        if status is None:
+            return len(self.parcels)
+        return sum(1 for record in self.parcels.values() if record.status == status)
+
+    def random_parcel(self) -> Optional[Dict]:
+        if not self.parcels:
+            return None
+        return self.parcels[random.choice(list(self.parcels))].to_dict()
+
+    # Drivers
+
+    def get_driver(self, driver_id: str) -> Optional[Dict]:
+        return self.drivers.get(driver_id)
+
+    def put_driver(self, driver: Dict) -> Optional[Dict]:
+        previous = self.drivers.get(driver['id'])
+        self.drivers[driver['id']] = driver
+        return previous
+
+    def iter_drivers(self) -> Iterator[Dict]:
+        return iter(list(self.drivers.values()))
+
+    # Users
+
+    def get_user(self, user_id: str) -> Optional[Dict]:
+        return self.users.get(user_id)
+
+    def find_user_id_by_email(self, email: str) -> Optional[str]:
+        return self._email_index.get(normalize_email(email))
+
+    def put_user(self, user_id: str, user_data: Dict) -> Optional[Dict]:
+        key = normalize_email(user_data['email'])
+        if self._email_index.get(key, user_id) != user_id:
+            raise DuplicateKeyError("Email already in use")
+        previous = self.users.get(user_id)
+        if previous:
+            previous_key = normalize_email(previous['email'])
+            if previous_key != key:
+                self._email_index.pop(previous_key, None)
+        self.users[user_id] = user_data
+        self._email_index[key] = user_id
+        return previous
+
+    def iter_users(self) -> Iterator[Tuple[str, Dict]]:
+        return iter(list(self.users.items()))
+
+    # Notifications
+
+    def get_notifications(self, user_id: str) -> Optional[Dict]:
+        return self.notifications.get(user_id)
+
+    def export_records(self, table: str) -> Iterator[Dict]:
+        """Iterate a table ('parcels' or 'drivers') as of this call"""
+        # Records are immutable once stored, so copying the references is a consistent snapshot
+        if table == 'parcels':
+            return (record.to_dict() for record in list(self.parcels.values()))
+        return iter(list(self.drivers.values()))
+
+    def put_notifications(self, user_id: str, inbox: Dict):
+        self.notifications[user_id] = inbox
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Point-in-time copy of every table, keyed the way the journal keys records"""
+        # Records are replaced rather than mutated on write, so shallow copies suffice;
+        # parcel values are ParcelRecords, which the journal serializes via to_dict
+        return {
+            'users': dict(self.users),
+            'parcels': dict(self.parcels),
+            'drivers': dict(self.drivers),
+            'notifications': dict(self.notifications),
+        }
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS parcels (
+    id TEXT PRIMARY KEY,
+    tracking_id TEXT,
+    status TEXT,
+    driver_id TEXT,
+    data TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS parcels_tracking_id ON parcels(tracking_id);
+CREATE INDEX IF NOT EXISTS parcels_status ON parcels(status);
+CREATE INDEX IF NOT EXISTS parcels_driver_id ON parcels(driver_id);
+
+CREATE TABLE IF NOT EXISTS drivers (
+    id TEXT PRIMARY KEY,
+    status TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS drivers_status ON drivers(status);
+
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    email TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS users_email ON users(email);
+
+CREATE TABLE IF NOT EXISTS notifications (
+    user_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+"""
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, separators=(",", ":"))
+
+
+class SQLiteStorage:
+    """SQLite storage in WAL mode; indexed columns alongside a JSON copy of each record.
+
+    Each thread (event loop, threadpool workers) gets its own connection from a
+    thread-local pool. Every query uses a fixed SQL string, so sqlite3's
+    per-connection statement cache keeps them prepared. Several uvicorn workers
+    can share one database file; unique indexes catch cross-worker races.
+    """
+
+    volatile = False
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, cached_statements=256, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _one(self, sql: str, params) -> Optional[Dict]:
+        row = self._conn().execute(sql, params).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def is_empty(self) -> bool:
+        conn = self._conn()
+        return not any(
+            conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone()
+            for table in ('parcels', 'drivers', 'users')
+        )
+
+    # Parcels
+
+    def get_parcel(self, parcel_id: str) -> Optional[Dict]:
+        return self._one("SELECT data FROM parcels WHERE id = ?", (parcel_id,))
+
+    def find_parcel_by_tracking_id(self, tracking_id: str) -> Optional[Dict]:
+        return self._one("SELECT data FROM parcels WHERE tracking_id = ?", (tracking_id,))
+
+    def put_parcel(self, parcel: Dict) -> Optional[Dict]:
+        with self._transaction() as conn:
+            row = conn.execute("SELECT data FROM parcels WHERE id = ?", (parcel['id'],)).fetchone()
+            try:
+                conn.execute(
+                    "INSERT INTO parcels (id, tracking_id, status, driver_id, data) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET tracking_id = excluded.tracking_id, status = excluded.status, "
+                    "driver_id = excluded.driver_id, data = excluded.data",
+                    (parcel['id'], parcel.get('tracking_id'), parcel.get('status'), parcel.get('driver_id'), _dumps(parcel))
+                )
+            except sqlite3.IntegrityError:
+                raise DuplicateKeyError("Tracking ID already exists")
+        return json.loads(row[0]) if row else None
+
+    def put_parcels(self, parcels: List[Dict]) -> List[Optional[Dict]]:
+        """Insert or replace several parcels in one transaction; returns the records they replaced"""
+        previous = []
+        with self._transaction() as conn:
+            for parcel in parcels:
+                row = conn.execute("SELECT data FROM parcels WHERE id = ?", (parcel['id'],)).fetchone()
+                try:
+                    conn.execute(
+                        "INSERT INTO parcels (id, tracking_id, status, driver_id, data) VALUES (?, ?, ?, ?, ?) "
+                        "ON CONFLICT(id) DO UPDATE SET tracking_id = excluded.tracking_id, status = excluded.status, "
+                        "driver_id = excluded.driver_id, data = excluded.data",
+                        (parcel['id'], parcel.get('tracking_id'), parcel.get('status'), parcel.get('driver_id'), _dumps(parcel))
+                    )
+                except sqlite3.IntegrityError:
+                    raise DuplicateKeyError("Tracking ID already exists")
+                previous.append(json.loads(row[0]) if row else None)
+        return previous
+
+    def insert_parcels(self, parcels: List[Dict]) -> List[int]:
+        """Insert new parcels in one transaction; returns the positions rejected by a unique index"""
+        rejected = []
+        with self._transaction() as conn:
+            for position, parcel in enumerate(parcels):
+                try:
+                    # A failed INSERT only undoes that statement, not the transaction
+                    conn.execute(
+                        "INSERT INTO parcels (id, tracking_id, status, driver_id, data) VALUES (?, ?, ?, ?, ?)",
+                        (parcel['id'], parcel.get('tracking_id'), parcel.get('status'), parcel.get('driver_id'), _dumps(parcel))
+                    )
+                except sqlite3.IntegrityError:
+                    rejected.append(position)
+        return rejected
+
+    def list_parcels(self, status: Optional[str] = None, exclude_status: Optional[str] = None,
+                     driver_id: Optional[str] = None, limit: Optional[int] = None) -> List[Dict]:
+        clauses, params = [], []
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        if exclude_status is not None:
+            clauses.append("status != ?")
+            params.append(exclude_status)
+        if driver_id is not None:
+            clauses.append("driver_id = ?")
+            params.append(driver_id)
+        sql = "SELECT data FROM parcels"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY rowid"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [json.loads(row[0]) for row in self._conn().execute(sql, params)]
+
+    def iter_parcels(self) -> Iterator[Dict]:
+        for row in self._conn().execute("SELECT data FROM parcels ORDER BY rowid"):
+            yield json.loads(row[0])
+
+    def scan_parcels(self, after: int = 0, status: Optional[str] = None, driver_id: Optional[str] = None,
+                     created_after: Optional[str] = None, created_before: Optional[str] = None,
+                     batch_size: int = 500) -> Iterator[Tuple[int, Dict]]:
+        """Yield (rowid, parcel) in rowid order after `after`, fetched in keyset batches.
+
+        Each batch is its own short query, so no read transaction or cursor is
+        held open between batches, and consumers may resume from any thread.
+        """
+        clauses, params = ["rowid > ?"], []
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        if driver_id is not None:
+            clauses.append("driver_id = ?")
+            params.append(driver_id)
+        if created_after is not None:
+            clauses.append("json_extract(data, '$.created_at') > ?")
+            params.append(created_after)
+        if created_before is not None:
+            clauses.append("json_extract(data, '$.created_at') < ?")
+            params.append(created_before)
+        sql = f"SELECT rowid, data FROM parcels WHERE {' AND '.join(clauses)} ORDER BY rowid LIMIT {int(batch_size)}"
+        position = after
+        while True:
+            rows = self._conn().execute(sql, [position, *params]).fetchall()
+            for rowid, data in rows:
+                yield rowid, json.loads(data)
+            if len(rows) < batch_size:
+                return
+            position = rows[-1][0]
+
+    def count_parcels(self, status: Optional[str] = None) -> int:
+        if status is None:
+            return self._conn().execute("SELECT COUNT(*) FROM parcels").fetchone()[0]
+        return self._conn().execute("SELECT COUNT(*) FROM parcels WHERE status = ?", (status,)).fetchone()[0]
+
+    def random_parcel(self) -> Optional[Dict]:
+        count = self.count_parcels()
+        if not count:
+            return None
+        return self._one("SELECT data FROM parcels ORDER BY rowid LIMIT 1 OFFSET ?", (random.randrange(count),))
+
+    # Drivers
+
+    def get_driver(self, driver_id: str) -> Optional[Dict]:
+        return self._one("SELECT data FROM drivers WHERE id = ?", (driver_id,))
+
+    def put_driver(self, driver: Dict) -> Optional[Dict]:
+        with self._transaction() as conn:
+            row = conn.execute("SELECT data FROM drivers WHERE id = ?", (driver['id'],)).fetchone()
+            conn.execute(
+                "INSERT INTO drivers (id, status, data) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET status = excluded.status, data = excluded.data",
+                (driver['id'], driver.get('status'), _dumps(driver))
+            )
+        return json.loads(row[0]) if row else None
+
+    def iter_drivers(self) -> Iterator[Dict]:
+        for row in self._conn().execute("SELECT data FROM drivers ORDER BY rowid"):
+            yield json.loads(row[0])
+
+    # Users
+
+    def get_user(self, user_id: str) -> Optional[Dict]:
+        return self._one("SELECT data FROM users WHERE id = ?", (user_id,))
+
+    def find_user_id_by_email(self, email: str) -> Optional[str]:
+        row = self._conn().execute("SELECT id FROM users WHERE email = ?", (normalize_email(email),)).fetchone()
+        return row[0] if row else None
+
+    def put_user(self, user_id: str, user_data: Dict) -> Optional[Dict]:
+        with self._transaction() as conn:
+            row = conn.execute("SELECT data FROM users WHERE id = ?", (user_id,)).fetchone()
+            try:
+                conn.execute(
+                    "INSERT INTO users (id, email, data) VALUES (?, ?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET email = excluded.email, data = excluded.data",
+                    (user_id, normalize_email(user_data['email']), _dumps(user_data))
+                )
+            except sqlite3.IntegrityError:
+                raise DuplicateKeyError("Email already in use")
+        return json.loads(row[0]) if row else None
+
+    def iter_users(self) -> Iterator[Tuple[str, Dict]]:
+        for user_id, data in self._conn().execute("SELECT id, data FROM users ORDER BY rowid"):
+            yield user_id, json.loads(data)
+
+    # Notifications
+
+    def get_notifications(self, user_id: str) -> Optional[Dict]:
+        return self._one("SELECT data FROM notifications WHERE user_id = ?", (user_id,))
+
+    def put_notifications(self, user_id: str, inbox: Dict):
+        self._conn().execute(
+            "INSERT INTO notifications (user_id, data) VALUES (?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data",
+            (user_id, _dumps(inbox))
+        )
+
+    def export_records(self, table: str, batch_size: int = 500) -> Iterator[Dict]:
+        """Iterate a table ('parcels' or 'drivers') as of this call.
+
+        Runs on its own connection inside a read transaction, which in WAL mode
+        pins a snapshot without blocking writers; the first batch is fetched
+        here so the snapshot is taken now rather than on first iteration.
+        """
+        if table not in ('parcels', 'drivers'):
+            raise KeyError(table)
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        conn.execute("BEGIN")
+        cursor = conn.execute(f"SELECT data FROM {table} ORDER BY rowid")
+        return self._drain_export(conn, cursor, cursor.fetchmany(batch_size), batch_size)
+
+    @staticmethod
+    def _drain_export(conn: sqlite3.Connection, cursor: sqlite3.Cursor, rows: List, batch_size: int) -> Iterator[Dict]:
+        try:
+            while rows:
+                for (data,) in rows:
+                    yield json.loads(data)
+                rows = cursor.fetchmany(batch_size)
+        finally:
+            conn.execute("COMMIT")
+            conn.close()
+
+
+def create_storage():
+    """Build the storage backend from environment settings (memory unless STORAGE_BACKEND=sqlite)"""
+    backend = os.getenv('STORAGE_BACKEND', 'memory')
+    if backend == 'memory':
+        return MemoryStorage()
+    if backend == 'sqlite':
+        return SQLiteStorage(os.getenv('SQLITE_PATH', 'rush_delivery.db'))
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
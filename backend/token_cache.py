@@ -0,0 +1,76 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set
+
+
+class TokenCache:
+    """Bounded LRU of verified JWT claims, keyed by the token's SHA-256 digest.
+
+    An entry lives until the token's own `exp` or `max_ttl` seconds, whichever
+    comes first. Entries are also tracked per uid so a role change can drop
+    every cached token for that user at once.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._by_user: Dict[str, Set[bytes]] = {}
+        # FastAPI runs the sync auth dependencies on its threadpool
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[Dict]:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            claims, expires_at = entry
+            if expires_at <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return dict(claims)
+
+    def put(self, token: str, claims: Dict):
+        expires_at = time.time() + self.max_ttl
+        if isinstance(claims.get('exp'), (int, float)):
+            expires_at = min(expires_at, claims['exp'])
+        key = self._key(token)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (dict(claims), expires_at)
+            uid = claims.get('uid')
+            if uid:
+                self._by_user.setdefault(uid, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, uid: str):
+        with self._lock:
+            for key in list(self._by_user.get(uid, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key: bytes):
+        claims, _ = self._entries.pop(key)
+        uid = claims.get('uid')
+        keys = self._by_user.get(uid)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[uid]
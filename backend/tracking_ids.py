@@ -0,0 +1,144 @@
+import fcntl
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+from typing import List, Optional
+
+ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+ID_LENGTH = 16
+DOMAIN = len(ALPHABET) ** ID_LENGTH  # every 16-character base36 string
+
+# Feistel network over 2 * HALF_BITS bits, cycle-walked back into DOMAIN
+HALF_BITS = (DOMAIN.bit_length() + 1) // 2
+HALF_MASK = (1 << HALF_BITS) - 1
+ROUNDS = 8
+
+
+def encode_base36(value: int) -> str:
+    """Encode an integer in [0, DOMAIN) as a fixed-width base36 string"""
+    chars = []
+    for _ in range(ID_LENGTH):
+        value, digit = divmod(value, 36)
+        chars.append(ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+
+class KeyedPermutation:
+    """Secret bijection on [0, DOMAIN): distinct counters always map to distinct IDs"""
+
+    def __init__(self, key: bytes):
+        self._round_keys = [
+            hmac.new(key, f"tracking-id-round-{i}".encode(), hashlib.sha256).digest()
+            for i in range(ROUNDS)
+        ]
+
+    def _round(self, i: int, half: int) -> int:
+        digest = hashlib.blake2b(half.to_bytes(8, 'big'), key=self._round_keys[i], digest_size=8).digest()
+        return int.from_bytes(digest, 'big') & HALF_MASK
+
+    def _encrypt_block(self, value: int) -> int:
+        left, right = value >> HALF_BITS, value & HALF_MASK
+        for i in range(ROUNDS):
+            left, right = right, left ^ self._round(i, right)
+        return (left << HALF_BITS) | right
+
+    def permute(self, value: int) -> int:
+        if not 0 <= value < DOMAIN:
+            raise ValueError("Counter out of range")
+        # Cycle-walking keeps the result inside DOMAIN while staying a bijection
+        value = self._encrypt_block(value)
+        while value >= DOMAIN:
+            value = self._encrypt_block(value)
+        return value
+
+
+class LocalBlockSource:
+    """Hands out counter blocks within a single process"""
+
+    def __init__(self, start: Optional[int] = None):
+        # A random start keeps restarts from replaying the same ID sequence
+        self._next = start if start is not None else secrets.randbelow(1 << 64)
+        self._lock = threading.Lock()
+
+    def lease(self, size: int) -> int:
+        with self._lock:
+            start = self._next
+            self._next += size
+            return start
+
+
+class FileBlockSource:
+    """Hands out counter blocks shared by every worker through a locked counter file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        os.close(fd)
+
+    def lease(self, size: int) -> int:
+        with open(self.path, 'r+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                raw = f.read().strip()
+                start = int(raw) if raw else 0
+                f.seek(0)
+                f.write(str(start + size))
+                f.truncate()
+                f.flush()
+                os.fsync(f.fileno())
+                return start
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class TrackingIdAllocator:
+    """Mints unique, unguessable tracking IDs from leased counter blocks.
+
+    Each worker leases `block_size` counters at a time and only touches the
+    shared block source when its block runs out. Counters are pushed through
+    a keyed permutation, so consecutive IDs look random without ever colliding.
+    """
+
+    def __init__(self, key: bytes, source=None, block_size: int = 1024):
+        self._permutation = KeyedPermutation(key)
+        self._source = source or LocalBlockSource()
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def _next_counter(self) -> int:
+        if self._next >= self._end:
+            self._next = self._source.lease(self.block_size)
+            self._end = self._next + self.block_size
+        counter = self._next
+        self._next += 1
+        return counter % DOMAIN
+
+    def allocate(self) -> str:
+        with self._lock:
+            counter = self._next_counter()
+        return encode_base36(self._permutation.permute(counter))
+
+    def allocate_many(self, count: int) -> List[str]:
+        with self._lock:
+            counters = [self._next_counter() for _ in range(count)]
+        return [encode_base36(self._permutation.permute(c)) for c in counters]
+
+
+def create_allocator(secret: Optional[str]) -> TrackingIdAllocator:
+    """Build the allocator from environment settings; `secret` is None when JWT_SECRET is a public default"""
+    key = os.getenv('TRACKING_ID_SECRET') or secret
+    counter_file = os.getenv('TRACKING_ID_COUNTER_FILE')
+    if not key:
+        if counter_file:
+            # Workers sharing a counter must share the key, and a public one makes the IDs enumerable
+            raise RuntimeError("TRACKING_ID_COUNTER_FILE needs TRACKING_ID_SECRET or a JWT_SECRET of your own")
+        key = secrets.token_hex(32)
+        print("WARNING: neither TRACKING_ID_SECRET nor a non-default JWT_SECRET is set; "
+              "tracking IDs use a throwaway key for this process")
+    block_size = int(os.getenv('TRACKING_ID_BLOCK_SIZE', '1024'))
+    source = FileBlockSource(counter_file) if counter_file else LocalBlockSource()
+    return TrackingIdAllocator(key.encode(), source, block_size)
@@ -0,0 +1,35 @@
+from typing import Dict, List, Tuple
+
+# Preferences of a user who never set any; GET /profile reports the same
+DEFAULT_PREFS = {'email': True, 'push': False, 'sms': False}
+
+
+class UserIndex:
+    """Users with web-push subscriptions, kept in step with every user write.
+
+    Only users whose preferences turn push on are kept (it is off by
+    default), so a dispatch to every subscriber never walks every user.
+    """
+
+    def __init__(self):
+        self._subscriptions: Dict[str, Tuple[Dict, ...]] = {}
+
+    def update(self, uid: str, user_data: Dict):
+        subscriptions = tuple(s for s in user_data.get('push_subscriptions') or () if isinstance(s, dict))
+        prefs = {**DEFAULT_PREFS, **(user_data.get('prefs') or {})}
+        if subscriptions and prefs['push']:
+            self._subscriptions[uid] = subscriptions
+        else:
+            self._subscriptions.pop(uid, None)
+
+    def subscriptions(self, uid: str) -> Tuple[Dict, ...]:
+        return self._subscriptions.get(uid, ())
+
+    def subscribed_users(self) -> List[str]:
+        return list(self._subscriptions)
+
+    def subscription_count(self) -> int:
+        return sum(len(s) for s in self._subscriptions.values())
+
+    def __len__(self):
+        return len(self._subscriptions)
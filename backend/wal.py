@@ -0,0 +1,370 @@
+import asyncio
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Every record on disk is framed as [payload length][crc32 of payload][payload]
+FRAME_HEADER = struct.Struct('>II')
+
+SEGMENT_PREFIX = "wal-"
+SNAPSHOT_PREFIX = "snapshot-"
+
+
+class JournalFailed(Exception):
+    """The journal can no longer make writes durable (its writer hit an I/O error)"""
+
+
+def encode_frame(payload: bytes) -> bytes:
+    return FRAME_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def read_frames(path: str) -> Iterator[Tuple[int, bytes]]:
+    """Yield (end offset, payload) for each intact frame; stops at the first torn one."""
+    with open(path, 'rb') as f:
+        offset = 0
+        while True:
+            header = f.read(FRAME_HEADER.size)
+            if len(header) < FRAME_HEADER.size:
+                return
+            length, crc = FRAME_HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                return
+            offset += FRAME_HEADER.size + length
+            yield offset, payload
+
+
+def _fsync_dir(directory: str):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class NullJournal:
+    """Stand-in used when no WAL directory is configured"""
+
+    enabled = False
+    last_lsn = 0
+    failure = None
+
+    def append(self, table: str, key: str, value) -> int:
+        return 0
+
+    def append_many(self, records: List[Tuple[str, str, object]]) -> int:
+        return 0
+
+    async def wait_durable(self, lsn: int):
+        return None
+
+    def recover(self, apply: Callable[[str, str, object], None]) -> bool:
+        return False
+
+    def start(self):
+        pass
+
+    def maybe_snapshot(self, capture: Callable[[], Dict[str, Dict]]) -> bool:
+        return False
+
+    def close(self):
+        pass
+
+
+class WriteAheadLog:
+    """Append-only, group-committed log of store mutations plus periodic snapshots.
+
+    `append` frames a record ([lsn, table, key, value]) and queues it; a writer
+    thread batches whatever has queued within `commit_interval`, writes it in
+    one go and fsyncs once for the whole batch. Callers that need durability
+    await `wait_durable(lsn)`.
+
+    Records are full-row puts (value None deletes), so replay is idempotent.
+    `append_many` packs several puts into one frame, so they replay all or
+    nothing.
+    Every record carries a CRC, so a crash mid-write leaves at worst a torn
+    tail frame, which recovery detects and truncates instead of applying.
+    Snapshots are written to a temp file and renamed into place, then the
+    segments they cover are deleted.
+
+    If a write or fsync fails the writer stops: `failure` is set, and every
+    pending and later `wait_durable` raises JournalFailed instead of hanging.
+    """
+
+    enabled = True
+
+    def __init__(self, directory: str, commit_interval: float = 0.005, snapshot_every: int = 100_000):
+        self.directory = directory
+        self.commit_interval = commit_interval
+        self.snapshot_every = snapshot_every
+        os.makedirs(directory, exist_ok=True)
+
+        self.last_lsn = 0
+        self.durable_lsn = 0
+        self.records_since_snapshot = 0
+        self.batches = 0
+        self._replaying = False
+        self._snapshot_thread: Optional[threading.Thread] = None
+
+        self._cond = threading.Condition()
+        self._pending: List[bytes] = []
+        self._rotate_at: Optional[int] = None
+        self._rotated = threading.Event()
+        self._waiters: List[Tuple[int, asyncio.Future]] = []
+        self._segment = None
+        self._writer: Optional[threading.Thread] = None
+        self._stopping = False
+        self.failure: Optional[BaseException] = None
+
+    # Writing
+
+    def append(self, table: str, key: str, value) -> int:
+        if self._replaying:
+            return self.last_lsn
+        with self._cond:
+            self.last_lsn += 1
+            if self.failure is not None:
+                # Nothing is written any more; the caller's wait_durable fails
+                return self.last_lsn
+            payload = json.dumps([self.last_lsn, table, key, value], separators=(",", ":")).encode()
+            self._pending.append(encode_frame(payload))
+            self.records_since_snapshot += 1
+            self._cond.notify()
+            return self.last_lsn
+
+    def append_many(self, records: List[Tuple[str, str, object]]) -> int:
+        """Log several puts as one frame (table None, value = [[table, key, value], ...])"""
+        if self._replaying or not records:
+            return self.last_lsn
+        with self._cond:
+            self.last_lsn += 1
+            if self.failure is not None:
+                return self.last_lsn
+            payload = json.dumps([self.last_lsn, None, None, records], separators=(",", ":")).encode()
+            self._pending.append(encode_frame(payload))
+            self.records_since_snapshot += len(records)
+            self._cond.notify()
+            return self.last_lsn
+
+    async def wait_durable(self, lsn: int):
+        if lsn <= self.durable_lsn:
+            return
+        future = asyncio.get_running_loop().create_future()
+        with self._cond:
+            if lsn <= self.durable_lsn:
+                return
+            if self.failure is not None:
+                raise JournalFailed(str(self.failure))
+            self._waiters.append((lsn, future))
+        await future
+
+    def start(self):
+        """Open a fresh segment and start the group-commit writer"""
+        self._open_segment(self.durable_lsn + 1)
+        self._writer = threading.Thread(target=self._write_loop, name="wal-writer", daemon=True)
+        self._writer.start()
+
+    def _open_segment(self, first_lsn: int):
+        if self._segment:
+            self._segment.close()
+        path = os.path.join(self.directory, f"{SEGMENT_PREFIX}{first_lsn:016d}.log")
+        self._segment = open(path, 'ab')
+        _fsync_dir(self.directory)
+
+    def _write_loop(self):
+        try:
+            self._commit_batches()
+        except Exception as e:
+            print(f"Write-ahead log failed, writes can no longer be made durable: {e}")
+            with self._cond:
+                self.failure = e
+                self._pending = []
+                waiters, self._waiters = self._waiters, []
+            # Don't leave a snapshot waiting on a rotation that will never happen
+            self._rotated.set()
+            for _, future in waiters:
+                future.get_loop().call_soon_threadsafe(_fail, future, e)
+
+    def _commit_batches(self):
+        while True:
+            with self._cond:
+                while not self._pending and self._rotate_at is None and not self._stopping:
+                    self._cond.wait()
+                if self._stopping and not self._pending and self._rotate_at is None:
+                    return
+            # Give concurrent writers a moment to join this batch
+            time.sleep(self.commit_interval)
+            with self._cond:
+                batch, self._pending = self._pending, []
+                batch_lsn = self.last_lsn
+                rotate_at, self._rotate_at = self._rotate_at, None
+
+            if rotate_at is not None:
+                # Records up to rotate_at belong to the old segment, the rest to the new one
+                split = len(batch) - (batch_lsn - rotate_at)
+                self._write_batch(batch[:split])
+                self._open_segment(rotate_at + 1)
+                self._rotated.set()
+                batch = batch[split:]
+            self._write_batch(batch)
+            self.batches += 1
+            self._mark_durable(batch_lsn)
+
+    def _write_batch(self, batch: List[bytes]):
+        if not batch:
+            return
+        self._segment.write(b''.join(batch))
+        self._segment.flush()
+        os.fsync(self._segment.fileno())
+
+    def _mark_durable(self, lsn: int):
+        with self._cond:
+            self.durable_lsn = lsn
+            ready = [f for waiter_lsn, f in self._waiters if waiter_lsn <= lsn]
+            self._waiters = [(l, f) for l, f in self._waiters if l > lsn]
+        for future in ready:
+            future.get_loop().call_soon_threadsafe(_resolve, future)
+
+    # Snapshots
+
+    def maybe_snapshot(self, capture: Callable[[], Dict[str, Dict]]) -> bool:
+        """Snapshot if enough records have accumulated; must run on the event loop thread.
+
+        `capture` returns {table: {key: value}} copied at this instant, so the
+        snapshot is exactly the state as of the current last_lsn.
+        """
+        if self.records_since_snapshot < self.snapshot_every:
+            return False
+        if self._snapshot_thread is not None and self._snapshot_thread.is_alive():
+            return False
+        state = capture()
+        with self._cond:
+            if self.failure is not None:
+                return False
+            lsn = self.last_lsn
+            self._rotated.clear()
+            self._rotate_at = lsn
+            self.records_since_snapshot = 0
+            self._cond.notify()
+        self._snapshot_thread = threading.Thread(
+            target=self._write_snapshot, args=(state, lsn), name="wal-snapshot", daemon=True
+        )
+        self._snapshot_thread.start()
+        return True
+
+    def _write_snapshot(self, state: Dict[str, Dict], lsn: int):
+        final = os.path.join(self.directory, f"{SNAPSHOT_PREFIX}{lsn:016d}.snap")
+        temp = final + ".tmp"
+        with open(temp, 'wb') as f:
+            for table, rows in state.items():
+                for key, value in rows.items():
+                    # Compact storage records (see parcel_records) are expanded here, off the event loop
+                    if hasattr(value, 'to_dict'):
+                        value = value.to_dict()
+                    payload = json.dumps([lsn, table, key, value], separators=(",", ":")).encode()
+                    f.write(encode_frame(payload))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, final)
+        _fsync_dir(self.directory)
+        # The covered segments are only safe to delete once the writer has moved on
+        self._rotated.wait()
+        self._prune(lsn)
+
+    def _prune(self, snapshot_lsn: int):
+        """Drop older snapshots and every segment fully covered by this snapshot"""
+        for name in os.listdir(self.directory):
+            if name.startswith(SNAPSHOT_PREFIX) and name.endswith(".snap"):
+                if int(name[len(SNAPSHOT_PREFIX):-5]) < snapshot_lsn:
+                    os.remove(os.path.join(self.directory, name))
+            elif name.startswith(SEGMENT_PREFIX) and name.endswith(".log"):
+                if int(name[len(SEGMENT_PREFIX):-4]) <= snapshot_lsn:
+                    os.remove(os.path.join(self.directory, name))
+
+    # Recovery
+
+    def _listing(self, prefix: str, suffix: str) -> List[Tuple[int, str]]:
+        found = []
+        for name in os.listdir(self.directory):
+            if name.startswith(prefix) and name.endswith(suffix):
+                found.append((int(name[len(prefix):-len(suffix)]), os.path.join(self.directory, name)))
+        return sorted(found)
+
+    def recover(self, apply: Callable[[str, str, object], None]) -> bool:
+        """Replay the latest snapshot plus the log tail through `apply`; True if any state was found"""
+        self._replaying = True
+        applied = 0
+        try:
+            snapshot_lsn = 0
+            snapshots = self._listing(SNAPSHOT_PREFIX, ".snap")
+            if snapshots:
+                snapshot_lsn, path = snapshots[-1]
+                for _, payload in read_frames(path):
+                    _, table, key, value = json.loads(payload)
+                    apply(table, key, value)
+                    applied += 1
+
+            last_lsn = snapshot_lsn
+            for _, path in self._listing(SEGMENT_PREFIX, ".log"):
+                good_offset = 0
+                for good_offset, payload in read_frames(path):
+                    lsn, table, key, value = json.loads(payload)
+                    if lsn <= last_lsn:
+                        continue
+                    if table is None:
+                        for record in value:
+                            apply(*record)
+                    else:
+                        apply(table, key, value)
+                    applied += 1
+                    last_lsn = lsn
+                if good_offset < os.path.getsize(path):
+                    # Torn tail from a crash mid-write: cut it off, it was never acknowledged
+                    with open(path, 'r+b') as f:
+                        f.truncate(good_offset)
+                        os.fsync(f.fileno())
+
+            self.last_lsn = self.durable_lsn = last_lsn
+        finally:
+            self._replaying = False
+        return applied > 0
+
+    def close(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._writer is not None:
+            self._writer.join()
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+        if self._segment:
+            self._segment.close()
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+def _fail(future: asyncio.Future, error: BaseException):
+    if not future.done():
+        future.set_exception(JournalFailed(str(error)))
+
+
+def create_journal():
+    """Build the journal from environment settings; disabled unless WAL_DIR is set"""
+    directory = os.getenv('WAL_DIR')
+    if not directory:
+        return NullJournal()
+    if os.getenv('EVENT_BUS', 'local').lower() != 'local':
+        # Every worker would replay and append to the same segments
+        raise RuntimeError("WAL_DIR only works with a single worker (EVENT_BUS=local)")
+    return WriteAheadLog(
+        directory,
+        commit_interval=float(os.getenv('WAL_COMMIT_INTERVAL_MS', '5')) / 1000,
+        snapshot_every=int(os.getenv('WAL_SNAPSHOT_EVERY', '100000')),
+    )
@@ -0,0 +1,290 @@
+import asyncio
+import base64
+import ipaddress
+import os
+import socket
+import ssl
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from jose import jwt
+
+# aes128gcm record size; a push message always fits in one record
+RECORD_SIZE = 4096
+
+# VAPID tokens may live up to 24h; each origin's is re-signed well before that
+VAPID_TOKEN_SECONDS = 12 * 3600
+
+
+class PushEndpointRejected(ValueError):
+    """A push endpoint the server won't contact: not https, or not a public host"""
+
+
+async def resolve_public_host(host: Optional[str], port: int) -> List[str]:
+    """Resolve a push service host; raises PushEndpointRejected unless every address is public.
+
+    Connecting to the checked address (not the name again) keeps a second,
+    different DNS answer from steering the request to an internal host.
+    """
+    if not host:
+        raise PushEndpointRejected("Push endpoint has no host")
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        raise ConnectionError(f"Cannot resolve {host}: {e}")
+    addresses = [info[4][0] for info in infos]
+    if not addresses or not all(ipaddress.ip_address(a.split('%')[0]).is_global for a in addresses):
+        raise PushEndpointRejected("Push endpoint must be a public host")
+    return addresses
+
+
+async def check_subscription(subscription) -> None:
+    """Raise PushEndpointRejected unless this is an https, publicly hosted subscription with its keys"""
+    if not isinstance(subscription, dict) or not isinstance(subscription.get('endpoint'), str):
+        raise PushEndpointRejected("Subscription needs an endpoint")
+    keys = subscription.get('keys')
+    if not isinstance(keys, dict) or not all(isinstance(keys.get(k), str) and keys[k] for k in ('p256dh', 'auth')):
+        raise PushEndpointRejected("Subscription needs keys.p256dh and keys.auth")
+    parts = urlsplit(subscription['endpoint'])
+    if parts.scheme != 'https':
+        raise PushEndpointRejected("Push endpoint must be https")
+    try:
+        port = parts.port or 443
+    except ValueError:
+        raise PushEndpointRejected("Push endpoint has an invalid port")
+    await resolve_public_host(parts.hostname, port)
+
+
+def b64url_decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+def b64url_encode(value: bytes) -> str:
+    return base64.urlsafe_b64encode(value).rstrip(b"=").decode()
+
+
+def _hkdf(salt: bytes, ikm: bytes, info: bytes, length: int) -> bytes:
+    return HKDF(algorithm=hashes.SHA256(), length=length, salt=salt, info=info).derive(ikm)
+
+
+def encrypt_payload(payload: bytes, p256dh: str, auth: str) -> bytes:
+    """Encrypt a push message for one subscription (RFC 8291, aes128gcm content coding)"""
+    ua_public = b64url_decode(p256dh)
+    ua_key = ec.EllipticCurvePublicKey.from_encoded_point(ec.SECP256R1(), ua_public)
+    as_key = ec.generate_private_key(ec.SECP256R1())
+    as_public = as_key.public_key().public_bytes(
+        serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint
+    )
+    shared = as_key.exchange(ec.ECDH(), ua_key)
+    ikm = _hkdf(b64url_decode(auth), shared, b"WebPush: info\x00" + ua_public + as_public, 32)
+    salt = os.urandom(16)
+    cek = _hkdf(salt, ikm, b"Content-Encoding: aes128gcm\x00", 16)
+    nonce = _hkdf(salt, ikm, b"Content-Encoding: nonce\x00", 12)
+    # 0x02 marks the last (only) record
+    ciphertext = AESGCM(cek).encrypt(nonce, payload + b"\x02", None)
+    header = salt + RECORD_SIZE.to_bytes(4, "big") + bytes([len(as_public)]) + as_public
+    return header + ciphertext
+
+
+class VapidKey:
+    """Application server key that signs the VAPID token each push service checks (RFC 8292)"""
+
+    def __init__(self, private_key: ec.EllipticCurvePrivateKey, subject: str):
+        self.subject = subject
+        self._pem = private_key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ).decode()
+        self.public_key = b64url_encode(private_key.public_key().public_bytes(
+            serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint
+        ))
+        self._tokens: Dict[str, Tuple[str, float]] = {}
+
+    @classmethod
+    def from_string(cls, value: str, subject: str) -> 'VapidKey':
+        """Load a PEM key, or the base64url raw private key web-push tools generate"""
+        if value.lstrip().startswith("-----BEGIN"):
+            key = serialization.load_pem_private_key(value.encode(), password=None)
+        else:
+            key = ec.derive_private_key(int.from_bytes(b64url_decode(value.strip()), "big"), ec.SECP256R1())
+        return cls(key, subject)
+
+    @classmethod
+    def generate(cls, subject: str) -> 'VapidKey':
+        return cls(ec.generate_private_key(ec.SECP256R1()), subject)
+
+    def authorization(self, endpoint: str) -> str:
+        """Authorization header for an endpoint; tokens are signed once per push service origin"""
+        parts = urlsplit(endpoint)
+        audience = f"{parts.scheme}://{parts.netloc}"
+        now = time.time()
+        cached = self._tokens.get(audience)
+        if cached is None or cached[1] - now < VAPID_TOKEN_SECONDS / 2:
+            expires = now + VAPID_TOKEN_SECONDS
+            token = jwt.encode({"aud": audience, "exp": int(expires), "sub": self.subject}, self._pem, algorithm="ES256")
+            cached = self._tokens[audience] = (token, expires)
+        return f"vapid t={cached[0]}, k={self.public_key}"
+
+
+class PushConnectionPool:
+    """Keep-alive HTTP/1.1 connections per push service origin, for small POSTs.
+
+    At most `max_per_origin` requests run against one origin at a time, each
+    on an idle connection when there is one. Push services answer with tiny
+    bodies, so this is all the HTTP a sender needs; a full client's pool
+    bookkeeping costs more than the requests once hundreds are in flight.
+
+    Only https origins on public addresses are contacted, unless
+    `allow_private_hosts` is set (for a local stub service).
+    """
+
+    def __init__(self, max_per_origin: int = 100, timeout: float = 10.0, allow_private_hosts: bool = False):
+        self.max_per_origin = max_per_origin
+        self.timeout = timeout
+        self.allow_private_hosts = allow_private_hosts
+        self.opened = 0
+        self._idle: Dict[Tuple[str, str, int], List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]] = {}
+        self._slots: Dict[Tuple[str, str, int], asyncio.Semaphore] = {}
+        self._ssl = ssl.create_default_context()
+
+    async def post(self, url: str, body: bytes, headers: Dict[str, str]) -> Tuple[int, Dict[str, str]]:
+        """POST `body`; returns the status and the (lowercased) response headers"""
+        parts = urlsplit(url)
+        https = parts.scheme == 'https'
+        if not https and not self.allow_private_hosts:
+            raise PushEndpointRejected("Push endpoint must be https")
+        origin = (parts.scheme, parts.hostname, parts.port or (443 if https else 80))
+        path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        request = f"POST {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nContent-Length: {len(body)}\r\n" + \
+            "".join(f"{name}: {value}\r\n" for name, value in headers.items()) + "\r\n"
+        slot = self._slots.get(origin)
+        if slot is None:
+            slot = self._slots[origin] = asyncio.Semaphore(self.max_per_origin)
+        async with slot:
+            idle = self._idle.setdefault(origin, [])
+            while True:
+                reused = bool(idle)
+                if reused:
+                    reader, writer = idle.pop()
+                else:
+                    host = origin[1]
+                    if not self.allow_private_hosts:
+                        host = (await asyncio.wait_for(resolve_public_host(host, origin[2]), self.timeout))[0]
+                    reader, writer = await asyncio.wait_for(asyncio.open_connection(
+                        host, origin[2], ssl=self._ssl if https else None,
+                        server_hostname=origin[1] if https else None
+                    ), self.timeout)
+                    self.opened += 1
+                try:
+                    writer.write(request.encode() + body)
+                    status, response_headers, keep_alive = await asyncio.wait_for(
+                        self._read_response(reader), self.timeout
+                    )
+                except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError):
+                    writer.close()
+                    # The service may have closed an idle connection; retry once on a fresh one
+                    if reused:
+                        continue
+                    raise
+                if keep_alive:
+                    idle.append((reader, writer))
+                else:
+                    writer.close()
+                return status, response_headers
+
+    @staticmethod
+    async def _read_response(reader: asyncio.StreamReader) -> Tuple[int, Dict[str, str], bool]:
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("Connection closed")
+        version, status = status_line.split(None, 2)[:2]
+        headers = {}
+        while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+            name, _, value = line.decode('latin-1').partition(":")
+            headers[name.strip().lower()] = value.strip()
+        status = int(status)
+        keep_alive = version == b"HTTP/1.1" and headers.get('connection', '').lower() != 'close'
+        if status < 200 or status in (204, 304):
+            pass  # never has a body
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            while size := int((await reader.readline()).split(b";")[0], 16):
+                await reader.readexactly(size + 2)
+            await reader.readline()
+        elif 'content-length' in headers:
+            await reader.readexactly(int(headers['content-length']))
+        elif not keep_alive:
+            # The body runs to the end of the connection
+            await reader.read()
+        return status, headers, keep_alive
+
+    async def close(self):
+        for connections in self._idle.values():
+            for _, writer in connections:
+                writer.close()
+        self._idle.clear()
+
+
+class WebPushSender:
+    """Posts encrypted push messages to subscription endpoints over pooled keep-alive connections.
+
+    Connections to each push service are kept alive and shared by every send,
+    so a batch to the same service costs one TLS handshake, not one per push.
+    """
+
+    def __init__(self, vapid: VapidKey, ttl: int = 86400, timeout: float = 10.0, max_connections: int = 100,
+                 allow_private_hosts: bool = False):
+        self.vapid = vapid
+        self.ttl = ttl
+        self.pool = PushConnectionPool(max_per_origin=max_connections, timeout=timeout,
+                                       allow_private_hosts=allow_private_hosts)
+
+    async def send(self, subscription: Dict, payload: bytes, urgency: str = "normal") -> Tuple[int, Optional[float]]:
+        """Deliver one message; returns the push service's status and its Retry-After, if any"""
+        endpoint = subscription['endpoint']
+        headers = {
+            "TTL": str(self.ttl),
+            "Urgency": urgency,
+            "Authorization": self.vapid.authorization(endpoint),
+        }
+        keys = subscription.get('keys') or {}
+        body = b""
+        if payload and keys.get('p256dh') and keys.get('auth'):
+            body = encrypt_payload(payload, keys['p256dh'], keys['auth'])
+            headers["Content-Encoding"] = "aes128gcm"
+            headers["Content-Type"] = "application/octet-stream"
+        try:
+            status, response_headers = await self.pool.post(endpoint, body, headers)
+        except PushEndpointRejected:
+            # Stored before endpoints were checked; answering 410 gets it pruned
+            return 410, None
+        retry_after = response_headers.get("retry-after")
+        try:
+            retry_after = float(retry_after) if retry_after is not None else None
+        except ValueError:
+            retry_after = None
+        return status, retry_after
+
+    async def close(self):
+        await self.pool.close()
+
+
+def create_web_push_sender() -> WebPushSender:
+    """Build the sender from environment settings"""
+    subject = os.getenv('VAPID_SUBJECT', 'mailto:admin@rushdelivery.com')
+    private_key = os.getenv('VAPID_PRIVATE_KEY')
+    if private_key:
+        vapid = VapidKey.from_string(private_key, subject)
+    else:
+        # Browsers only accept pushes signed by the key they subscribed with
+        vapid = VapidKey.generate(subject)
+        print("VAPID_PRIVATE_KEY is not set; using a throwaway key, so real push services will reject pushes")
+    return WebPushSender(
+        vapid,
+        ttl=int(os.getenv('PUSH_TTL_SECONDS', '86400')),
+        timeout=float(os.getenv('PUSH_TIMEOUT_SECONDS', '10')),
+        max_connections=int(os.getenv('PUSH_MAX_CONNECTIONS', '100')),
+    )
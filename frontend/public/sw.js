@@ -59,3 +59,37 @@ async function backgroundSync() {
   // Implement background sync logic here
   console.log('Background sync triggered');
 }
+
+// Push event - show notifications sent by the backend ({title, body, url})
+self.addEventListener('push', (event) => {
+  let data = {};
+  try {
+    data = event.data ? event.data.json() : {};
+  } catch (e) {
+    data = { body: event.data ? event.data.text() : '' };
+  }
+  event.waitUntil(
+    self.registration.showNotification(data.title || 'Rush Delivery', {
+      body: data.body || '',
+      icon: '/logo.png',
+      data: { url: data.url || '/notifications' }
+    })
+  );
+});
+
+// Notification click - focus an open tab or open the linked page
+self.addEventListener('notificationclick', (event) => {
+  event.notification.close();
+  const url = event.notification.data && event.notification.data.url;
+  event.waitUntil(
+    clients.matchAll({ type: 'window', includeUncontrolled: true }).then((windowClients) => {
+      for (const client of windowClients) {
+        if ('focus' in client) {
+          client.navigate(url);
+          return client.focus();
+        }
+      }
+      return clients.openWindow(url);
+    })
+  );
+});
@@ -33,7 +33,9 @@ export default function AdminDashboard() {
   // WebSocket connection
   useEffect(() => {
     const connectWebSocket = () => {
-      const ws = new WebSocket(`${API_BASE_URL.replace('http', 'ws')}/ws/dashboard`);
+      // Parcel events are only sent to sockets that present admin credentials
+      const adminKey = localStorage.getItem('adminKey');
+      const ws = new WebSocket(`${API_BASE_URL.replace('http', 'ws')}/ws/dashboard?token=${encodeURIComponent(adminKey || '')}`);
       wsRef.current = ws;
 
       ws.onopen = () => {